@@ -0,0 +1,55 @@
+# Production server configuration for the LumonMind Flask API
+#
+# Run with:
+#   gunicorn lumonmind_flask_v2:app
+#
+# gunicorn picks this file up automatically from the working directory.
+# Every setting can be overridden through environment variables.
+import os
+
+# Bind address
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# Worker model. Requests spend almost all of their time waiting on LLM
+# providers, so one process with many threads (gthread) or greenlets (gevent)
+# gives the best concurrency. Sessions live in process memory, so keep a
+# single worker process unless a shared session store is configured.
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_WORKERS', 1))
+threads = int(os.getenv('WEB_THREADS', 32))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 256))  # gevent only
+
+# Timeouts (seconds). A chat can fall through all three providers, so the
+# worker timeout must cover the full provider chain, not a single call.
+timeout = int(os.getenv('WEB_TIMEOUT', 300))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 120))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+
+# Import the app (prompt, regexes, SDKs) once in the master before forking
+preload_app = os.getenv('PRELOAD_APP', 'true').lower() == 'true'
+
+# Logging
+accesslog = os.getenv('ACCESS_LOG', '-')
+errorlog = os.getenv('ERROR_LOG', '-')
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Runs once in the master before workers are forked"""
+    import lumonmind_flask_v2
+    lumonmind_flask_v2.verify_api_keys()
+    lumonmind_flask_v2.prepare_static_files()
+    # Import provider SDKs once in the master so forked workers share them
+    lumonmind_flask_v2.load_provider_sdks()
+
+
+def post_worker_init(worker):
+    """Warm provider clients, extension cache and status snapshot in each worker"""
+    import lumonmind_flask_v2
+    lumonmind_flask_v2.warm_up()
+
+
+def worker_exit(server, worker):
+    """Drain crisis follow-ups and queued log writes after in-flight requests finish"""
+    import lumonmind_flask_v2
+    lumonmind_flask_v2.shutdown_background_work()
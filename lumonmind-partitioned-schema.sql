@@ -0,0 +1,232 @@
+-- Partitioned variant of the Messages and AuditLogs tables
+--
+-- Replaces the Messages and AuditLogs definitions in lumonmind-postgres-schema.sql
+-- (PostgreSQL 13+). For a fresh install run the base schema, drop its empty
+-- Messages and AuditLogs tables, then run this file; for an existing
+-- installation see the migration notes at the end. Messages and
+-- AuditLogs grow fastest, so they are range-partitioned by month on
+-- Timestamp. Retention then detaches or drops whole partitions instead of
+-- running DELETEs that bloat a single heap table.
+--
+-- Partitions are named <table>_pYYYYMM (e.g. messages_p202504). Future
+-- partitions are created and expired ones detached/dropped by
+-- manage_time_partitions(); detached partitions are dropped after a grace
+-- period (time to archive them) by drop_detached_partitions(). Both run
+-- daily from lumonmind_db_maintenance.py.
+
+-- Messages table (partitioned by month)
+-- The primary key must include the partition key, so it is (MessageID, Timestamp)
+CREATE TABLE Messages (
+    MessageID BIGSERIAL,
+    SessionID INTEGER REFERENCES Sessions(SessionID) ON DELETE SET NULL,
+    SenderType VARCHAR(10) NOT NULL,
+    Content TEXT NOT NULL,
+    Timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DetectedTopics JSONB,
+    CONSTRAINT chk_sender_type CHECK (SenderType IN ('user', 'assistant')),
+    PRIMARY KEY (MessageID, Timestamp)
+) PARTITION BY RANGE (Timestamp);
+
+-- AuditLogs table (partitioned by month)
+CREATE TABLE AuditLogs (
+    LogID BIGSERIAL,
+    Timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UserID INTEGER REFERENCES Users(UserID) ON DELETE SET NULL,
+    ActionType VARCHAR(50) NOT NULL,
+    Description TEXT,
+    IPAddress VARCHAR(45),
+    PRIMARY KEY (LogID, Timestamp)
+) PARTITION BY RANGE (Timestamp);
+
+-- Default partitions catch rows outside every monthly range (e.g. bad clocks)
+-- so inserts never fail; manage_time_partitions() reports rows found here
+CREATE TABLE messages_default PARTITION OF Messages DEFAULT;
+CREATE TABLE auditlogs_default PARTITION OF AuditLogs DEFAULT;
+
+-- Indexes (created on the parent, inherited by every partition)
+-- Sample queries 4 and MASTER join Messages on SessionID; Timestamp keeps
+-- each session's messages in order for conversation history reads
+CREATE INDEX idx_messages_session_time ON Messages(SessionID, Timestamp);
+-- Existing audit index for action lookups per user
+CREATE INDEX idx_auditlogs_user_action ON AuditLogs(UserID, ActionType);
+-- MASTER query: COUNT(*) and MAX(Timestamp) of audit events per user
+CREATE INDEX idx_auditlogs_user_time ON AuditLogs(UserID, Timestamp DESC);
+-- Topic analytics (see MessageTopics in lumonmind-postgres-schema.sql)
+CREATE INDEX idx_messages_detected_topics ON Messages USING GIN (DetectedTopics jsonb_path_ops);
+
+-- Keep MessageTopics in sync (row triggers on partitioned tables need PostgreSQL 13+)
+CREATE TRIGGER sync_message_topics_trigger
+AFTER INSERT OR UPDATE OF DetectedTopics ON Messages
+FOR EACH ROW EXECUTE FUNCTION sync_message_topics();
+
+-- Create (if missing) the monthly partition containing month_start
+--
+-- A partition cannot be created while the default partition holds rows for
+-- its range, so any such rows are moved into the new table first, which is
+-- then attached as the partition.
+CREATE OR REPLACE FUNCTION create_month_partition(parent_table TEXT, month_start DATE)
+RETURNS TEXT AS $$
+DECLARE
+    range_start DATE := date_trunc('month', month_start)::DATE;
+    range_end DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := lower(parent_table) || '_p' || to_char(range_start, 'YYYYMM');
+    default_name TEXT := lower(parent_table) || '_default';
+    has_default_rows BOOLEAN := FALSE;
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF to_regclass(default_name) IS NOT NULL THEN
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE Timestamp >= %L AND Timestamp < %L)',
+                       default_name, range_start, range_end)
+        INTO has_default_rows;
+    END IF;
+
+    IF has_default_rows THEN
+        -- Not yet a partition, so the moved rows do not fire the parent's
+        -- row triggers again (MessageTopics already has them)
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                       partition_name, lower(parent_table));
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM %I WHERE Timestamp >= %L AND Timestamp < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            default_name, range_start, range_end, partition_name
+        );
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       lower(parent_table), partition_name, range_start, range_end);
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, lower(parent_table), range_start, range_end
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pre-create future partitions and retire expired ones
+--
+-- months_ahead: partitions to create beyond the current month
+-- retention_months: full months to keep before the current one
+-- drop_expired: FALSE detaches expired partitions (so they can be archived
+--   and dropped later), TRUE drops them outright
+--
+-- Returns one row per action taken.
+CREATE OR REPLACE FUNCTION manage_time_partitions(
+    parent_table TEXT,
+    months_ahead INTEGER DEFAULT 3,
+    retention_months INTEGER DEFAULT 12,
+    drop_expired BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (action TEXT, partition_name TEXT) AS $$
+DECLARE
+    current_month DATE := date_trunc('month', CURRENT_DATE)::DATE;
+    cutoff DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => retention_months))::DATE;
+    created TEXT;
+    part RECORD;
+    default_rows BIGINT;
+BEGIN
+    -- Current month plus months_ahead future months
+    FOR i IN 0..months_ahead LOOP
+        created := create_month_partition(parent_table, (current_month + make_interval(months => i))::DATE);
+        IF created IS NOT NULL THEN
+            action := 'created';
+            partition_name := created;
+            RETURN NEXT;
+        END IF;
+    END LOOP;
+
+    -- Partitions whose month starts before the cutoff are expired
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits inh
+        JOIN pg_class c ON c.oid = inh.inhrelid
+        JOIN pg_class p ON p.oid = inh.inhparent
+        WHERE p.relname = lower(parent_table)
+          AND CASE WHEN c.relname ~ ('^' || lower(parent_table) || '_p[0-9]{6}$')
+                   THEN to_date(right(c.relname, 6), 'YYYYMM') < cutoff
+                   ELSE FALSE END
+        ORDER BY c.relname
+    LOOP
+        IF drop_expired THEN
+            EXECUTE format('DROP TABLE %I', part.relname);
+            action := 'dropped';
+        ELSE
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', lower(parent_table), part.relname);
+            action := 'detached';
+        END IF;
+        partition_name := part.relname;
+        RETURN NEXT;
+    END LOOP;
+
+    -- Rows in the default partition usually mean a missing monthly partition
+    EXECUTE format('SELECT count(*) FROM %I', lower(parent_table) || '_default') INTO default_rows;
+    IF default_rows > 0 THEN
+        action := 'default_rows:' || default_rows;
+        partition_name := lower(parent_table) || '_default';
+        RETURN NEXT;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop partitions detached by manage_time_partitions() once their month is
+-- more than retention_months + grace_months before the current month
+--
+-- The grace period is the time to archive a detached partition (e.g. with
+-- pg_dump -t messages_p202401) before it is dropped. Only standalone tables
+-- named <table>_pYYYYMM are considered; attached partitions never match.
+--
+-- Returns one row per dropped table.
+CREATE OR REPLACE FUNCTION drop_detached_partitions(
+    parent_table TEXT,
+    retention_months INTEGER DEFAULT 12,
+    grace_months INTEGER DEFAULT 3
+)
+RETURNS TABLE (action TEXT, partition_name TEXT) AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', CURRENT_DATE)
+                    - make_interval(months => retention_months + grace_months))::DATE;
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema()
+          AND c.relkind = 'r'
+          AND NOT c.relispartition
+          AND c.relname ~ ('^' || lower(parent_table) || '_p[0-9]{6}$')
+          AND to_date(right(c.relname, 6), 'YYYYMM') < cutoff
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('DROP TABLE %I', part.relname);
+        action := 'dropped_detached';
+        partition_name := part.relname;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Initial partitions: current month and the next three
+SELECT * FROM manage_time_partitions('Messages', 3, 12, FALSE);
+SELECT * FROM manage_time_partitions('AuditLogs', 3, 12, FALSE);
+
+-- Migrating an existing (unpartitioned) installation:
+--
+--   BEGIN;
+--   ALTER TABLE Messages RENAME TO messages_unpartitioned;
+--   ALTER TABLE AuditLogs RENAME TO auditlogs_unpartitioned;
+--   ALTER INDEX idx_auditlogs_user_action RENAME TO idx_auditlogs_unpartitioned_user_action;
+--   ALTER INDEX idx_messages_detected_topics RENAME TO idx_messages_unpartitioned_detected_topics;
+--   DROP TRIGGER sync_message_topics_trigger ON messages_unpartitioned;
+--   -- run the CREATE TABLE / INDEX statements above, then create partitions
+--   -- back to the oldest row, e.g.:
+--   SELECT create_month_partition('Messages', d::DATE)
+--   FROM generate_series(date_trunc('month', (SELECT min(Timestamp) FROM messages_unpartitioned)),
+--                        date_trunc('month', CURRENT_DATE), INTERVAL '1 month') AS d;
+--   INSERT INTO Messages SELECT * FROM messages_unpartitioned;
+--   INSERT INTO AuditLogs SELECT * FROM auditlogs_unpartitioned;
+--   SELECT setval(pg_get_serial_sequence('messages', 'messageid'), (SELECT max(MessageID) FROM Messages));
+--   SELECT setval(pg_get_serial_sequence('auditlogs', 'logid'), (SELECT max(LogID) FROM AuditLogs));
+--   COMMIT;
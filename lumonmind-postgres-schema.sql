@@ -1,3 +1,6 @@
+-- btree_gist lets the Appointments exclusion constraint combine = and &&
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 -- Users table
 CREATE TABLE Users (
     UserID SERIAL PRIMARY KEY,
@@ -72,9 +75,15 @@ CREATE TABLE Appointments (
     Notes TEXT,
     CreatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     UpdatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    IdempotencyKey VARCHAR(64) UNIQUE,  -- client or derived key; a retried booking returns the same row
     CONSTRAINT chk_appointment_status CHECK (Status IN ('scheduled', 'completed', 'canceled', 'no-show')),
     CONSTRAINT chk_appointment_type CHECK (Type IN ('video', 'in-person', 'phone')),
-    CONSTRAINT chk_appointment_time CHECK (AppointmentDateTime < EndDateTime)
+    CONSTRAINT chk_appointment_time CHECK (AppointmentDateTime < EndDateTime),
+    -- A specialist can never have two overlapping scheduled appointments
+    CONSTRAINT no_overlapping_appointments EXCLUDE USING gist (
+        SpecialistID WITH =,
+        tsrange(AppointmentDateTime, EndDateTime) WITH &&
+    ) WHERE (Status = 'scheduled')
 );
 
 -- Sessions table (optional implementation)
@@ -85,6 +94,7 @@ CREATE TABLE Sessions (
     EndTime TIMESTAMP,
     SessionStatus VARCHAR(20) DEFAULT 'active',
     LLMProviderUsed VARCHAR(50),
+    ConversationKey VARCHAR(64),  -- the app's session id (conversation_id in the logs)
     CONSTRAINT chk_session_status CHECK (SessionStatus IN ('active', 'completed', 'interrupted'))
 );
 
@@ -139,6 +149,17 @@ CREATE TABLE Extensions (
     LastUpdated TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- LogIngestCheckpoints table - progress of bulk conversation log ingestion
+-- (lumonmind_ingest_logs.py), updated in the same transaction as each batch
+CREATE TABLE LogIngestCheckpoints (
+    FileName VARCHAR(255) PRIMARY KEY,
+    ByteOffset BIGINT NOT NULL DEFAULT 0,
+    LinesLoaded INTEGER NOT NULL DEFAULT 0,
+    SessionMap JSONB,
+    Completed BOOLEAN NOT NULL DEFAULT FALSE,
+    UpdatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Add PostgreSQL-specific triggers for updated timestamps
 CREATE OR REPLACE FUNCTION update_modified_column()
 RETURNS TRIGGER AS $$
@@ -158,7 +179,201 @@ CREATE INDEX idx_specialist_isactive ON Specialists(IsActive);
 CREATE INDEX idx_appointments_datetime ON Appointments(AppointmentDateTime);
 CREATE INDEX idx_appointments_status ON Appointments(Status);
 CREATE INDEX idx_sessions_user ON Sessions(UserID);
+CREATE INDEX idx_sessions_conversation_key ON Sessions(ConversationKey);
 CREATE INDEX idx_messages_session ON Messages(SessionID);
 CREATE INDEX idx_specialist_availability ON SpecialistAvailability(SpecialistID, DayOfWeek);
 CREATE INDEX idx_feedback_user ON Feedback(UserID);
 CREATE INDEX idx_auditlogs_user_action ON AuditLogs(UserID, ActionType);
+
+-- Normalized message topics
+-- Messages.DetectedTopics (JSONB) is also kept as one row per message topic so
+-- topic analytics are index scans instead of unnesting JSONB at query time.
+-- MessageTopics has no foreign key to Messages so it also works with the
+-- partitioned Messages table; prune_message_topics() prunes it by Timestamp
+-- together with messages.
+CREATE TABLE MessageTopics (
+    MessageID BIGINT NOT NULL,
+    TopicID INTEGER NOT NULL REFERENCES Topics(TopicID) ON DELETE CASCADE,
+    Timestamp TIMESTAMP NOT NULL,
+    PRIMARY KEY (MessageID, TopicID)
+);
+
+-- Daily message counts per topic, maintained by refresh_topic_daily_counts()
+CREATE TABLE TopicDailyCounts (
+    Day DATE NOT NULL,
+    TopicID INTEGER NOT NULL REFERENCES Topics(TopicID) ON DELETE CASCADE,
+    MessageCount INTEGER NOT NULL,
+    PRIMARY KEY (Day, TopicID)
+);
+
+-- Topics detected by the app (TOPIC_KEYWORDS in lumonmind_topics.py)
+INSERT INTO Topics (TopicName) VALUES
+    ('anxiety'), ('depression'), ('grief'), ('sleep'),
+    ('relationship'), ('stress-burnout'), ('self-esteem')
+ON CONFLICT (TopicName) DO NOTHING;
+
+-- Copy DetectedTopics into MessageTopics on every insert/update (also fires for COPY)
+CREATE OR REPLACE FUNCTION sync_message_topics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        IF NEW.DetectedTopics IS NOT DISTINCT FROM OLD.DetectedTopics THEN
+            RETURN NEW;
+        END IF;
+        DELETE FROM MessageTopics WHERE MessageID = NEW.MessageID;
+    END IF;
+    IF NEW.DetectedTopics IS NOT NULL AND jsonb_typeof(NEW.DetectedTopics) = 'array' THEN
+        INSERT INTO MessageTopics (MessageID, TopicID, Timestamp)
+        SELECT NEW.MessageID, t.TopicID, NEW.Timestamp
+        FROM jsonb_array_elements_text(NEW.DetectedTopics) AS detected(name)
+        JOIN Topics t ON lower(t.TopicName) = lower(detected.name)
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sync_message_topics_trigger
+AFTER INSERT OR UPDATE OF DetectedTopics ON Messages
+FOR EACH ROW EXECUTE FUNCTION sync_message_topics();
+
+-- Recompute daily topic counts from since_day onwards (run daily for yesterday and today)
+CREATE OR REPLACE FUNCTION refresh_topic_daily_counts(since_day DATE DEFAULT CURRENT_DATE - 1)
+RETURNS INTEGER AS $$
+DECLARE
+    refreshed INTEGER;
+BEGIN
+    DELETE FROM TopicDailyCounts WHERE Day >= since_day;
+    INSERT INTO TopicDailyCounts (Day, TopicID, MessageCount)
+    SELECT mt.Timestamp::DATE, mt.TopicID, COUNT(*)
+    FROM MessageTopics mt
+    WHERE mt.Timestamp >= since_day
+    GROUP BY mt.Timestamp::DATE, mt.TopicID;
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Delete topic rows of messages older than the retention window
+-- MessageTopics has no foreign key to Messages, so retiring Messages
+-- partitions (manage_time_partitions) leaves its rows behind; this removes
+-- them, and the daily counts of those days, with the same month cutoff.
+CREATE OR REPLACE FUNCTION prune_message_topics(retention_months INTEGER DEFAULT 12)
+RETURNS BIGINT AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => retention_months))::DATE;
+    pruned BIGINT;
+BEGIN
+    DELETE FROM MessageTopics WHERE Timestamp < cutoff;
+    GET DIAGNOSTICS pruned = ROW_COUNT;
+    DELETE FROM TopicDailyCounts WHERE Day < cutoff;
+    RETURN pruned;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Topic analytics indexes
+-- Containment queries on the JSONB column (DetectedTopics @> '["anxiety"]')
+CREATE INDEX idx_messages_detected_topics ON Messages USING GIN (DetectedTopics jsonb_path_ops);
+-- Topic trends: messages per topic over a time range
+CREATE INDEX idx_message_topics_topic_time ON MessageTopics(TopicID, Timestamp);
+-- Pruning and daily rollup by time
+CREATE INDEX idx_message_topics_time ON MessageTopics(Timestamp);
+
+-- Materialized specialist slots
+-- SpecialistAvailability expanded into concrete bookable slots for a rolling
+-- horizon by materialize_specialist_slots() (run daily, see
+-- lumonmind_db_maintenance.py materialize-slots). Appointment changes keep
+-- slot status current through a trigger, so "next free slots" queries are
+-- index range scans instead of joining availability against appointments.
+CREATE TABLE SpecialistSlots (
+    SlotID BIGSERIAL PRIMARY KEY,
+    SpecialistID INTEGER NOT NULL REFERENCES Specialists(SpecialistID) ON DELETE CASCADE,
+    SlotStart TIMESTAMP NOT NULL,
+    SlotEnd TIMESTAMP NOT NULL,
+    Status VARCHAR(10) NOT NULL DEFAULT 'free',
+    AppointmentID INTEGER REFERENCES Appointments(AppointmentID) ON DELETE SET NULL,
+    CONSTRAINT chk_slot_status CHECK (Status IN ('free', 'booked')),
+    CONSTRAINT chk_slot_time CHECK (SlotStart < SlotEnd),
+    CONSTRAINT uq_specialist_slot UNIQUE (SpecialistID, SlotStart)
+);
+
+-- Next free slots overall and per specialist
+CREATE INDEX idx_slots_free_start ON SpecialistSlots(SlotStart) WHERE Status = 'free';
+CREATE INDEX idx_slots_free_specialist ON SpecialistSlots(SpecialistID, SlotStart) WHERE Status = 'free';
+CREATE INDEX idx_slots_appointment ON SpecialistSlots(AppointmentID) WHERE AppointmentID IS NOT NULL;
+
+-- Expand recurring availability into slots for the next horizon_days days
+-- Returns the number of free slots in the horizon after materialization.
+CREATE OR REPLACE FUNCTION materialize_specialist_slots(horizon_days INTEGER DEFAULT 28, slot_minutes INTEGER DEFAULT 60)
+RETURNS INTEGER AS $$
+DECLARE
+    free_slots INTEGER;
+BEGIN
+    -- ON COMMIT DROP only drops at commit: a second call in the same
+    -- transaction (e.g. from a maintenance script) must drop it first
+    DROP TABLE IF EXISTS pg_temp.wanted_slots;
+    CREATE TEMP TABLE wanted_slots ON COMMIT DROP AS
+    SELECT sa.SpecialistID,
+           slot_start AS SlotStart,
+           slot_start + make_interval(mins => slot_minutes) AS SlotEnd
+    FROM generate_series(CURRENT_DATE, CURRENT_DATE + horizon_days, INTERVAL '1 day') AS day
+    JOIN SpecialistAvailability sa
+        ON sa.DayOfWeek = trim(to_char(day, 'FMDay'))
+        AND day::DATE BETWEEN sa.EffectiveDate AND COALESCE(sa.ExpiryDate, '2099-12-31')
+        AND sa.IsRecurring = TRUE
+    JOIN Specialists s ON s.SpecialistID = sa.SpecialistID AND s.IsActive = TRUE
+    CROSS JOIN LATERAL generate_series(
+        day::DATE + sa.StartTime,
+        day::DATE + sa.EndTime - make_interval(mins => slot_minutes),
+        make_interval(mins => slot_minutes)
+    ) AS slot_start
+    WHERE slot_start > CURRENT_TIMESTAMP;
+
+    -- Drop past slots and free slots no longer backed by availability
+    DELETE FROM SpecialistSlots WHERE SlotEnd < CURRENT_TIMESTAMP;
+    DELETE FROM SpecialistSlots sl
+    WHERE sl.Status = 'free'
+      AND NOT EXISTS (SELECT 1 FROM wanted_slots w
+                      WHERE w.SpecialistID = sl.SpecialistID AND w.SlotStart = sl.SlotStart);
+
+    INSERT INTO SpecialistSlots (SpecialistID, SlotStart, SlotEnd)
+    SELECT SpecialistID, SlotStart, SlotEnd FROM wanted_slots
+    ON CONFLICT (SpecialistID, SlotStart) DO NOTHING;
+
+    -- Mark slots overlapping scheduled appointments as booked
+    UPDATE SpecialistSlots sl
+    SET Status = 'booked', AppointmentID = a.AppointmentID
+    FROM Appointments a
+    WHERE sl.Status = 'free'
+      AND a.SpecialistID = sl.SpecialistID
+      AND a.Status = 'scheduled'
+      AND a.AppointmentDateTime < sl.SlotEnd
+      AND a.EndDateTime > sl.SlotStart;
+
+    SELECT count(*) INTO free_slots FROM SpecialistSlots WHERE Status = 'free';
+    RETURN free_slots;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keep slot status in step with appointments (booked, moved or canceled)
+CREATE OR REPLACE FUNCTION sync_specialist_slots()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE SpecialistSlots SET Status = 'free', AppointmentID = NULL
+        WHERE AppointmentID = OLD.AppointmentID;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.Status = 'scheduled' THEN
+        UPDATE SpecialistSlots SET Status = 'booked', AppointmentID = NEW.AppointmentID
+        WHERE SpecialistID = NEW.SpecialistID
+          AND Status = 'free'
+          AND SlotStart < NEW.EndDateTime
+          AND SlotEnd > NEW.AppointmentDateTime;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sync_specialist_slots_trigger
+AFTER INSERT OR DELETE OR UPDATE OF Status, SpecialistID, AppointmentDateTime, EndDateTime ON Appointments
+FOR EACH ROW EXECUTE FUNCTION sync_specialist_slots();
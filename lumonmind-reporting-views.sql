@@ -0,0 +1,195 @@
+-- Materialized reporting views for the consolidated dashboard
+--
+-- The MASTER query in lumonmind-sample-queries.sql runs correlated subqueries
+-- per user (topics, detected message topics, specializations, audit counts)
+-- and joins Sessions, Appointments and Feedback together, which multiplies
+-- rows before aggregating. Here every source table is aggregated once per
+-- user into its own materialized view; user_dashboard joins the precomputed
+-- rows (one per user per view) and is what dashboards should read.
+--
+-- Each view has a unique index on UserID so it can be refreshed with
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY (readers are never blocked).
+-- lumonmind_db_maintenance.py refresh-views runs the refreshes.
+
+-- User topics of interest
+CREATE MATERIALIZED VIEW mv_user_interests AS
+SELECT
+    ut.UserID,
+    string_agg(t.TopicName, ', ' ORDER BY t.TopicName) AS UserInterests
+FROM
+    UserTopics ut
+JOIN
+    Topics t ON ut.TopicID = t.TopicID
+GROUP BY
+    ut.UserID;
+
+CREATE UNIQUE INDEX idx_mv_user_interests ON mv_user_interests(UserID);
+
+-- Session totals per user
+CREATE MATERIALIZED VIEW mv_user_sessions AS
+SELECT
+    s.UserID,
+    COUNT(*) AS TotalSessions,
+    MAX(s.StartTime) AS LastSessionStart,
+    COALESCE(SUM(EXTRACT(EPOCH FROM (s.EndTime - s.StartTime)) / 60), 0)::INTEGER AS TotalSessionMinutes
+FROM
+    Sessions s
+WHERE
+    s.UserID IS NOT NULL
+GROUP BY
+    s.UserID;
+
+CREATE UNIQUE INDEX idx_mv_user_sessions ON mv_user_sessions(UserID);
+
+-- Distinct topics detected in each user's messages (one pass over Messages)
+CREATE MATERIALIZED VIEW mv_user_detected_topics AS
+SELECT
+    user_topics.UserID,
+    string_agg(user_topics.Topic, ', ' ORDER BY user_topics.Topic) AS DetectedTopics
+FROM (
+    SELECT DISTINCT
+        s.UserID,
+        topic.value AS Topic
+    FROM
+        Sessions s
+    JOIN
+        Messages m ON s.SessionID = m.SessionID
+    CROSS JOIN LATERAL
+        jsonb_array_elements_text(m.DetectedTopics) AS topic(value)
+    WHERE
+        s.UserID IS NOT NULL
+        AND m.DetectedTopics IS NOT NULL
+) user_topics
+GROUP BY
+    user_topics.UserID;
+
+CREATE UNIQUE INDEX idx_mv_user_detected_topics ON mv_user_detected_topics(UserID);
+
+-- Appointment and specialist engagement per user
+CREATE MATERIALIZED VIEW mv_user_appointments AS
+SELECT
+    a.UserID,
+    COUNT(*) AS TotalAppointments,
+    COUNT(*) FILTER (WHERE a.Status = 'completed') AS CompletedAppointments,
+    COUNT(*) FILTER (WHERE a.Status = 'canceled') AS CanceledAppointments,
+    COUNT(*) FILTER (WHERE a.Status = 'no-show') AS NoShowAppointments,
+    -- Relative to the last refresh; live dashboards should re-check upcoming appointments
+    COUNT(*) FILTER (WHERE a.Status = 'scheduled' AND a.AppointmentDateTime > CURRENT_TIMESTAMP) AS UpcomingAppointments,
+    MAX(a.AppointmentDateTime) AS LastAppointmentDate,
+    COUNT(DISTINCT a.SpecialistID) AS UniqueSpecialistsConsulted
+FROM
+    Appointments a
+WHERE
+    a.UserID IS NOT NULL
+GROUP BY
+    a.UserID;
+
+CREATE UNIQUE INDEX idx_mv_user_appointments ON mv_user_appointments(UserID);
+
+-- Specializations of the specialists each user has booked
+CREATE MATERIALIZED VIEW mv_user_specializations AS
+SELECT
+    user_specializations.UserID,
+    string_agg(user_specializations.Name, ', ' ORDER BY user_specializations.Name) AS SpecializationsAccessed
+FROM (
+    SELECT DISTINCT
+        a.UserID,
+        sp.Name
+    FROM
+        Appointments a
+    JOIN
+        SpecialistSpecializations ss ON a.SpecialistID = ss.SpecialistID
+    JOIN
+        Specializations sp ON ss.SpecializationID = sp.SpecializationID
+    WHERE
+        a.UserID IS NOT NULL
+) user_specializations
+GROUP BY
+    user_specializations.UserID;
+
+CREATE UNIQUE INDEX idx_mv_user_specializations ON mv_user_specializations(UserID);
+
+-- Feedback per user
+CREATE MATERIALIZED VIEW mv_user_feedback AS
+SELECT
+    f.UserID,
+    ROUND(AVG(f.Rating) FILTER (WHERE f.Category = 'ai-interaction'), 1) AS AvgAIFeedback,
+    COUNT(*) FILTER (WHERE f.Category = 'ai-interaction') AS AIFeedbackCount,
+    ROUND(AVG(f.Rating) FILTER (WHERE f.Category = 'specialist-session'), 1) AS AvgSpecialistFeedback,
+    COUNT(*) FILTER (WHERE f.Category = 'specialist-session') AS SpecialistFeedbackCount
+FROM
+    Feedback f
+WHERE
+    f.UserID IS NOT NULL
+GROUP BY
+    f.UserID;
+
+CREATE UNIQUE INDEX idx_mv_user_feedback ON mv_user_feedback(UserID);
+
+-- System usage per user
+CREATE MATERIALIZED VIEW mv_user_activity AS
+SELECT
+    al.UserID,
+    COUNT(*) AS TotalAuditEvents,
+    MAX(al.Timestamp) AS LastActivity
+FROM
+    AuditLogs al
+WHERE
+    al.UserID IS NOT NULL
+GROUP BY
+    al.UserID;
+
+CREATE UNIQUE INDEX idx_mv_user_activity ON mv_user_activity(UserID);
+
+-- Dashboard view: same columns as the MASTER query, read from the rollups
+CREATE VIEW user_dashboard AS
+SELECT
+    -- User Information
+    u.UserID,
+    u.Name AS UserName,
+    u.UserType,
+    u.JoinDate,
+    u.LastLoginDate,
+    u.PreferredLanguage,
+
+    -- User Topics of Interest
+    ui.UserInterests,
+
+    -- Session Information
+    COALESCE(us.TotalSessions, 0) AS TotalSessions,
+    us.LastSessionStart,
+    COALESCE(us.TotalSessionMinutes, 0) AS TotalSessionMinutes,
+
+    -- Topics from Sessions
+    udt.DetectedTopics,
+
+    -- Appointment Information
+    COALESCE(ua.TotalAppointments, 0) AS TotalAppointments,
+    COALESCE(ua.CompletedAppointments, 0) AS CompletedAppointments,
+    COALESCE(ua.CanceledAppointments, 0) AS CanceledAppointments,
+    COALESCE(ua.NoShowAppointments, 0) AS NoShowAppointments,
+    COALESCE(ua.UpcomingAppointments, 0) AS UpcomingAppointments,
+    ua.LastAppointmentDate,
+
+    -- Specialist Engagement
+    COALESCE(ua.UniqueSpecialistsConsulted, 0) AS UniqueSpecialistsConsulted,
+    usp.SpecializationsAccessed,
+
+    -- Feedback Information
+    uf.AvgAIFeedback,
+    COALESCE(uf.AIFeedbackCount, 0) AS AIFeedbackCount,
+    uf.AvgSpecialistFeedback,
+    COALESCE(uf.SpecialistFeedbackCount, 0) AS SpecialistFeedbackCount,
+
+    -- System Usage Metrics
+    COALESCE(uact.TotalAuditEvents, 0) AS TotalAuditEvents,
+    uact.LastActivity
+FROM
+    Users u
+LEFT JOIN mv_user_interests ui ON ui.UserID = u.UserID
+LEFT JOIN mv_user_sessions us ON us.UserID = u.UserID
+LEFT JOIN mv_user_detected_topics udt ON udt.UserID = u.UserID
+LEFT JOIN mv_user_appointments ua ON ua.UserID = u.UserID
+LEFT JOIN mv_user_specializations usp ON usp.UserID = u.UserID
+LEFT JOIN mv_user_feedback uf ON uf.UserID = u.UserID
+LEFT JOIN mv_user_activity uact ON uact.UserID = u.UserID;
@@ -62,22 +62,49 @@ WHERE
 ORDER BY 
     sa.StartTime;
 
+-- 3b. Next 10 free slots for a specialization (materialized SpecialistSlots)
+SELECT 
+    s.SpecialistID,
+    s.Name,
+    sl.SlotStart,
+    sl.SlotEnd
+FROM 
+    Specializations sp
+JOIN 
+    SpecialistSpecializations ss ON ss.SpecializationID = sp.SpecializationID
+JOIN 
+    Specialists s ON s.SpecialistID = ss.SpecialistID AND s.IsActive = TRUE
+JOIN 
+    SpecialistSlots sl ON sl.SpecialistID = s.SpecialistID
+WHERE 
+    sp.Name = 'Anxiety'
+    AND sl.Status = 'free'
+    AND sl.SlotStart > CURRENT_TIMESTAMP
+ORDER BY 
+    sl.SlotStart
+LIMIT 10;
+
 -- 4. Get user conversation history with detected topics (if session storage is implemented)
+-- Reads the normalized MessageTopics table instead of unnesting DetectedTopics
 SELECT 
     s.SessionID,
     s.StartTime,
     s.EndTime,
-    COUNT(m.MessageID) AS MessageCount,
-    jsonb_array_elements_text(m.DetectedTopics) AS TopicName
+    COUNT(mt.MessageID) AS MessageCount,
+    t.TopicName
 FROM 
     Sessions s
 JOIN 
     Messages m ON s.SessionID = m.SessionID
+JOIN 
+    MessageTopics mt ON mt.MessageID = m.MessageID
+JOIN 
+    Topics t ON t.TopicID = mt.TopicID
 WHERE 
     s.UserID = 456
     AND s.SessionStatus = 'completed'
 GROUP BY 
-    s.SessionID, s.StartTime, s.EndTime, jsonb_array_elements_text(m.DetectedTopics)
+    s.SessionID, s.StartTime, s.EndTime, t.TopicName
 ORDER BY 
     s.StartTime DESC;
 
@@ -111,6 +138,35 @@ GROUP BY
 ORDER BY 
     InterestedUsersCount DESC;
 
+-- 6b. Most discussed topics in conversations over the last 30 days
+-- Reads the daily rollup (refresh_topic_daily_counts), not Messages
+SELECT 
+    t.TopicName,
+    SUM(tdc.MessageCount) AS MessageCount
+FROM 
+    TopicDailyCounts tdc
+JOIN 
+    Topics t ON t.TopicID = tdc.TopicID
+WHERE 
+    tdc.Day >= CURRENT_DATE - 30
+GROUP BY 
+    t.TopicID, t.TopicName
+ORDER BY 
+    MessageCount DESC;
+
+-- 6c. Messages mentioning a topic in a time range (GIN index on DetectedTopics)
+SELECT 
+    m.MessageID,
+    m.SessionID,
+    m.Timestamp
+FROM 
+    Messages m
+WHERE 
+    m.DetectedTopics @> '["anxiety"]'
+    AND m.Timestamp >= CURRENT_DATE - 7
+ORDER BY 
+    m.Timestamp DESC;
+
 -- 7. Find specialists available for appointment for a specific topic/specialization
 SELECT 
     s.SpecialistID,
@@ -230,3 +286,12 @@ GROUP BY
     u.UserID, u.Name, u.UserType, u.JoinDate, u.LastLoginDate, u.PreferredLanguage
 ORDER BY 
     u.JoinDate DESC;
+
+-- MASTER QUERY (precomputed) - same columns, read from the per-user rollups in
+-- lumonmind-reporting-views.sql (refreshed by lumonmind_db_maintenance.py refresh-views)
+SELECT 
+    *
+FROM 
+    user_dashboard
+ORDER BY 
+    JoinDate DESC;
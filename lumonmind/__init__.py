@@ -0,0 +1,44 @@
+"""
+LumonMind chat engine shared by the front ends (lumonmind_flask_v1.py,
+lumonmind_flask_v2.py and the Streamlit app lumonmind_2.py)
+
+    prompt            prompt template loading and system prompt assembly
+    extensions        topic detection and the extension registry
+    providers         ProviderRouter - Qwen -> DeepSeek -> Gemini with shared
+                      clients, endpoint ordering, rate limits and statistics
+    pipeline          one chat turn: detection, prompt assembly, routing
+    conversation_log  indexed day logs with per-turn traces
+
+A front end builds one ExtensionRegistry and one ProviderRouter at startup and
+calls generate_response() for every turn.
+"""
+from lumonmind.prompt import (
+    DEFAULT_PROMPT_PATH, FALLBACK_PROMPT, LANGUAGE_SUPPORT_BLOCK, FIRST_5_MINUTES_INSTRUCTION,
+    PromptError, load_prompt_template, build_system_prompt, personalize_system_prompt
+)
+from lumonmind.extensions import (
+    DEFAULT_EXTENSIONS_DIR, ExtensionRegistry, detect_mental_health_topics, apply_topic_extensions,
+    detect_therapist_request
+)
+from lumonmind.providers import (
+    PROVIDERS, QWEN_ENDPOINTS, DEEPSEEK_ENDPOINTS, GEMINI_ENDPOINT, EXPECTED_COMPLETION_TOKENS,
+    ProviderRouter, create_rate_limiters, annotate_prompt_cache, get_retry_after
+)
+from lumonmind.pipeline import is_first_5_minutes, assemble_prompt, generate_response
+from lumonmind.conversation_log import DEFAULT_LOG_DIR, log_conversation
+
+__all__ = [
+    # prompt
+    "DEFAULT_PROMPT_PATH", "FALLBACK_PROMPT", "LANGUAGE_SUPPORT_BLOCK", "FIRST_5_MINUTES_INSTRUCTION",
+    "PromptError", "load_prompt_template", "build_system_prompt", "personalize_system_prompt",
+    # extensions
+    "DEFAULT_EXTENSIONS_DIR", "ExtensionRegistry", "detect_mental_health_topics", "apply_topic_extensions",
+    "detect_therapist_request",
+    # providers
+    "PROVIDERS", "QWEN_ENDPOINTS", "DEEPSEEK_ENDPOINTS", "GEMINI_ENDPOINT", "EXPECTED_COMPLETION_TOKENS",
+    "ProviderRouter", "create_rate_limiters", "annotate_prompt_cache", "get_retry_after",
+    # pipeline
+    "is_first_5_minutes", "assemble_prompt", "generate_response",
+    # conversation_log
+    "DEFAULT_LOG_DIR", "log_conversation",
+]
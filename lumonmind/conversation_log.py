@@ -0,0 +1,62 @@
+import json
+import os
+from datetime import datetime
+
+from lumonmind_log_index import append_log_record
+from lumonmind_trace import end_turn_trace
+
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+
+
+def log_conversation(user_message, ai_message, model_used, conversation_id, log_dir=DEFAULT_LOG_DIR,
+                     applied_extensions=None):
+    """
+    Append one turn to logs/conversation_YYYYMMDD.json
+
+    The record's offset also goes to the day's sidecar .idx file, and the
+    current turn trace (stage timings, provider attempts, token usage) is
+    detached and written with it. When the file cannot be written (e.g. a
+    read-only filesystem on Streamlit Cloud) the entry is printed instead.
+
+    A turn answered in two parts (the crisis fast path and its LLM follow-up)
+    is logged once with the user's message, then once more with user_message
+    None: an assistant-only addendum that readers must not count as a turn.
+
+    Args:
+        user_message: The user's message, or None for an assistant-only addendum
+        ai_message: The reply sent to the user
+        model_used: Provider that answered ("qwen", "deepseek", "gemini", "error", ...)
+        conversation_id: The conversation/session identifier
+        log_dir: Directory holding the day logs
+        applied_extensions: Topic extensions applied to the prompt for this turn
+
+    Returns:
+        The log entry dictionary, or None if it could not be built
+    """
+    try:
+        log_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "conversation_id": conversation_id,
+            "user_message": user_message,
+            "ai_message": ai_message,
+            "model_used": model_used,
+            "applied_extensions": list(applied_extensions or [])
+        }
+        # Stage timings, provider attempts and token usage of this turn
+        trace = end_turn_trace()
+        if trace is not None:
+            log_entry.update(trace.to_log_fields())
+
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            # Also appends the record's offset to the day's sidecar .idx file
+            log_file = os.path.join(log_dir, f"conversation_{datetime.now().strftime('%Y%m%d')}.json")
+            append_log_record(log_file, log_entry)
+        except Exception as e:
+            # If file writing fails, print to stdout instead
+            print(f"LOG: {json.dumps(log_entry, ensure_ascii=False)}")
+            print(f"File writing error: {e}")
+        return log_entry
+    except Exception as e:
+        print(f"Error logging conversation: {e}")
+        return None
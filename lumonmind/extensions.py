@@ -0,0 +1,163 @@
+import os
+from datetime import datetime
+
+from lumonmind_topics import TOPIC_KEYWORDS, detect_topics
+
+DEFAULT_EXTENSIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "extensions")
+
+# Number of detected topics whose extensions are added to the system prompt
+MAX_EXTENSIONS = 2
+
+
+class ExtensionRegistry:
+    """
+    Topic extension files (extensions/<topic>_extension.md)
+
+    Contents are cached by file modification time, so chat requests only stat
+    the file instead of re-reading it, and edits are picked up without a restart.
+    """
+
+    def __init__(self, extensions_dir=DEFAULT_EXTENSIONS_DIR, topics=None):
+        self.extensions_dir = extensions_dir
+        self.topics = list(topics if topics is not None else TOPIC_KEYWORDS)
+        self.cache = {}
+        # Create extensions directory if it doesn't exist
+        try:
+            os.makedirs(extensions_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Cannot create extensions directory {extensions_dir}: {e}")
+
+    def path_for(self, topic):
+        """Get file path for a topic extension"""
+        return os.path.join(self.extensions_dir, f"{topic}_extension.md")
+
+    def load(self, topic):
+        """Load a specific topic extension content"""
+        try:
+            extension_path = self.path_for(topic)
+            if os.path.exists(extension_path):
+                mtime = os.path.getmtime(extension_path)
+                cached = self.cache.get(topic)
+                if cached and cached[0] == mtime:
+                    return cached[1]
+                with open(extension_path, 'r', encoding='utf-8') as file:
+                    content = file.read()
+                self.cache[topic] = (mtime, content)
+                return content
+            else:
+                print(f"Extension file not found for topic: {topic}")
+                return None
+        except Exception as e:
+            print(f"Error loading extension for {topic}: {str(e)}")
+            return None
+
+    def load_all(self):
+        """Read every topic's extension into the cache (used during warm-up)"""
+        for topic in self.topics:
+            self.load(topic)
+
+    def available(self):
+        """Return {topic: extension file exists}"""
+        return {topic: os.path.exists(self.path_for(topic)) for topic in self.topics}
+
+
+def detect_mental_health_topics(messages, message_threshold=5, keyword_threshold=3):
+    """
+    Analyze conversation to detect mental health topics
+
+    Args:
+        messages: List of message dictionaries with 'role' and 'content'
+        message_threshold: Number of most recent messages to analyze
+        keyword_threshold: Minimum keyword matches to identify a topic
+
+    Returns:
+        List of detected topics ordered by relevance
+    """
+    detected_topics, topic_counts = detect_topics(messages, message_threshold, keyword_threshold)
+
+    # Log detection results
+    print(f"Topic detection results: {topic_counts}")
+    print(f"Detected topics: {detected_topics}")
+
+    return detected_topics
+
+
+def apply_topic_extensions(messages, registry, session_data=None):
+    """
+    Analyze messages and apply relevant topic extensions to the system prompt
+
+    Args:
+        messages: List of message dictionaries
+        registry: ExtensionRegistry the extension texts are loaded from
+        session_data: Optional dictionary updated with 'detected_topics',
+                      'applied_extensions' and 'extension_applied_at'
+
+    Returns:
+        Modified messages list with updated system prompt
+    """
+    # Copy the messages to avoid modifying the original
+    modified_messages = [msg.copy() for msg in messages]
+
+    # Detect topics in the conversation
+    detected_topics = detect_mental_health_topics(messages)
+    if session_data is not None:
+        session_data['detected_topics'] = detected_topics
+
+    # If no topics detected or no system message, return original
+    if not detected_topics:
+        return modified_messages
+
+    # Find the system message
+    system_index = None
+    for i, msg in enumerate(modified_messages):
+        if msg.get('role') == 'system':
+            system_index = i
+            break
+
+    if system_index is None:
+        print("No system message found to modify")
+        return modified_messages
+
+    # Load extensions for the top detected topics. They are emitted in
+    # TOPIC_KEYWORDS order rather than relevance order so the same pair of
+    # extensions always produces the same prompt prefix.
+    top_topics = detected_topics[:MAX_EXTENSIONS]
+    extensions = []
+    for topic in [topic for topic in TOPIC_KEYWORDS if topic in top_topics]:
+        extension_content = registry.load(topic)
+        if extension_content:
+            extensions.append(extension_content)
+
+    # Update the system message with extensions
+    if extensions:
+        modified_messages[system_index]['content'] += "\n\n" + "\n\n".join(extensions)
+
+        # Log the modification
+        print(f"Applied topic extensions: {top_topics}")
+
+        # Update session data if provided
+        if session_data is not None:
+            session_data['applied_extensions'] = top_topics
+            session_data['extension_applied_at'] = datetime.now().isoformat()
+
+    return modified_messages
+
+
+THERAPIST_KEYWORDS = [
+    "talk to a therapist", "speak to a therapist",
+    "talk to a counselor", "speak to a counselor",
+    "human therapist", "real therapist",
+    "book appointment", "schedule appointment",
+    "see a professional", "talk to a professional",
+    "book a session", "talk to a human",
+    "need real help", "want real help",
+    "see a therapist", "therapist appointment",
+    "need a therapist", "want a therapist",
+    "consult with a counselor", "meet with a therapist"
+]
+
+
+def detect_therapist_request(user_message):
+    """Detect if user is requesting to speak with a human therapist or counselor"""
+    user_message_lower = user_message.lower()
+    return any(keyword in user_message_lower for keyword in THERAPIST_KEYWORDS)
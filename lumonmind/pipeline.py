@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from lumonmind.extensions import apply_topic_extensions
+from lumonmind.prompt import FIRST_5_MINUTES_INSTRUCTION
+from lumonmind_trace import traced_stage
+
+# Length of the window after the first message in which the counselor rule applies
+FIRST_MINUTES_SECONDS = 300
+
+
+def is_first_5_minutes(chat_start_time, now=None):
+    """
+    Whether a chat is still in its first 5 minutes
+
+    Args:
+        chat_start_time: datetime or ISO-format string (None = chat not started)
+        now: Current time (defaults to datetime.now())
+    """
+    if not chat_start_time:
+        return False
+    try:
+        if isinstance(chat_start_time, str):
+            chat_start_time = datetime.fromisoformat(chat_start_time)
+        chat_duration = (now or datetime.now()) - chat_start_time
+    except (TypeError, ValueError) as e:
+        print(f"Error parsing chat start time: {e}")
+        return False
+    print(f"DEBUG: Chat duration: {chat_duration.total_seconds()} seconds. "
+          f"First 5 minutes: {chat_duration.total_seconds() < FIRST_MINUTES_SECONDS}")
+    return chat_duration.total_seconds() < FIRST_MINUTES_SECONDS
+
+
+def assemble_prompt(messages, registry, session_data=None, first_5_minutes=False):
+    """
+    Build the messages sent to the providers for one turn
+
+    The system prompt is assembled as base prompt -> language block -> topic
+    extensions, which is the stable prefix marked with 'cache_prefix_length'
+    for provider prompt caching; volatile instructions (the first-5-minutes
+    counselor rule) are appended after it.
+
+    Args:
+        messages: The conversation (system message first); not modified
+        registry: ExtensionRegistry for the topic extensions
+        session_data: Optional dictionary receiving 'detected_topics',
+                      'applied_extensions' and 'extension_applied_at'
+        first_5_minutes: Apply the first-5-minutes counselor rule
+
+    Returns:
+        New list of message dictionaries
+    """
+    with traced_stage("extensions"):
+        modified_messages = apply_topic_extensions(
+            [msg for msg in messages if isinstance(msg, dict)], registry, session_data
+        )
+
+    for msg in modified_messages:
+        if msg.get("role") == "system":
+            # Record where the stable prefix ends, then apply volatile instructions last
+            msg["cache_prefix_length"] = len(msg["content"])
+            if first_5_minutes:
+                # Add instruction to avoid counselor references unless crisis
+                msg["content"] += FIRST_5_MINUTES_INSTRUCTION
+                print("DEBUG: Added 5-minute instruction to system message")
+            break
+    else:
+        if first_5_minutes:
+            print("DEBUG: No system message found to modify for 5-minute rule")
+
+    return modified_messages
+
+
+def generate_response(messages, router, registry, session_data=None, first_5_minutes=False, session_id=None):
+    """
+    Run one chat turn through the engine: topic detection, prompt assembly
+    and provider routing
+
+    Args:
+        messages: The conversation so far, ending with the user's message
+        router: ProviderRouter used for the provider calls
+        registry: ExtensionRegistry for the topic extensions
+        session_data: Optional dictionary receiving the topic/extension state
+        first_5_minutes: Apply the first-5-minutes counselor rule
+        session_id: Conversation identifier (used in failure logs)
+
+    Returns:
+        Tuple of (response text, provider name or "error")
+    """
+    modified_messages = assemble_prompt(messages, registry, session_data, first_5_minutes)
+    return router.respond(modified_messages, session_id)
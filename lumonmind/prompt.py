@@ -0,0 +1,104 @@
+import os
+
+DEFAULT_PROMPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lumonmind_prompt.md")
+
+# Used by front ends that prefer to keep serving when the prompt file is missing
+FALLBACK_PROMPT = """You are LumonMind, an AI mental health companion. Your goal is to provide support,
+                   empathy, and helpful information to users experiencing mental health challenges.
+                   Always be supportive, non-judgmental, and compassionate."""
+
+# Language support block - always placed directly after the base prompt so the
+# two together form a stable prefix that providers can cache across requests
+LANGUAGE_SUPPORT_BLOCK = """
+
+## Language Support
+You are capable of understanding multiple languages, including:
+1. English
+2. Hindi in Roman script (Hinglish/Romanized Hindi)
+3. Many other languages
+
+If users write in Romanized Hindi (Hindi written using English letters), please:
+1. Understand their message completely
+2. Respond in the SAME language format they used
+3. NEVER convert Romanized Hindi to Devanagari script
+4. NEVER explain that you understand Hindi or mention language switching
+
+Example Hinglish/Romanized Hindi phrases you should understand:
+- "Main bahut tension mein hoon" (respond in same Roman script)
+- "Mujhe neend nahi aati hai" (respond in same Roman script)
+- "Main bahut pareshan feel kar raha hoon" (respond in same Roman script)
+- "Maa-baap naraz hai mujhse" (respond in same Roman script)
+- "Log kya kahenge" (respond in same Roman script)
+
+Always maintain the user's language choice and format in your responses.
+"""
+
+# Instruction applied only during the first 5 minutes of a chat. Volatile
+# instructions like this one are always appended last (after any topic
+# extensions) so they never shift the cacheable part of the prompt.
+FIRST_5_MINUTES_INSTRUCTION = "\n\n## IMPORTANT TEMPORARY INSTRUCTION\nFor the first 5 minutes of this conversation, DO NOT suggest or refer the user to a counselor UNLESS they express crisis-level concerns (suicidal thoughts, self-harm, harm to others, or severe emotional distress). Focus on providing direct support and coping strategies yourself instead."
+
+
+class PromptError(Exception):
+    """Raised when no usable prompt template can be found"""
+
+
+def load_prompt_template(prompt_path=DEFAULT_PROMPT_PATH, secret_loader=None, fallback=None):
+    """
+    Load the base prompt template
+
+    Args:
+        prompt_path: Path of the prompt markdown file
+        secret_loader: Optional callable returning the prompt from a secret
+                       store, tried when the file does not exist
+        fallback: Prompt returned (with a warning) when no source is usable;
+                  if None, PromptError is raised instead
+
+    Returns:
+        The prompt template text
+    """
+    try:
+        if os.path.exists(prompt_path):
+            with open(prompt_path, "r", encoding="utf-8") as f:
+                prompt_content = f.read()
+            if not prompt_content or len(prompt_content.strip()) < 10:
+                raise PromptError("Prompt file exists but appears to be empty or too short.")
+            return prompt_content
+
+        if secret_loader is not None:
+            prompt_content = secret_loader()
+            if prompt_content is not None:
+                if len(prompt_content.strip()) < 10:
+                    raise PromptError("Prompt content in secrets appears to be empty or too short.")
+                return prompt_content
+
+        raise PromptError("Cannot find prompt template file.")
+    except Exception as e:
+        if fallback is None:
+            raise e if isinstance(e, PromptError) else PromptError(f"Cannot load prompt template: {e}")
+        print(f"WARNING: {e} Using fallback prompt.")
+        return fallback
+
+
+def build_system_prompt(base_prompt):
+    """Base prompt followed by the language block (the cacheable prefix)"""
+    return base_prompt + LANGUAGE_SUPPORT_BLOCK
+
+
+def personalize_system_prompt(system_prompt, name, language=None, concerns=None):
+    """
+    Append the user's onboarding details to the system prompt
+
+    Args:
+        system_prompt: The shared system prompt
+        name: The name the user wants to be called
+        language: Optional preferred language
+        concerns: Optional list of concerns the user is seeking help with
+    """
+    if concerns:
+        system_prompt += f"\n\nThe user's name is {name} and they're seeking help with: {', '.join(concerns)}."
+    else:
+        system_prompt += f"\n\nThe user's name is {name}."
+    if language:
+        system_prompt += f"\n\nThe user's preferred language is {language}."
+    return system_prompt
@@ -0,0 +1,789 @@
+import importlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from lumonmind_rate_limit import ProviderRateLimiter, estimate_tokens
+from lumonmind_trace import traced_stage, trace_provider_attempt, trace_token_usage
+
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+
+# Providers in the order they are tried
+PROVIDERS = ("qwen", "deepseek", "gemini")
+
+# Provider endpoints, tried in order (fastest warm-up probe first)
+QWEN_ENDPOINTS = [
+    "https://dashscope.aliyuncs.com/v1",
+    "https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
+]
+DEEPSEEK_ENDPOINTS = [
+    "https://api.deepseek.com/v1/chat/completions",
+    "https://api.deepseek.ai/v1/chat/completions"  # Alternative endpoint
+]
+GEMINI_ENDPOINT = "generativelanguage.googleapis.com"
+
+# Gemini models tried after the configured one
+GEMINI_FALLBACK_MODELS = ["gemini-1.5-pro", "gemini-pro"]
+
+# Provider SDK plugins. Each SDK is imported at most once, only if the
+# provider's API key is configured. DeepSeek is called over plain HTTP.
+PROVIDER_SDK_MODULES = {
+    "qwen": "openai",
+    "gemini": "google.generativeai"
+}
+
+# Expected completion size used when reserving tokens-per-minute capacity
+EXPECTED_COMPLETION_TOKENS = 400
+
+NO_PROVIDER_MESSAGE = "Sorry, the AI service is currently unavailable. Please check your API key configuration."
+ALL_PROVIDERS_FAILED_MESSAGE = "I'm sorry, I'm having connectivity issues right now. Please try again later. The server team has been notified of this issue."
+
+# Set safety settings to be more permissive for mental health discussions
+GEMINI_SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"}
+]
+
+
+def create_rate_limiters(max_queue=20, max_wait_seconds=10):
+    """
+    Per-provider token-bucket rate limits (requests/min and tokens/min) from
+    <PROVIDER>_RPM and <PROVIDER>_TPM. Callers wait in a bounded queue for
+    capacity; when it is full the provider is skipped.
+    """
+    return {
+        provider: ProviderRateLimiter(
+            provider,
+            requests_per_minute=int(os.getenv(f'{provider.upper()}_RPM', 60)),
+            tokens_per_minute=int(os.getenv(f'{provider.upper()}_TPM', 120000)),
+            max_queue=max_queue,
+            max_wait_seconds=max_wait_seconds
+        )
+        for provider in PROVIDERS
+    }
+
+
+def get_retry_after(headers):
+    """Parse a Retry-After header value in seconds, or None"""
+    try:
+        value = headers.get('retry-after') if headers else None
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def annotate_prompt_cache(msg):
+    """
+    Convert a system message into DashScope's content-block format with an
+    explicit cache marker on the stable prefix.
+
+    Args:
+        msg: System message dictionary. 'cache_prefix_length' (if present) marks
+             where the stable prefix ends and volatile instructions begin.
+
+    Returns:
+        List of content blocks for the OpenAI-compatible API
+    """
+    content = msg['content']
+    prefix_length = msg.get('cache_prefix_length', len(content))
+    blocks = [{
+        "type": "text",
+        "text": content[:prefix_length],
+        "cache_control": {"type": "ephemeral"}
+    }]
+    if content[prefix_length:]:
+        blocks.append({"type": "text", "text": content[prefix_length:]})
+    return blocks
+
+
+class ProviderRouter:
+    """
+    Routes a chat completion through Qwen, then DeepSeek, then Gemini
+
+    Holds everything a provider call needs for the life of the process: the
+    lazily imported SDKs, one OpenAI client per DashScope endpoint and one HTTP
+    session for DeepSeek (so connection pools and TLS sessions stay warm), the
+    warm-up probe results that order endpoints by RTT, the rate limiters, and
+    the health and prompt cache statistics reported by the status endpoints.
+
+    Every front end builds one router at startup and shares it across requests.
+    """
+
+    def __init__(self, api_keys, models, timeout=60, limiters=None, prompt_cache=True,
+                 log_dir=DEFAULT_LOG_DIR, warmup_timeout=10):
+        """
+        Args:
+            api_keys: {"qwen": key, "deepseek": key, "gemini": key} (None = skip)
+            models: {"qwen": model, "deepseek": model, "gemini": model}
+            timeout: Timeout (seconds) for a single provider request
+            limiters: {provider: ProviderRateLimiter}; create_rate_limiters() if None
+            prompt_cache: Send DashScope cache markers on the stable prompt prefix
+            log_dir: Directory for error_log_* and api_failure_* files
+            warmup_timeout: Timeout (seconds) for the warm-up probes
+        """
+        self.api_keys = dict(api_keys)
+        self.models = dict(models)
+        self.endpoints = {
+            "qwen": list(QWEN_ENDPOINTS),
+            "deepseek": list(DEEPSEEK_ENDPOINTS),
+            "gemini": [GEMINI_ENDPOINT]
+        }
+        self.timeout = timeout
+        self.limiters = limiters if limiters is not None else create_rate_limiters()
+        self.prompt_cache = prompt_cache
+        self.log_dir = log_dir
+        self.warmup_timeout = warmup_timeout
+
+        self.sdks = {}
+        self.sdk_startup = {}
+        self.sdks_lock = threading.Lock()
+        self.qwen_clients = {}
+        self.qwen_clients_lock = threading.Lock()
+        self.http = requests.Session()
+
+        # Results of the warm-up probes (key check + measured RTT) per provider endpoint
+        self.endpoint_probes = {provider: {} for provider in PROVIDERS}
+
+        # Running prompt cache statistics per provider, filled from provider usage fields
+        self.prompt_cache_stats = {
+            provider: {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+            for provider in PROVIDERS
+        }
+        self.prompt_cache_lock = threading.Lock()
+
+        # Recent provider outcomes for the health and status endpoints
+        self.health = {
+            provider: {"latencies": deque(maxlen=50), "successes": 0, "failures": 0,
+                       "consecutive_failures": 0, "last_success": None, "last_failure": None}
+            for provider in PROVIDERS
+        }
+        self.health_lock = threading.Lock()
+
+    # SDKs and clients
+
+    def load_sdk(self, provider):
+        """
+        Import (once) and return the SDK module for a provider
+
+        Args:
+            provider (str): The API provider ("qwen" or "gemini")
+
+        Returns:
+            The imported module, or None if the key is missing or the import failed
+        """
+        if provider in self.sdks:
+            return self.sdks[provider]
+
+        with self.sdks_lock:
+            if provider in self.sdks:
+                return self.sdks[provider]
+
+            api_key = self.api_keys.get(provider)
+            module_name = PROVIDER_SDK_MODULES[provider]
+            if not api_key:
+                self.sdk_startup[provider] = {"module": module_name, "loaded": False,
+                                              "reason": "no API key", "import_seconds": 0.0}
+                self.sdks[provider] = None
+                return None
+
+            start_time = time.time()
+            # Silence stderr while importing - google.generativeai is noisy on import
+            old_stderr = sys.stderr
+            sys.stderr = io.StringIO()
+            try:
+                module = importlib.import_module(module_name)
+                if provider == "gemini":
+                    module.configure(api_key=api_key)
+                reason = None
+            except ImportError as e:
+                module = None
+                reason = f"import failed: {e}"
+            finally:
+                sys.stderr = old_stderr
+
+            elapsed = time.time() - start_time
+            self.sdk_startup[provider] = {"module": module_name, "loaded": module is not None,
+                                          "reason": reason, "import_seconds": round(elapsed, 3)}
+            self.sdks[provider] = module
+            print(f"Provider SDK {module_name} for {provider}: "
+                  f"{'loaded' if module else reason} in {elapsed:.2f} seconds")
+            return module
+
+    def load_sdks(self):
+        """Import every configured provider SDK"""
+        for provider in PROVIDER_SDK_MODULES:
+            self.load_sdk(provider)
+        return self.sdk_startup
+
+    def get_qwen_client(self, endpoint):
+        """Return the shared OpenAI client for a DashScope endpoint"""
+        client = self.qwen_clients.get(endpoint)
+        if client is None:
+            openai_sdk = self.load_sdk("qwen")
+            if openai_sdk is None:
+                raise ImportError("openai")
+            with self.qwen_clients_lock:
+                client = self.qwen_clients.get(endpoint)
+                if client is None:
+                    client = openai_sdk.OpenAI(api_key=self.api_keys["qwen"], base_url=endpoint)
+                    self.qwen_clients[endpoint] = client
+        return client
+
+    def ordered_endpoints(self, provider):
+        """
+        Order a provider's endpoints by the RTT measured during warm-up
+
+        Endpoints that answered the warm-up probe come first (fastest first);
+        unprobed or failing endpoints keep their configured order after them.
+        """
+        endpoints = self.endpoints[provider]
+        probes = self.endpoint_probes.get(provider, {})
+        healthy = sorted(
+            (endpoint for endpoint in endpoints if probes.get(endpoint, {}).get("status") == "ok"),
+            key=lambda endpoint: probes[endpoint]["rtt_seconds"]
+        )
+        return healthy + [endpoint for endpoint in endpoints if endpoint not in healthy]
+
+    # Statistics
+
+    def record_prompt_cache_usage(self, provider, prompt_tokens, cached_tokens):
+        """Add one response's prompt token usage to the cache statistics"""
+        with self.prompt_cache_lock:
+            stats = self.prompt_cache_stats[provider]
+            stats["requests"] += 1
+            stats["prompt_tokens"] += int(prompt_tokens or 0)
+            stats["cached_tokens"] += int(cached_tokens or 0)
+
+    def get_prompt_cache_stats(self):
+        """Return a snapshot of the prompt cache statistics with hit ratios"""
+        with self.prompt_cache_lock:
+            snapshot = {}
+            for provider, stats in self.prompt_cache_stats.items():
+                snapshot[provider] = dict(stats)
+                snapshot[provider]["hit_ratio"] = (
+                    round(stats["cached_tokens"] / stats["prompt_tokens"], 4)
+                    if stats["prompt_tokens"] else 0.0
+                )
+        return snapshot
+
+    def record_attempt(self, provider, elapsed, success):
+        """Record the latency and outcome of one provider call"""
+        with self.health_lock:
+            health = self.health[provider]
+            health["latencies"].append(elapsed)
+            if success:
+                health["successes"] += 1
+                health["consecutive_failures"] = 0
+                health["last_success"] = datetime.now().isoformat()
+            else:
+                health["failures"] += 1
+                health["consecutive_failures"] += 1
+                health["last_failure"] = datetime.now().isoformat()
+
+    def get_health(self):
+        """Summarize provider state and recent latencies"""
+        with self.health_lock:
+            summary = {}
+            for provider, health in self.health.items():
+                latencies = sorted(health["latencies"])
+                if health["consecutive_failures"] >= 3:
+                    state = "failing"
+                elif health["consecutive_failures"] > 0:
+                    state = "degraded"
+                else:
+                    state = "healthy"
+                summary[provider] = {
+                    "state": state,
+                    "successes": health["successes"],
+                    "failures": health["failures"],
+                    "consecutive_failures": health["consecutive_failures"],
+                    "last_success": health["last_success"],
+                    "last_failure": health["last_failure"],
+                    "recent_latency_seconds": {
+                        "count": len(latencies),
+                        "p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                        "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else None,
+                        "last": round(health["latencies"][-1], 3) if latencies else None
+                    }
+                }
+        return summary
+
+    def log_error(self, message, file_prefix="error_log"):
+        """Append a line to today's error_log_*.txt (or api_failure_*.txt)"""
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            error_log = os.path.join(self.log_dir, f"{file_prefix}_{datetime.now().strftime('%Y%m%d')}.txt")
+            with open(error_log, "a") as f:
+                f.write(f"[{datetime.now().isoformat()}] {message}\n")
+        except OSError as e:
+            print(f"Cannot write {file_prefix} entry: {e}")
+
+    # Provider calls
+
+    def call_qwen(self, messages):
+        """Call the Qwen API through Alibaba Cloud using OpenAI client"""
+        api_key = self.api_keys.get("qwen")
+        try:
+            if not api_key:
+                print("Qwen API key is missing.")
+                return None, None
+
+            try:
+                if self.load_sdk("qwen") is None:
+                    raise ImportError("openai")
+
+                # Print API key (first few characters for debugging)
+                print(f"Using Qwen API key: {api_key[:5]}...")
+
+                # Convert messages for Qwen API - ensure all have role and content
+                api_messages = []
+                for msg in messages:
+                    if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
+                        # Make sure content is string
+                        if not isinstance(msg['content'], str):
+                            msg['content'] = str(msg['content'])
+                        # Mark the stable system prompt prefix for DashScope context caching
+                        if self.prompt_cache and msg['role'] == 'system':
+                            content = annotate_prompt_cache(msg)
+                        else:
+                            content = msg['content']
+                        api_messages.append({'role': msg['role'], 'content': content})
+
+                # Debug logging
+                print("Sending to Qwen API:", json.dumps(api_messages, indent=2)[:500] + "...")
+
+                # Try each endpoint until one works
+                last_error = None
+                for endpoint in self.ordered_endpoints("qwen"):
+                    attempt_start = time.time()
+                    try:
+                        print(f"Trying Qwen API endpoint: {endpoint}")
+                        client = self.get_qwen_client(endpoint)
+
+                        completion = client.chat.completions.create(
+                            model=self.models["qwen"],
+                            messages=api_messages,
+                            temperature=0.7,
+                            max_tokens=2000,
+                            timeout=self.timeout
+                        )
+
+                        # Extract content from response
+                        content = completion.choices[0].message.content
+                        print(f"Qwen API returned content of length: {len(content)}")
+                        trace_provider_attempt("qwen", endpoint, time.time() - attempt_start)
+
+                        # Record prompt cache usage (cached_tokens is reported under prompt_tokens_details)
+                        usage = getattr(completion, 'usage', None)
+                        if usage is not None:
+                            details = getattr(usage, 'prompt_tokens_details', None)
+                            self.record_prompt_cache_usage(
+                                "qwen",
+                                getattr(usage, 'prompt_tokens', 0),
+                                getattr(details, 'cached_tokens', 0) if details else 0
+                            )
+                            trace_token_usage(
+                                "qwen",
+                                getattr(usage, 'prompt_tokens', None),
+                                getattr(usage, 'completion_tokens', None),
+                                getattr(details, 'cached_tokens', None) if details else None
+                            )
+                            self.limiters["qwen"].record_usage(
+                                estimate_tokens(messages, EXPECTED_COMPLETION_TOKENS),
+                                getattr(usage, 'total_tokens', 0)
+                            )
+                        return content, "qwen"
+
+                    except Exception as e:
+                        print(f"Qwen API Error with endpoint {endpoint}: {str(e)}")
+                        trace_provider_attempt("qwen", endpoint, time.time() - attempt_start, type(e).__name__)
+                        last_error = e
+                        if getattr(e, 'status_code', None) == 429:
+                            # Both endpoints share the same quota - back off instead of retrying
+                            response_headers = getattr(getattr(e, 'response', None), 'headers', None)
+                            self.limiters["qwen"].record_rate_limited(get_retry_after(response_headers))
+                            break
+                        continue  # Try the next endpoint
+
+                # If we get here, all endpoints failed
+                print(f"All Qwen API endpoints failed. Last error: {str(last_error)}")
+                self.log_error(f"All Qwen API endpoints failed. Last error: {str(last_error)}")
+                return None, None
+
+            except ImportError:
+                print("OpenAI module not installed. Please run: pip install openai>=1.0.0")
+                return None, None
+
+        except Exception as e:
+            print(f"Qwen API failed with error: {e}")
+            self.log_error(f"Qwen Exception: {str(e)}")
+            return None, None
+
+    def call_deepseek(self, messages):
+        """Call the DeepSeek API with improved error handling and reliability"""
+        api_key = self.api_keys.get("deepseek")
+        try:
+            if not api_key:
+                print("DeepSeek API key is missing.")
+                return None, None
+
+            headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            }
+
+            # Print API key (first few characters for debugging)
+            print(f"Using DeepSeek API key: {api_key[:5]}...")
+
+            # Properly format messages for DeepSeek API
+            api_messages = []
+            for msg in messages:
+                if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
+                    # Make sure content is string
+                    if not isinstance(msg['content'], str):
+                        msg['content'] = str(msg['content'])
+                    api_messages.append({'role': msg['role'], 'content': msg['content']})
+
+            payload = {
+                "model": self.models["deepseek"],
+                "messages": api_messages,
+                "temperature": 0.7,
+                "max_tokens": 2000
+            }
+
+            # Debug logging
+            print("Sending to DeepSeek API:", json.dumps(api_messages, indent=2)[:500] + "...")
+
+            last_error = None
+            for endpoint_url in self.ordered_endpoints("deepseek"):
+                attempt_start = time.time()
+                try:
+                    print(f"Calling DeepSeek API at: {endpoint_url}")
+
+                    response = self.http.post(
+                        endpoint_url,
+                        headers=headers,
+                        json=payload,
+                        timeout=self.timeout
+                    )
+
+                    print(f"DeepSeek API Response Status: {response.status_code}")
+                    trace_provider_attempt("deepseek", endpoint_url, time.time() - attempt_start,
+                                           None if response.status_code == 200 else f"HTTP {response.status_code}")
+
+                    if response.status_code == 200:
+                        response_json = response.json()
+                        print(f"DeepSeek API Response: {response_json}")
+
+                        # DeepSeek caches repeated prefixes automatically and reports hits in usage
+                        usage = response_json.get("usage") or {}
+                        if usage:
+                            self.record_prompt_cache_usage(
+                                "deepseek",
+                                usage.get("prompt_tokens", 0),
+                                usage.get("prompt_cache_hit_tokens", 0)
+                            )
+                            trace_token_usage(
+                                "deepseek",
+                                usage.get("prompt_tokens"),
+                                usage.get("completion_tokens"),
+                                usage.get("prompt_cache_hit_tokens")
+                            )
+                            self.limiters["deepseek"].record_usage(
+                                estimate_tokens(messages, EXPECTED_COMPLETION_TOKENS),
+                                usage.get("total_tokens", 0)
+                            )
+                        return response_json["choices"][0]["message"]["content"], "deepseek"
+                    elif response.status_code == 429:
+                        # Rate limited - both endpoints share the same quota, so back off
+                        print(f"DeepSeek API rate limited at {endpoint_url}")
+                        self.limiters["deepseek"].record_rate_limited(get_retry_after(response.headers))
+                        last_error = response.text
+                        break
+                    else:
+                        print(f"DeepSeek API Error with endpoint {endpoint_url}: {response.text}")
+                        last_error = response.text
+                        continue  # Try the next endpoint
+                except requests.exceptions.RequestException as e:
+                    print(f"DeepSeek API connection error with endpoint {endpoint_url}: {str(e)}")
+                    trace_provider_attempt("deepseek", endpoint_url, time.time() - attempt_start, type(e).__name__)
+                    last_error = str(e)
+                    continue  # Try the next endpoint
+
+            # If we get here, all endpoints failed
+            print(f"All DeepSeek API endpoints failed. Last error: {last_error}")
+            self.log_error(f"All DeepSeek API endpoints failed. Last error: {last_error}")
+            return None, None
+
+        except Exception as e:
+            print(f"DeepSeek API failed with error: {e}")
+            self.log_error(f"DeepSeek Exception: {str(e)}")
+            return None, None
+
+    def call_gemini(self, messages):
+        """Call the Google Gemini API, trying the fallback models in turn"""
+        api_key = self.api_keys.get("gemini")
+        try:
+            if not api_key:
+                print("Gemini API key is missing.")
+                return None, None
+
+            try:
+                # SDK is imported and configured once by load_sdk
+                genai = self.load_sdk("gemini")
+                if genai is None:
+                    raise ImportError("google.generativeai")
+
+                # Debug logging
+                print(f"Using Gemini API with key: {api_key[:5]}...")
+
+                # Gemini has no system role - prepend the system prompt to the first user message
+                gemini_messages = []
+                system_content = next((msg["content"] for msg in messages if msg["role"] == "system"), None)
+                for msg in messages:
+                    if msg["role"] == "user":
+                        if system_content and len(gemini_messages) == 0:
+                            content = f"{system_content}\n\nUser: {msg['content']}"
+                            gemini_messages.append({"role": "user", "parts": [content]})
+                            system_content = None  # Clear so we don't use it again
+                        else:
+                            gemini_messages.append({"role": "user", "parts": [msg["content"]]})
+                    elif msg["role"] == "assistant":
+                        gemini_messages.append({"role": "model", "parts": [msg["content"]]})
+
+                # Debug logging
+                print(f"Sending to Gemini API, {len(gemini_messages)} messages")
+
+                last_error = None
+                for model_name in [self.models["gemini"]] + GEMINI_FALLBACK_MODELS:
+                    attempt_start = time.time()
+                    try:
+                        print(f"Trying Gemini model: {model_name}")
+                        model = genai.GenerativeModel(model_name)
+                    except Exception as model_err:
+                        print(f"Gemini model initialization error with {model_name}: {str(model_err)}")
+                        trace_provider_attempt("gemini", model_name, time.time() - attempt_start,
+                                               type(model_err).__name__)
+                        last_error = model_err
+                        continue  # Try the next model
+
+                    try:
+                        # Generate the content with safety settings if supported by the model
+                        try:
+                            response = model.generate_content(
+                                gemini_messages,
+                                safety_settings=GEMINI_SAFETY_SETTINGS,
+                                generation_config={"temperature": 0.7, "max_output_tokens": 2000}
+                            )
+                        except TypeError:
+                            # If safety_settings not supported by this model version
+                            response = model.generate_content(
+                                gemini_messages,
+                                generation_config={"temperature": 0.7, "max_output_tokens": 2000}
+                            )
+
+                        # Gemini reports implicitly cached prefix tokens in usage_metadata
+                        usage = getattr(response, 'usage_metadata', None)
+                        if usage is not None:
+                            self.record_prompt_cache_usage(
+                                "gemini",
+                                getattr(usage, 'prompt_token_count', 0),
+                                getattr(usage, 'cached_content_token_count', 0)
+                            )
+                            trace_token_usage(
+                                "gemini",
+                                getattr(usage, 'prompt_token_count', None),
+                                getattr(usage, 'candidates_token_count', None),
+                                getattr(usage, 'cached_content_token_count', None)
+                            )
+                            self.limiters["gemini"].record_usage(
+                                estimate_tokens(messages, EXPECTED_COMPLETION_TOKENS),
+                                getattr(usage, 'total_token_count', 0)
+                            )
+
+                        if hasattr(response, 'text'):
+                            trace_provider_attempt("gemini", model_name, time.time() - attempt_start)
+                            return response.text, "gemini"
+                        elif hasattr(response, 'parts'):
+                            trace_provider_attempt("gemini", model_name, time.time() - attempt_start)
+                            return response.parts[0].text, "gemini"
+                        else:
+                            print(f"Unexpected response format from Gemini: {response}")
+                            trace_provider_attempt("gemini", model_name, time.time() - attempt_start,
+                                                   "UnexpectedResponse")
+                            last_error = "Unexpected response format"
+                            continue  # Try the next model
+
+                    except Exception as api_err:
+                        print(f"Gemini API call error with model {model_name}: {str(api_err)}")
+                        trace_provider_attempt("gemini", model_name, time.time() - attempt_start,
+                                               type(api_err).__name__)
+                        last_error = api_err
+                        if type(api_err).__name__ == 'ResourceExhausted' or '429' in str(api_err):
+                            # Quota is per project, so the other models would be rejected too
+                            self.limiters["gemini"].record_rate_limited()
+                            break
+                        continue  # Try the next model
+
+                # If we get here, all models failed
+                print(f"All Gemini API models failed. Last error: {last_error}")
+                self.log_error(f"All Gemini API models failed. Last error: {str(last_error)}")
+                return None, None
+
+            except ImportError:
+                print("Google AI module not installed. Please run: pip install google-generativeai>=0.3.0")
+                return None, None
+
+        except Exception as e:
+            print(f"Gemini API failed with error: {e}")
+            self.log_error(f"Gemini Exception: {str(e)}")
+            return None, None
+
+    def limiter_admits(self, provider, estimated_tokens):
+        """Reserve rate limiter capacity for a provider call, tracing the wait and any shed"""
+        start_time = time.time()
+        with traced_stage("rate_limit_wait"):
+            admitted = self.limiters[provider].acquire(estimated_tokens)
+        if not admitted:
+            trace_provider_attempt(provider, None, time.time() - start_time, "RateLimited")
+        return admitted
+
+    def respond(self, messages, session_id=None):
+        """
+        Try each provider in order until one succeeds
+
+        Args:
+            messages: Final messages (system prompt already assembled)
+            session_id: Conversation the call belongs to, for the failure log
+
+        Returns:
+            Tuple of (response text, provider name), or a user-facing error
+            message and "error" when no provider answered
+        """
+        if not any(self.api_keys.get(provider) for provider in PROVIDERS):
+            return NO_PROVIDER_MESSAGE, "error"
+
+        # Token estimate used to reserve rate limiter capacity for each provider attempt
+        estimated_tokens = estimate_tokens(messages, EXPECTED_COMPLETION_TOKENS)
+        print("Starting API call sequence with keys: " + ", ".join(
+            f"{provider}: {bool(self.api_keys.get(provider))}" for provider in PROVIDERS))
+
+        for provider in PROVIDERS:
+            if not self.api_keys.get(provider):
+                print(f"Skipping {provider} API (no API key)")
+                continue
+            if not self.limiter_admits(provider, estimated_tokens):
+                print(f"Skipping {provider} API (rate limit reached)")
+                continue
+            print(f"Attempting to call {provider} API...")
+            start_time = time.time()
+            with traced_stage("providers"):
+                # Looked up by name so benchmarks can replace a provider call
+                response, source = getattr(self, f"call_{provider}")(messages)
+            elapsed = time.time() - start_time
+            self.record_attempt(provider, elapsed, bool(response))
+            if response:
+                print(f"Successfully received response from {provider} API in {elapsed:.2f} seconds")
+                return response, source
+            print(f"{provider} API failed after {elapsed:.2f} seconds")
+
+        # Write detailed error log with message data for debugging
+        details = [f"All API calls failed for session {session_id}",
+                   "API keys available: " + ", ".join(
+                       f"{provider}: {bool(self.api_keys.get(provider))}" for provider in PROVIDERS),
+                   f"Message count: {len(messages)}",
+                   "First few messages (truncated):"]
+        for i, msg in enumerate(messages[:3]):
+            if isinstance(msg, dict):
+                content = msg.get('content', '')
+                content = content[:100] + '...' if len(content) > 100 else content
+                details.append(f"  Message {i}: Role={msg.get('role', 'unknown')}, Content={content}")
+        self.log_error("\n".join(details), file_prefix="api_failure")
+        return ALL_PROVIDERS_FAILED_MESSAGE, "error"
+
+    # Warm-up
+
+    def probe(self, provider, endpoint):
+        """
+        Connect to a provider endpoint with a cheap authenticated request
+
+        This resolves DNS and opens the TCP/TLS connection in the shared client's
+        pool, checks the API key, and measures the round-trip time.
+
+        Returns:
+            Tuple of (provider, endpoint, probe result dictionary)
+        """
+        start_time = time.time()
+        try:
+            if provider == "qwen":
+                self.get_qwen_client(endpoint).models.list(timeout=self.warmup_timeout)
+            elif provider == "deepseek":
+                models_url = endpoint.rsplit('/chat/completions', 1)[0] + '/models'
+                response = self.http.get(
+                    models_url,
+                    headers={"Authorization": f"Bearer {self.api_keys['deepseek']}"},
+                    timeout=self.warmup_timeout
+                )
+                if response.status_code in (401, 403):
+                    raise PermissionError(f"HTTP {response.status_code}")
+                response.raise_for_status()
+            elif provider == "gemini":
+                genai = self.load_sdk("gemini")
+                if genai is None:
+                    raise ImportError("google.generativeai")
+                next(iter(genai.list_models()), None)
+            result = {"status": "ok"}
+        except Exception as e:
+            error = str(e)
+            invalid_key = (
+                isinstance(e, PermissionError)
+                or getattr(e, 'status_code', None) in (401, 403)
+                or type(e).__name__ in ('AuthenticationError', 'PermissionDenied')
+                or 'API key not valid' in error
+            )
+            result = {"status": "invalid_key" if invalid_key else "error", "error": error[:200]}
+
+        result["rtt_seconds"] = round(time.time() - start_time, 3)
+        return provider, endpoint, result
+
+    def preconnect(self):
+        """Probe every configured provider endpoint in parallel"""
+        targets = [(provider, endpoint) for provider in PROVIDERS if self.api_keys.get(provider)
+                   for endpoint in self.endpoints[provider]]
+        if not targets:
+            return
+
+        with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix='lumonmind-warmup') as executor:
+            futures = [executor.submit(self.probe, provider, endpoint) for provider, endpoint in targets]
+            for future in futures:
+                try:
+                    provider, endpoint, result = future.result(timeout=self.warmup_timeout + 5)
+                except Exception as e:
+                    print(f"Warm-up probe did not finish: {e}")
+                    continue
+                self.endpoint_probes[provider][endpoint] = result
+                print(f"Warm-up probe {provider} {endpoint}: {result['status']} in {result['rtt_seconds']:.2f} seconds")
+                if result["status"] == "invalid_key":
+                    print(f"WARNING: {provider} API key was rejected by {endpoint}")
+
+    def warm_up(self, preconnect=True):
+        """Import SDKs, build the Qwen clients and optionally probe every endpoint"""
+        self.load_sdks()
+        if self.api_keys.get("qwen"):
+            try:
+                for endpoint in self.endpoints["qwen"]:
+                    self.get_qwen_client(endpoint)
+            except ImportError:
+                print("OpenAI module not installed - skipping Qwen client warm-up")
+        if preconnect:
+            self.preconnect()
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+AUDIT_COLUMNS = ("Timestamp", "UserID", "ActionType", "Description", "IPAddress")
+
+
+class AuditBuffer:
+    """
+    In-process ring buffer for audit events with a background bulk flusher
+
+    record() only appends a tuple to a bounded deque (no locks, no I/O), so
+    it adds microseconds to a request. A daemon thread drains the buffer every
+    `flush_interval` seconds and writes the events in batches: COPY into
+    AuditLogs when a database is configured, otherwise one append per batch
+    to logs/audit_YYYYMMDD.json. When producers outpace the flusher the
+    oldest events are overwritten and counted as dropped.
+    """
+
+    def __init__(self, database=None, log_dir=None, capacity=50000, flush_interval=2.0, batch_size=5000):
+        """
+        Args:
+            database: lumonmind_db.Database, or None to write JSON-lines files
+            log_dir: Directory for the JSON-lines fallback
+            capacity: Maximum buffered events (memory bound)
+            flush_interval: Seconds between flushes
+            batch_size: Maximum events per bulk write
+        """
+        self.database = database
+        self.log_dir = log_dir
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._events = deque(maxlen=capacity)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.stats = {"recorded": 0, "dropped": 0, "written": 0, "batches": 0, "errors": 0}
+
+    def record(self, action_type, description=None, ip_address=None, user_id=None):
+        """Buffer one audit event (never blocks, never raises)"""
+        if len(self._events) >= self.capacity:
+            self.stats["dropped"] += 1
+        self._events.append((datetime.now(), user_id, action_type, description, ip_address))
+        self.stats["recorded"] += 1
+
+    def _drain(self):
+        batch = []
+        try:
+            while len(batch) < self.batch_size:
+                batch.append(self._events.popleft())
+        except IndexError:
+            pass
+        return batch
+
+    def _write(self, batch):
+        if self.database is not None:
+            with self.database.transaction() as cursor:
+                self.database.copy_rows(cursor, "AuditLogs", AUDIT_COLUMNS, batch)
+            return
+        os.makedirs(self.log_dir, exist_ok=True)
+        audit_log = os.path.join(self.log_dir, f"audit_{datetime.now().strftime('%Y%m%d')}.json")
+        lines = [
+            json.dumps({"timestamp": ts.isoformat(), "user_id": user_id, "action_type": action_type,
+                        "description": description, "ip_address": ip_address}, ensure_ascii=False)
+            for ts, user_id, action_type, description, ip_address in batch
+        ]
+        with open(audit_log, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def flush(self):
+        """Write every buffered event in batches"""
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    return
+                try:
+                    self._write(batch)
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    self.stats["dropped"] += len(batch)
+                    print(f"Error writing {len(batch)} audit events: {e}")
+                    return
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def start(self):
+        """Start the background flusher (once per process)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_forever, name='lumonmind-audit', daemon=True)
+            self._thread.start()
+
+    def snapshot(self):
+        """Return buffer state for status endpoints"""
+        return dict(self.stats, buffered=len(self._events), capacity=self.capacity,
+                    sink="database" if self.database is not None else "file")
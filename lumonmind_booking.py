@@ -0,0 +1,176 @@
+import hashlib
+from datetime import datetime, timedelta
+
+# SQLSTATE raised by the no_overlapping_appointments exclusion constraint
+EXCLUSION_VIOLATION = '23P01'
+
+# Length of Appointments.IdempotencyKey
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+# Appointment types sent by the web form -> Appointments.Type values
+APPOINTMENT_TYPES = {
+    'video': 'video',
+    'phone': 'phone',
+    'inperson': 'in-person',
+    'in-person': 'in-person',
+}
+
+
+class BookingError(Exception):
+    """A booking that cannot be made; status_code is the HTTP status to return"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def parse_appointment_start(date_text, time_text):
+    """
+    Parse the form's date ("2025-04-25") and time ("9:00 AM" or "09:00")
+
+    Raises:
+        BookingError: If the date or time cannot be parsed
+    """
+    for time_format in ("%I:%M %p", "%H:%M"):
+        try:
+            return datetime.strptime(f"{date_text} {time_text}".strip(), f"%Y-%m-%d {time_format}")
+        except (TypeError, ValueError):
+            continue
+    raise BookingError("Invalid appointment date or time")
+
+
+def validate_idempotency_key(idempotency_key):
+    """
+    Check a client-supplied key against Appointments.IdempotencyKey (VARCHAR(64))
+
+    Raises:
+        BookingError: If the key is not a printable string of 1-64 characters
+    """
+    if (not isinstance(idempotency_key, str) or not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH
+            or not idempotency_key.isprintable()):
+        raise BookingError(f"Idempotency key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} printable characters")
+
+
+def derive_idempotency_key(session_id, specialist, start):
+    """
+    Key for clients that do not send one: the same session booking the same
+    specialist at the same time is treated as a retry of one request
+    """
+    raw = f"{session_id}|{specialist}|{start.isoformat()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:64]
+
+
+class BookingService:
+    """
+    Therapist booking backed by the Appointments table (PostgreSQL)
+
+    Double booking is prevented by the database, not by application locks:
+    the no_overlapping_appointments exclusion constraint rejects any scheduled
+    appointment overlapping another for the same specialist, and the unique
+    IdempotencyKey makes a retried request return the original appointment.
+    Each booking is one short transaction that only takes row-level locks.
+    """
+
+    def __init__(self, database, appointment_minutes=60):
+        """
+        Args:
+            database: lumonmind_db.Database (PostgreSQL)
+            appointment_minutes: Length of a booked appointment
+        """
+        self.database = database
+        self.appointment_minutes = appointment_minutes
+
+    def _existing(self, cursor, idempotency_key):
+        self.database.execute(
+            cursor,
+            "SELECT a.AppointmentID, s.Name, a.AppointmentDateTime, a.EndDateTime, a.Type, a.Status "
+            "FROM Appointments a LEFT JOIN Specialists s ON s.SpecialistID = a.SpecialistID "
+            "WHERE a.IdempotencyKey = %s",
+            (idempotency_key,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        appointment = self._format(row, replayed=True)
+        if appointment["status"] != 'scheduled':
+            # A retry must not report a canceled (or completed) booking as made
+            raise BookingError(
+                f"This booking request was already used for an appointment that is now {appointment['status']}. "
+                "Please book again with a new request.", 409
+            )
+        return appointment
+
+    @staticmethod
+    def _format(row, replayed=False):
+        appointment_id, specialist_name, start, end, appointment_type, status = row
+        return {
+            "appointment_id": appointment_id,
+            "specialist": specialist_name,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "type": appointment_type,
+            "status": status,
+            "replayed": replayed
+        }
+
+    def book(self, idempotency_key, specialist_name, start, appointment_type,
+             name, email, phone=None, notes=None):
+        """
+        Book an appointment, or return the existing one for a repeated key
+
+        Returns:
+            Appointment dictionary ("replayed" is True for a repeated request)
+
+        Raises:
+            BookingError: Unknown specialist (404), slot taken or key already used for an
+                appointment that is no longer scheduled (409), or invalid input (400)
+        """
+        validate_idempotency_key(idempotency_key)
+        db_type = APPOINTMENT_TYPES.get(str(appointment_type).strip().lower().replace(' ', ''))
+        if db_type is None:
+            raise BookingError(f"Unknown appointment type: {appointment_type}")
+        if start <= datetime.now():
+            raise BookingError("Appointments must be booked in the future")
+        end = start + timedelta(minutes=self.appointment_minutes)
+
+        db = self.database
+        try:
+            with db.transaction() as cursor:
+                # Fast path for retries - no locks taken
+                existing = self._existing(cursor, idempotency_key)
+                if existing:
+                    return existing
+
+                db.execute(cursor,
+                           "SELECT SpecialistID, Name FROM Specialists WHERE Name = %s AND IsActive = TRUE",
+                           (specialist_name,))
+                specialist = cursor.fetchone()
+                if specialist is None:
+                    raise BookingError(f"Specialist not found: {specialist_name}", 404)
+
+                # Guests are keyed by email; only this user's row is locked
+                db.execute(cursor,
+                           "INSERT INTO Users (Name, Email, Phone, UserType) VALUES (%s, %s, %s, 'guest') "
+                           "ON CONFLICT (Email) DO UPDATE SET Name = EXCLUDED.Name, "
+                           "Phone = COALESCE(EXCLUDED.Phone, Users.Phone) RETURNING UserID",
+                           (name, email, phone))
+                user_id = cursor.fetchone()[0]
+
+                db.execute(cursor,
+                           "INSERT INTO Appointments (UserID, SpecialistID, AppointmentDateTime, EndDateTime, "
+                           "Status, Type, Notes, IdempotencyKey) "
+                           "VALUES (%s, %s, %s, %s, 'scheduled', %s, %s, %s) "
+                           "ON CONFLICT (IdempotencyKey) DO NOTHING RETURNING AppointmentID",
+                           (user_id, specialist[0], start, end, db_type, notes, idempotency_key))
+                inserted = cursor.fetchone()
+                if inserted is None:
+                    # A concurrent request with the same key committed first
+                    return self._existing(cursor, idempotency_key)
+                return self._format((inserted[0], specialist[1], start, end, db_type, 'scheduled'))
+        except BookingError:
+            raise
+        except Exception as e:
+            if getattr(e, 'pgcode', None) == EXCLUSION_VIOLATION:
+                raise BookingError("That time slot has just been booked. Please choose another time.", 409)
+            raise
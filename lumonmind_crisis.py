@@ -0,0 +1,88 @@
+import re
+
+# Crisis phrases checked before any LLM call. These are deliberately specific:
+# a false negative still reaches the LLM (whose prompt covers crisis handling),
+# while a false positive only adds helpline information to the reply.
+CRISIS_PHRASES = {
+    'english': [
+        'suicide', 'suicidal', 'kill myself', 'killing myself', 'end my life',
+        'ending my life', 'end it all', 'take my own life', 'want to die',
+        'wanna die', 'wish i was dead', 'wish i were dead', 'better off dead',
+        'dont want to live', 'dont want to be alive', 'no reason to live',
+        'not worth living', 'hurt myself', 'hurting myself', 'harm myself',
+        'self harm', 'cut myself', 'cutting myself', 'overdose',
+        'jump off', 'hang myself', 'cant go on'
+    ],
+    'romanized_hindi': [
+        'khudkushi', 'khud khushi', 'aatmhatya', 'atmahatya', 'aatmahatya',
+        'marna chahta', 'marna chahti', 'mar jana chahta', 'mar jana chahti',
+        'mar jaana chahta', 'mar jaana chahti', 'mar jaun', 'mar jaunga',
+        'mar jaungi', 'jeena nahi chahta', 'jeena nahi chahti',
+        'jeene ka mann nahi', 'jeene ka man nahi', 'zindagi khatam',
+        'apne aap ko khatam', 'khud ko khatam', 'khud ko nuksan',
+        'apne aap ko nuksan', 'jaan de dunga', 'jaan de dungi'
+    ]
+}
+
+# Apostrophes are dropped ("don't" -> "dont") and any other punctuation becomes
+# a space before matching, mirroring how users type on mobile keyboards
+_APOSTROPHE_RE = re.compile(r"['’`]")
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+# Single precompiled alternation - one regex scan per message
+CRISIS_PATTERN = re.compile(
+    r'\b(?:' + '|'.join(
+        re.escape(phrase).replace(r'\ ', r'\s+')
+        for phrases in CRISIS_PHRASES.values()
+        for phrase in sorted(phrases, key=len, reverse=True)
+    ) + r')\b'
+)
+
+# Vetted safety responses returned immediately when crisis language is detected
+CRISIS_RESPONSE_ENGLISH = """I'm really glad you told me, and I'm so sorry you're going through this. What you're feeling matters, and you don't have to face it alone.
+
+If you are in immediate danger or thinking about acting on these thoughts, please reach out right now:
+- Emergency services: 112 (India) or your local emergency number
+- Tele-MANAS (free, 24x7 mental health helpline, India): 14416 or 1-800-891-4416
+- AASRA (24x7 suicide prevention helpline, India): +91-9820466726
+- Outside India: find a local helpline at https://findahelpline.com
+
+You can also book a session with one of our counselors right away. If you can, please stay with someone you trust while we keep talking."""
+
+CRISIS_RESPONSE_HINDI = """Mujhe bahut khushi hai ki aapne mujhe bataya, aur mujhe bahut afsos hai ki aap is waqt itna dard mehsoos kar rahe hain. Aap akele nahi hain.
+
+Agar aap abhi khatre mein hain ya in khayalon par amal karne ka soch rahe hain, to please abhi sampark karein:
+- Emergency services: 112
+- Tele-MANAS (muft, 24x7 mental health helpline): 14416 ya 1-800-891-4416
+- AASRA (24x7 suicide prevention helpline): +91-9820466726
+
+Aap abhi hamare kisi counselor ke saath session bhi book kar sakte hain. Agar ho sake, to kisi bharosemand insaan ke saath rahiye jab tak hum baat karte hain."""
+
+
+def normalize_for_crisis_check(message):
+    """Lowercase a message and strip punctuation for phrase matching"""
+    text = _APOSTROPHE_RE.sub("", message.lower())
+    return _NON_WORD_RE.sub(" ", text)
+
+
+def detect_crisis_language(message):
+    """
+    Check a user message for crisis language without any network calls
+
+    Args:
+        message: The raw user message
+
+    Returns:
+        The matched phrase, or None if no crisis language was found
+    """
+    if not message:
+        return None
+    match = CRISIS_PATTERN.search(normalize_for_crisis_check(message))
+    return match.group(0) if match else None
+
+
+def get_crisis_response(language="English"):
+    """Return the vetted safety response for the user's language preference"""
+    if language and language.lower() in ('hindi', 'hinglish/romanized hindi', 'hinglish'):
+        return CRISIS_RESPONSE_HINDI
+    return CRISIS_RESPONSE_ENGLISH
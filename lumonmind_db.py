@@ -0,0 +1,492 @@
+import io
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+# psycopg2 is optional - without it only the SQLite stand-in is available
+try:
+    import psycopg2
+    import psycopg2.pool
+    import psycopg2.extras
+except ImportError:
+    psycopg2 = None
+
+# Minimal SQLite version of the tables from lumonmind-postgres-schema.sql, used
+# for local development and tests. JSONB columns are stored as JSON text.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Sessions (
+    SessionID INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserID INTEGER,
+    StartTime TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    EndTime TIMESTAMP,
+    SessionStatus VARCHAR(20) DEFAULT 'active',
+    LLMProviderUsed VARCHAR(50),
+    ConversationKey VARCHAR(64),
+    CONSTRAINT chk_session_status CHECK (SessionStatus IN ('active', 'completed', 'interrupted'))
+);
+
+CREATE TABLE IF NOT EXISTS Messages (
+    MessageID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SessionID INTEGER REFERENCES Sessions(SessionID) ON DELETE SET NULL,
+    SenderType VARCHAR(10) NOT NULL,
+    Content TEXT NOT NULL,
+    Timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DetectedTopics TEXT,
+    CONSTRAINT chk_sender_type CHECK (SenderType IN ('user', 'assistant'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_messages_session ON Messages(SessionID);
+
+CREATE TABLE IF NOT EXISTS Feedback (
+    FeedbackID INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserID INTEGER,
+    Category VARCHAR(50) NOT NULL,
+    RelatedID INTEGER,
+    Rating INTEGER NOT NULL,
+    Comments TEXT,
+    Timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT chk_rating_range CHECK (Rating BETWEEN 1 AND 5),
+    CONSTRAINT chk_feedback_category CHECK (Category IN ('ai-interaction', 'specialist-session', 'app-experience'))
+);
+
+CREATE TABLE IF NOT EXISTS AuditLogs (
+    LogID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UserID INTEGER,
+    ActionType VARCHAR(50) NOT NULL,
+    Description TEXT,
+    IPAddress VARCHAR(45)
+);
+
+CREATE TABLE IF NOT EXISTS LogIngestCheckpoints (
+    FileName VARCHAR(255) PRIMARY KEY,
+    ByteOffset BIGINT NOT NULL DEFAULT 0,
+    LinesLoaded INTEGER NOT NULL DEFAULT 0,
+    SessionMap TEXT,
+    Completed BOOLEAN NOT NULL DEFAULT FALSE,
+    UpdatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def _csv_field(value):
+    """One CSV field for COPY: NULL is an unquoted empty field, text is always quoted"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_csv(rows):
+    """
+    Serialize rows for COPY ... WITH (FORMAT csv)
+
+    csv.writer quotes None as "" (an empty string, not NULL, for COPY), so
+    fields are written by hand: None becomes an unquoted empty field while
+    an empty string stays a quoted "".
+    """
+    return ''.join(','.join(_csv_field(value) for value in row) + '\n' for row in rows)
+
+
+class Database:
+    """
+    Thin data-access wrapper over a PostgreSQL connection pool or SQLite file
+
+    SQL is written with psycopg2-style %s placeholders; they are rewritten for
+    SQLite automatically so the same statements run against both backends.
+    """
+
+    def __init__(self, database_url, pool_size=5):
+        """
+        Args:
+            database_url: postgresql://... or sqlite:///path/to/file.db
+            pool_size: Maximum PostgreSQL connections in the pool
+        """
+        self.database_url = database_url
+        self.is_sqlite = database_url.startswith('sqlite')
+        if self.is_sqlite:
+            path = database_url.split('sqlite:///', 1)[-1] or ':memory:'
+            self._sqlite = sqlite3.connect(path, check_same_thread=False)
+            self._sqlite_lock = threading.Lock()
+            self._sqlite.executescript(SQLITE_SCHEMA)
+            # Files created before Sessions.ConversationKey existed
+            columns = [row[1] for row in self._sqlite.execute("PRAGMA table_info(Sessions)")]
+            if 'ConversationKey' not in columns:
+                self._sqlite.execute("ALTER TABLE Sessions ADD COLUMN ConversationKey VARCHAR(64)")
+            self._sqlite.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_conversation_key ON Sessions(ConversationKey)"
+            )
+            self._sqlite.commit()
+        else:
+            if psycopg2 is None:
+                raise ImportError("psycopg2 is required for PostgreSQL. Please run: pip install psycopg2-binary")
+            self._pool = psycopg2.pool.ThreadedConnectionPool(1, pool_size, database_url)
+
+    def _sql(self, sql):
+        return sql.replace('%s', '?') if self.is_sqlite else sql
+
+    def json_param(self, value):
+        """Adapt a Python value for a JSONB column"""
+        if value is None:
+            return None
+        return json.dumps(value) if self.is_sqlite else psycopg2.extras.Json(value)
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor inside one transaction (commit on success, rollback on error)"""
+        if self.is_sqlite:
+            with self._sqlite_lock:
+                cursor = self._sqlite.cursor()
+                try:
+                    yield cursor
+                    self._sqlite.commit()
+                except Exception:
+                    self._sqlite.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        else:
+            conn = self._pool.getconn()
+            try:
+                with conn.cursor() as cursor:
+                    yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._pool.putconn(conn)
+
+    def execute(self, cursor, sql, params=()):
+        cursor.execute(self._sql(sql), params)
+
+    def insert_returning_id(self, cursor, sql, params, id_column):
+        """Run an INSERT and return the generated primary key"""
+        if self.is_sqlite:
+            cursor.execute(self._sql(sql), params)
+            return cursor.lastrowid
+        cursor.execute(sql + f" RETURNING {id_column}", params)
+        return cursor.fetchone()[0]
+
+    def insert_many(self, cursor, table, columns, rows):
+        """Multi-row INSERT - one statement per batch on PostgreSQL"""
+        if not rows:
+            return
+        column_list = ', '.join(columns)
+        if self.is_sqlite:
+            placeholders = ', '.join('?' for _ in columns)
+            cursor.executemany(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", rows)
+        else:
+            psycopg2.extras.execute_values(
+                cursor, f"INSERT INTO {table} ({column_list}) VALUES %s", rows, page_size=len(rows)
+            )
+
+    def copy_rows(self, cursor, table, columns, rows):
+        """
+        Bulk-load rows with COPY ... FROM STDIN (CSV) on PostgreSQL
+
+        Much faster than INSERT for large loads; falls back to executemany on
+        SQLite. JSON values must already be serialized strings.
+        """
+        if not rows:
+            return
+        if self.is_sqlite:
+            self.insert_many(cursor, table, columns, rows)
+            return
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", io.StringIO(copy_csv(rows))
+        )
+
+    def query(self, sql, params=()):
+        """Run a SELECT and return all rows"""
+        with self.transaction() as cursor:
+            cursor.execute(self._sql(sql), params)
+            return cursor.fetchall()
+
+    def close(self):
+        if self.is_sqlite:
+            self._sqlite.close()
+        else:
+            self._pool.closeall()
+
+
+class PersistenceWriter:
+    """
+    Write-behind persistence of sessions, messages and feedback
+
+    Chat routes enqueue events without blocking; a background thread drains
+    the queue in batches (every `flush_interval` seconds or `batch_size`
+    events) and writes each batch in a single transaction. If the queue is full
+    events are dropped and counted rather than slowing down a chat response.
+    A batch that fails to write is retried on the next flushes, up to
+    `max_attempts` writes in total, and then dropped and counted.
+
+    The SessionIDs of the `max_sessions` most recently used conversations are
+    cached in memory; an evicted (e.g. abandoned) conversation is looked up
+    again by Sessions.ConversationKey when it shows up.
+    """
+
+    def __init__(self, database, batch_size=200, flush_interval=1.0, max_queue=10000, max_attempts=3,
+                 max_sessions=10000):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_sessions = max_sessions
+        # Failed batch waiting to be retried, and how often it was tried
+        self._retry_events = []
+        self._retry_attempts = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        # Maps the app's session UUIDs to Sessions.SessionID, least recently used first
+        self._session_ids = OrderedDict()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.stats = {"enqueued": 0, "dropped": 0, "written": 0, "batches": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name='lumonmind-db-writer', daemon=True)
+        self._thread.start()
+
+    # Event producers - all non-blocking
+
+    def _enqueue(self, event):
+        try:
+            self._queue.put_nowait(event)
+            self.stats["enqueued"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def session_started(self, session_key, start_time=None):
+        self._enqueue(("session_started", session_key, start_time or datetime.now()))
+
+    def session_ended(self, session_key, status='completed', end_time=None):
+        self._enqueue(("session_ended", session_key, status, end_time or datetime.now()))
+
+    def message(self, session_key, sender_type, content, timestamp=None, detected_topics=None,
+                model_used=None):
+        self._enqueue(("message", session_key, sender_type, content, timestamp or datetime.now(),
+                       detected_topics, model_used))
+
+    def feedback(self, session_key, rating, category='ai-interaction', specialist_id=None,
+                 comments=None, timestamp=None):
+        """
+        Queue a Feedback row. RelatedID is the specialist for specialist-session
+        feedback and the conversation's SessionID otherwise.
+        """
+        self._enqueue(("feedback", session_key, rating, category, specialist_id, comments,
+                       timestamp or datetime.now()))
+
+    # Background writer
+
+    def _run(self):
+        while not self._stopped.is_set():
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _drain(self):
+        events = []
+        while len(events) < self.batch_size:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def _known_session_id(self, cursor, staged, session_key):
+        """
+        SessionID of a key, with this batch's staged changes applied
+
+        Keys missing from the cache are looked up among active sessions, so
+        evicted conversations keep writing to their row.
+        """
+        if session_key in staged:
+            return staged[session_key]
+        session_id = self._session_ids.get(session_key)
+        if session_id is None:
+            self.database.execute(
+                cursor,
+                "SELECT SessionID FROM Sessions WHERE ConversationKey = %s AND SessionStatus = 'active' "
+                "ORDER BY SessionID DESC LIMIT 1",
+                (session_key,)
+            )
+            row = cursor.fetchone()
+            session_id = row[0] if row else None
+        if session_id is not None:
+            # Staged even when cached, so the key counts as recently used
+            staged[session_key] = session_id
+        return session_id
+
+    def _session_id(self, cursor, staged, session_key, start_time=None):
+        session_id = self._known_session_id(cursor, staged, session_key)
+        if session_id is None:
+            session_id = self.database.insert_returning_id(
+                cursor,
+                "INSERT INTO Sessions (StartTime, SessionStatus, ConversationKey) VALUES (%s, %s, %s)",
+                (start_time or datetime.now(), 'active', session_key),
+                "SessionID"
+            )
+            staged[session_key] = session_id
+        return session_id
+
+    def _write_batch(self, events):
+        db = self.database
+        # Session id changes are staged (None = forgotten) and only applied to
+        # _session_ids after commit, so a rolled-back batch leaves no ids that
+        # point at Sessions rows which were never written
+        staged = {}
+        with db.transaction() as cursor:
+            message_rows = []
+            feedback_rows = []
+            providers = {}
+            for event in events:
+                kind = event[0]
+                if kind == "session_started":
+                    # A restarted conversation with the same key gets a new row
+                    staged[event[1]] = None
+                    self._session_id(cursor, staged, event[1], event[2])
+                elif kind == "message":
+                    _, key, sender, content, timestamp, topics, model_used = event
+                    message_rows.append((self._session_id(cursor, staged, key), sender, content, timestamp,
+                                         db.json_param(topics)))
+                    if model_used:
+                        providers[key] = model_used
+                elif kind == "feedback":
+                    _, key, rating, category, specialist_id, comments, timestamp = event
+                    related_id = (specialist_id if category == 'specialist-session'
+                                  else self._known_session_id(cursor, staged, key))
+                    feedback_rows.append((category, related_id, rating, comments, timestamp))
+                elif kind == "session_ended":
+                    _, key, status, end_time = event
+                    if message_rows:
+                        # Keep message order relative to the session end
+                        db.insert_many(cursor, "Messages",
+                                       ("SessionID", "SenderType", "Content", "Timestamp", "DetectedTopics"),
+                                       message_rows)
+                        message_rows = []
+                    session_id = self._known_session_id(cursor, staged, key)
+                    staged[key] = None
+                    if session_id is not None:
+                        db.execute(cursor,
+                                   "UPDATE Sessions SET EndTime = %s, SessionStatus = %s, "
+                                   "LLMProviderUsed = COALESCE(%s, LLMProviderUsed) WHERE SessionID = %s",
+                                   (end_time, status, providers.pop(key, None), session_id))
+            db.insert_many(cursor, "Messages",
+                           ("SessionID", "SenderType", "Content", "Timestamp", "DetectedTopics"),
+                           message_rows)
+            db.insert_many(cursor, "Feedback",
+                           ("Category", "RelatedID", "Rating", "Comments", "Timestamp"),
+                           feedback_rows)
+            for key, model_used in providers.items():
+                session_id = self._known_session_id(cursor, staged, key)
+                if session_id is not None:
+                    db.execute(cursor, "UPDATE Sessions SET LLMProviderUsed = %s WHERE SessionID = %s",
+                               (model_used, session_id))
+        for key, session_id in staged.items():
+            if session_id is None:
+                self._session_ids.pop(key, None)
+            else:
+                self._session_ids[key] = session_id
+                self._session_ids.move_to_end(key)
+        while len(self._session_ids) > self.max_sessions:
+            self._session_ids.popitem(last=False)
+
+    def flush(self):
+        """Write everything currently queued, starting with a failed batch"""
+        with self._flush_lock:
+            while True:
+                events = self._retry_events or self._drain()
+                if not events:
+                    return
+                try:
+                    self._write_batch(events)
+                    self.stats["written"] += len(events)
+                    self.stats["batches"] += 1
+                    self._retry_events, self._retry_attempts = [], 0
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    self._retry_attempts += 1
+                    if self._retry_attempts >= self.max_attempts:
+                        self.stats["dropped"] += len(events)
+                        self._retry_events, self._retry_attempts = [], 0
+                        print(f"Dropped persistence batch of {len(events)} events after "
+                              f"{self.max_attempts} attempts: {e}")
+                    else:
+                        self._retry_events = events
+                        print(f"Error writing persistence batch of {len(events)} events "
+                              f"(attempt {self._retry_attempts}, will retry): {e}")
+                    return
+
+    def erase_session(self, session_key):
+        """
+        Delete every stored row of a conversation (blocks - call it off the
+        request path)
+
+        Queued events are written first so none of them recreate the rows
+        afterwards. Messages, their MessageTopics rows (PostgreSQL), the
+        conversation's ai-interaction and app-experience feedback and its
+        Sessions rows are deleted in one transaction.
+
+        Returns:
+            Number of Messages rows deleted
+        """
+        self.flush()
+        db = self.database
+        with self._flush_lock:
+            with db.transaction() as cursor:
+                db.execute(cursor, "SELECT SessionID FROM Sessions WHERE ConversationKey = %s", (session_key,))
+                session_ids = {row[0] for row in cursor.fetchall()}
+                cached = self._session_ids.get(session_key)
+                if cached is not None:
+                    session_ids.add(cached)
+                deleted = 0
+                for session_id in sorted(session_ids):
+                    if not db.is_sqlite:
+                        # MessageTopics has no foreign key to (partitioned) Messages
+                        db.execute(cursor,
+                                   "DELETE FROM MessageTopics WHERE MessageID IN "
+                                   "(SELECT MessageID FROM Messages WHERE SessionID = %s)",
+                                   (session_id,))
+                    db.execute(cursor, "DELETE FROM Messages WHERE SessionID = %s", (session_id,))
+                    deleted += max(cursor.rowcount, 0)
+                    db.execute(cursor,
+                               "DELETE FROM Feedback WHERE RelatedID = %s AND Category <> 'specialist-session'",
+                               (session_id,))
+                    db.execute(cursor, "DELETE FROM Sessions WHERE SessionID = %s", (session_id,))
+            self._session_ids.pop(session_key, None)
+        return deleted
+
+    def close(self):
+        """Stop the background thread and flush remaining events"""
+        self._stopped.set()
+        self.flush()
+        # Whatever could not be written by now is lost with the process
+        unwritten = len(self._retry_events) + self._queue.qsize()
+        if unwritten:
+            self.stats["dropped"] += unwritten
+            print(f"Persistence writer closed with {unwritten} unwritten events")
+
+    def snapshot(self):
+        return dict(self.stats, queued=self._queue.qsize(), retrying=len(self._retry_events),
+                    tracked_sessions=len(self._session_ids))
+
+
+def create_database_from_env():
+    """
+    Build a Database from DATABASE_URL, or return None when persistence is not
+    configured or the driver is missing
+    """
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        return None
+    try:
+        return Database(database_url, pool_size=int(os.getenv('DB_POOL_SIZE', 5)))
+    except Exception as e:
+        print(f"WARNING: Database persistence disabled: {e}")
+        return None
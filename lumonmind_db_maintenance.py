@@ -0,0 +1,214 @@
+"""
+Scheduled database maintenance for LumonMind (PostgreSQL)
+
+Run daily from cron or a scheduler, e.g.:
+    python lumonmind_db_maintenance.py partitions --months-ahead 3 --retention-months 12
+    python lumonmind_db_maintenance.py refresh-views
+    python lumonmind_db_maintenance.py topic-rollup --days 2
+    python lumonmind_db_maintenance.py materialize-slots --horizon-days 28
+
+Commands:
+    partitions  Pre-create future monthly partitions of Messages and AuditLogs,
+                detach (or drop) partitions older than the retention window,
+                then drop detached partitions older than the retention window
+                plus --detached-grace-months (see lumonmind-partitioned-schema.sql)
+                and delete MessageTopics rows older than the retention window
+    refresh-views
+                Refresh the per-user reporting rollups read by the dashboard
+                (see lumonmind-reporting-views.sql)
+    topic-rollup
+                Recompute TopicDailyCounts for recent days; --backfill first
+                fills MessageTopics from existing Messages.DetectedTopics
+    materialize-slots
+                Extend SpecialistSlots over the rolling booking horizon
+"""
+import argparse
+import os
+import time
+
+from lumonmind_db import Database
+from lumonmind_slots import SlotService
+
+PARTITIONED_TABLES = ("Messages", "AuditLogs")
+
+# Rollups behind the user_dashboard view, in refresh order
+REPORTING_VIEWS = (
+    "mv_user_interests",
+    "mv_user_sessions",
+    "mv_user_detected_topics",
+    "mv_user_appointments",
+    "mv_user_specializations",
+    "mv_user_feedback",
+    "mv_user_activity",
+)
+
+
+def manage_partitions(db, months_ahead=3, retention_months=12, drop_expired=False, detached_grace_months=3):
+    """
+    Run manage_time_partitions() for every partitioned table, then
+    drop_detached_partitions() as a separate step, and finally prune
+    MessageTopics rows of messages past the retention window
+
+    Args:
+        detached_grace_months: Months a detached partition is kept (to be
+                               archived) before it is dropped; None keeps them
+
+    Returns:
+        List of (table, action, partition_name) tuples
+    """
+    actions = []
+    for table in PARTITIONED_TABLES:
+        rows = db.query(
+            "SELECT action, partition_name FROM manage_time_partitions(%s, %s, %s, %s)",
+            (table, months_ahead, retention_months, drop_expired)
+        )
+        if detached_grace_months is not None:
+            rows += db.query(
+                "SELECT action, partition_name FROM drop_detached_partitions(%s, %s, %s)",
+                (table, retention_months, detached_grace_months)
+            )
+        for action, partition_name in rows:
+            actions.append((table, action, partition_name))
+            if action.startswith("default_rows"):
+                print(f"WARNING: {partition_name} holds {action.split(':', 1)[1]} rows outside monthly partitions")
+            else:
+                print(f"{table}: {action} {partition_name}")
+
+    # MessageTopics is not partitioned and has no foreign key to Messages
+    pruned = db.query("SELECT prune_message_topics(%s)", (retention_months,))[0][0]
+    if pruned:
+        actions.append(("MessageTopics", f"pruned:{pruned}", "messagetopics"))
+        print(f"MessageTopics: pruned {pruned} rows older than {retention_months} months")
+    return actions
+
+
+def refresh_views(db, views=REPORTING_VIEWS, concurrently=True):
+    """
+    Refresh reporting materialized views, one transaction per view
+
+    CONCURRENTLY keeps the old rows readable while the new ones are built. A
+    view that has never been populated cannot be refreshed concurrently, so
+    that case falls back to a plain refresh.
+
+    Returns:
+        Dictionary of view name -> refresh seconds (None if it failed)
+    """
+    timings = {}
+    for view in views:
+        if view not in REPORTING_VIEWS:
+            print(f"Skipping unknown view {view}")
+            continue
+        start_time = time.time()
+        try:
+            mode = "CONCURRENTLY " if concurrently else ""
+            try:
+                with db.transaction() as cursor:
+                    db.execute(cursor, f"REFRESH MATERIALIZED VIEW {mode}{view}")
+            except Exception as e:
+                if not concurrently or "not been populated" not in str(e):
+                    raise
+                with db.transaction() as cursor:
+                    db.execute(cursor, f"REFRESH MATERIALIZED VIEW {view}")
+            timings[view] = round(time.time() - start_time, 2)
+            print(f"Refreshed {view} in {timings[view]} seconds")
+        except Exception as e:
+            timings[view] = None
+            print(f"Error refreshing {view}: {e}")
+    return timings
+
+
+# Fills MessageTopics for messages written before the sync trigger existed
+BACKFILL_MESSAGE_TOPICS_SQL = """
+INSERT INTO MessageTopics (MessageID, TopicID, Timestamp)
+SELECT m.MessageID, t.TopicID, m.Timestamp
+FROM Messages m
+CROSS JOIN LATERAL jsonb_array_elements_text(m.DetectedTopics) AS detected(name)
+JOIN Topics t ON lower(t.TopicName) = lower(detected.name)
+WHERE m.DetectedTopics IS NOT NULL AND jsonb_typeof(m.DetectedTopics) = 'array'
+ON CONFLICT DO NOTHING
+"""
+
+
+def refresh_topic_rollup(db, days=2, backfill=False):
+    """
+    Recompute daily per-topic message counts for the last `days` days
+    (all days when backfilling)
+
+    Returns:
+        Number of TopicDailyCounts rows written
+    """
+    if backfill:
+        with db.transaction() as cursor:
+            db.execute(cursor, BACKFILL_MESSAGE_TOPICS_SQL)
+            print(f"Backfilled {cursor.rowcount} MessageTopics rows")
+        # Recompute every day that has topic rows
+        oldest = db.query("SELECT CURRENT_DATE - MIN(Timestamp)::DATE FROM MessageTopics")
+        days = max(days, (oldest[0][0] or 0) + 1)
+    rows = db.query("SELECT refresh_topic_daily_counts((CURRENT_DATE - %s)::DATE)", (days - 1,))
+    refreshed = rows[0][0]
+    print(f"Refreshed {refreshed} TopicDailyCounts rows for the last {days} days")
+    return refreshed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LumonMind database maintenance")
+    parser.add_argument("--database-url", default=os.getenv('DATABASE_URL'),
+                        help="PostgreSQL URL (default: $DATABASE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    partitions = commands.add_parser("partitions", help="Create future and retire expired partitions")
+    partitions.add_argument("--months-ahead", type=int, default=int(os.getenv('PARTITION_MONTHS_AHEAD', 3)))
+    partitions.add_argument("--retention-months", type=int, default=int(os.getenv('MESSAGE_RETENTION_MONTHS', 12)))
+    partitions.add_argument("--drop-expired", action="store_true",
+                            help="Drop expired partitions instead of detaching them")
+    partitions.add_argument("--detached-grace-months", type=int,
+                            default=int(os.getenv('DETACHED_PARTITION_GRACE_MONTHS', 3)),
+                            help="Months to keep detached partitions for archiving before dropping them")
+    partitions.add_argument("--keep-detached", action="store_true",
+                            help="Never drop detached partitions")
+
+    views = commands.add_parser("refresh-views", help="Refresh reporting materialized views")
+    views.add_argument("views", nargs="*", default=list(REPORTING_VIEWS),
+                       help="Views to refresh (default: all)")
+    views.add_argument("--blocking", action="store_true",
+                       help="Use a plain (locking) refresh instead of CONCURRENTLY")
+
+    topics = commands.add_parser("topic-rollup", help="Recompute daily topic counts")
+    topics.add_argument("--days", type=int, default=2,
+                        help="Number of most recent days to recompute (default: yesterday and today)")
+    topics.add_argument("--backfill", action="store_true",
+                        help="Fill MessageTopics from existing messages and recompute every day")
+
+    slots = commands.add_parser("materialize-slots", help="Materialize bookable specialist slots")
+    slots.add_argument("--horizon-days", type=int, default=int(os.getenv('SLOT_HORIZON_DAYS', 28)))
+    slots.add_argument("--slot-minutes", type=int, default=int(os.getenv('SLOT_MINUTES', 60)))
+
+    args = parser.parse_args()
+    if not args.database_url or args.database_url.startswith('sqlite'):
+        parser.error("A PostgreSQL DATABASE_URL is required for maintenance commands")
+
+    db = Database(args.database_url, pool_size=1)
+    start_time = time.time()
+    try:
+        if args.command == "partitions":
+            actions = manage_partitions(db, args.months_ahead, args.retention_months, args.drop_expired,
+                                        None if args.keep_detached else args.detached_grace_months)
+            print(f"Partition maintenance finished: {len(actions)} actions in {time.time() - start_time:.2f} seconds")
+        elif args.command == "refresh-views":
+            timings = refresh_views(db, args.views, concurrently=not args.blocking)
+            failed = [view for view, seconds in timings.items() if seconds is None]
+            print(f"View refresh finished in {time.time() - start_time:.2f} seconds ({len(failed)} failed)")
+            return 1 if failed else 0
+        elif args.command == "topic-rollup":
+            refresh_topic_rollup(db, args.days, args.backfill)
+        elif args.command == "materialize-slots":
+            free_slots = SlotService(db, args.horizon_days, args.slot_minutes).materialize()
+            print(f"Materialized slots for {args.horizon_days} days: {free_slots} free slots "
+                  f"({time.time() - start_time:.2f} seconds)")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
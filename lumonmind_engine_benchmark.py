@@ -0,0 +1,241 @@
+"""
+Parity benchmark for the front ends sharing the lumonmind engine
+
+Runs the same conversations through get_ai_response() of every front end -
+lumonmind_flask_v1, lumonmind_flask_v2 and the Streamlit app lumonmind_2 -
+with a recording mock provider, and checks that each front end sends the
+provider exactly the same messages (system prompt, topic extensions, cache
+prefix marker, first-5-minutes rule, history) and applies the same
+extensions. Every conversation is run twice: inside the first 5 minutes of
+the chat and after them.
+
+Front ends whose dependencies are missing (e.g. streamlit) are skipped. The
+Streamlit app is imported in bare mode, outside `streamlit run`.
+
+Conversations come from built-in samples, or from the conversation logs with
+--logs (plain or rotated archives, see lumonmind_replay.py).
+
+Usage:
+    python lumonmind_engine_benchmark.py [--logs logs/] [--limit 50] [--repeat 3]
+        [--frontends flask_v1,flask_v2,streamlit] [--verbose]
+
+Exits with status 1 if any front end diverges from the first one.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from lumonmind_rate_limit import ProviderRateLimiter
+
+FRONTEND_MODULES = {
+    "flask_v1": "lumonmind_flask_v1",
+    "flask_v2": "lumonmind_flask_v2",
+    "streamlit": "lumonmind_2"
+}
+
+SAMPLE_CONVERSATIONS = [
+    ("sample-anxiety", ["hello", "I feel anxious and worried all the time, panic attacks and fear",
+                        "still anxious, nervous and scared before exams",
+                        "and I cant sleep, insomnia, lying awake every night, so tired"]),
+    ("sample-relationship", ["hi there", "my partner and I keep arguing, there are trust issues",
+                             "we talk about breakup and divorce, our relationship feels toxic",
+                             "Main bahut pareshan feel kar raha hoon"]),
+    ("sample-grief", ["I feel sad and empty", "my father died last month, the funeral was hard, grief and loss",
+                      "depressed, hopeless, alone and miserable", "I dont know what to do"]),
+    ("sample-plain", ["How can I build a better morning routine?", "Thanks, that helps"])
+]
+
+
+class RecordingProvider:
+    """Stands in for Qwen: records the final messages of every call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, messages):
+        self.calls.append([
+            {key: msg.get(key) for key in ("role", "content", "cache_prefix_length")}
+            for msg in messages
+        ])
+        return f"Mock reply {len(self.calls)}", "qwen"
+
+
+class FrontEnd:
+    """One front end module with a recording provider installed on its router"""
+
+    def __init__(self, name, module):
+        self.name = name
+        self.module = module
+        self.provider = RecordingProvider()
+        router = module.provider_router
+        router.api_keys.update(qwen="benchmark", deepseek=None, gemini=None)
+        router.call_qwen = self.provider
+        # The mock has no quota - never let the limiter skip a turn
+        router.limiters["qwen"] = ProviderRateLimiter("qwen", 10 ** 9, 10 ** 12)
+        if hasattr(module, "persistence_checked"):
+            module.persistence_checked = True  # keep benchmark turns out of the database
+
+    def run(self, turns, chat_start_time):
+        """
+        Run one conversation
+
+        Returns:
+            List of (recorded provider messages, applied extensions, seconds) per turn
+        """
+        system_message = {"role": "system", "content": self.module.SYSTEM_PROMPT}
+        results = []
+        if self.name == "streamlit":
+            # st.session_state does not persist outside `streamlit run`, so the
+            # session is held in a plain mapping passed to get_ai_response
+            state = {"conversation_id": f"benchmark-{uuid.uuid4()}", "chat_start_time": chat_start_time}
+            messages = [system_message]
+            for user_message in turns:
+                messages.append({"role": "user", "content": user_message})
+                start_time = time.perf_counter()
+                ai_message, _ = self.module.get_ai_response(messages, state)
+                elapsed = time.perf_counter() - start_time
+                messages.append({"role": "assistant", "content": ai_message})
+                results.append((self.provider.calls[-1], list(state["applied_extensions"]), elapsed))
+            return results
+
+        session_id = self.module.initialize_session(f"benchmark-{uuid.uuid4()}")
+        session = self.module.sessions[session_id]
+        session["chat_start_time"] = chat_start_time.isoformat()
+        session["messages"] = [system_message]
+        try:
+            for user_message in turns:
+                session["messages"].append({"role": "user", "content": user_message})
+                start_time = time.perf_counter()
+                ai_message, _ = self.module.get_ai_response(session["messages"], session_id)
+                elapsed = time.perf_counter() - start_time
+                session["messages"].append({"role": "assistant", "content": ai_message})
+                results.append((self.provider.calls[-1], list(session.get("applied_extensions", [])), elapsed))
+        finally:
+            self.module.sessions.pop(session_id, None)
+        return results
+
+
+def load_frontends(names):
+    """Import the requested front ends, skipping any whose dependencies are missing"""
+    frontends = []
+    for name in names:
+        try:
+            module = importlib.import_module(FRONTEND_MODULES[name])
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        frontends.append(FrontEnd(name, module))
+    return frontends
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else None
+
+
+def describe_difference(expected, actual):
+    """Short description of the first difference between two recorded calls"""
+    if len(expected) != len(actual):
+        return f"{len(actual)} messages instead of {len(expected)}"
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        for key in ("role", "content", "cache_prefix_length"):
+            if a.get(key) != b.get(key):
+                return f"message {i} ({a.get('role')}) differs in {key}"
+    return "no difference"
+
+
+def run_benchmark(frontends, conversations, repeat=1, verbose=False):
+    """
+    Run every conversation (in and after the first 5 minutes) through each front end
+
+    Returns:
+        Dictionary with per-front-end timings and the list of mismatches
+    """
+    timings = {frontend.name: [] for frontend in frontends}
+    mismatches = []
+    turns = 0
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        for _ in range(repeat):
+            for conversation_id, user_messages in conversations:
+                for label, offset in (("first 5 minutes", timedelta(0)), ("after 5 minutes", timedelta(minutes=10))):
+                    reference = None
+                    for frontend in frontends:
+                        results = frontend.run(user_messages, datetime.now() - offset)
+                        timings[frontend.name].extend(elapsed for _, _, elapsed in results)
+                        if reference is None:
+                            reference = (frontend.name, results)
+                            turns += len(results)
+                            continue
+                        for depth, (expected, actual) in enumerate(zip(reference[1], results), start=1):
+                            if expected[0] != actual[0]:
+                                mismatches.append(f"{conversation_id} turn {depth} ({label}): {frontend.name} "
+                                                  f"vs {reference[0]}: {describe_difference(expected[0], actual[0])}")
+                            elif expected[1] != actual[1]:
+                                mismatches.append(f"{conversation_id} turn {depth} ({label}): {frontend.name} "
+                                                  f"applied {actual[1]}, {reference[0]} applied {expected[1]}")
+    return {
+        "turns": turns,
+        "timings_ms": {
+            name: {"p50": round(percentile(values, 50) * 1000, 3), "p95": round(percentile(values, 95) * 1000, 3),
+                   "max": round(max(values) * 1000, 3)}
+            for name, values in timings.items() if values
+        },
+        "mismatches": mismatches
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every LumonMind front end runs the same engine")
+    parser.add_argument("--logs", nargs="*", help="Replay user turns from conversation logs instead of the samples")
+    parser.add_argument("--limit", type=int, default=50, help="Conversations read from the logs")
+    parser.add_argument("--repeat", type=int, default=1, help="Run the conversation set this many times")
+    parser.add_argument("--frontends", default=",".join(FRONTEND_MODULES),
+                        help="Comma-separated front ends to compare")
+    parser.add_argument("--verbose", action="store_true", help="Show the front ends' own output")
+    args = parser.parse_args()
+
+    if args.logs is not None:
+        from lumonmind_ingest_logs import DEFAULT_LOG_DIR
+        from lumonmind_replay import load_conversations
+        conversations = [(conversation_id, [message for _, message in turns]) for conversation_id, turns
+                         in load_conversations(args.logs or [DEFAULT_LOG_DIR], args.limit)]
+    else:
+        conversations = SAMPLE_CONVERSATIONS
+    if not conversations:
+        print("No conversations to run")
+        return 1
+
+    # Keep benchmark turns out of the database
+    os.environ.pop("DATABASE_URL", None)
+    frontends = load_frontends([name.strip() for name in args.frontends.split(",") if name.strip()])
+    if len(frontends) < 2:
+        print("At least two front ends are needed to compare")
+        return 1
+
+    prompts = {frontend.name: frontend.module.SYSTEM_PROMPT for frontend in frontends}
+    if len(set(prompts.values())) > 1:
+        print(f"WARNING: front ends loaded different system prompts: "
+              f"{ {name: len(prompt) for name, prompt in prompts.items()} }")
+
+    result = run_benchmark(frontends, conversations, args.repeat, args.verbose)
+    print(f"Compared {', '.join(f.name for f in frontends)} on {len(conversations)} conversations "
+          f"({result['turns']} turns per front end)")
+    for name, stats in result["timings_ms"].items():
+        print(f"{name}: engine time per turn p50 {stats['p50']} ms, p95 {stats['p95']} ms, max {stats['max']} ms")
+    for mismatch in result["mismatches"][:20]:
+        print(f"MISMATCH {mismatch}")
+    if result["mismatches"]:
+        print(f"{len(result['mismatches'])} mismatched turns")
+        return 1
+    print("All front ends sent identical provider requests")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+
+def _empty_rollup():
+    return {"count": 0, "sum": 0, "histogram": {str(r): 0 for r in RATING_VALUES}}
+
+
+def _summarize(rollup):
+    count = rollup["count"]
+    return dict(
+        rollup,
+        histogram=dict(rollup["histogram"]),
+        average=round(rollup["sum"] / count, 2) if count else None
+    )
+
+
+class FeedbackAggregator:
+    """
+    Running rating statistics per specialist and per model
+
+    Every submitted rating updates count, sum and a 1-5 histogram in memory,
+    so stats reads cost nothing. State is checkpointed to a JSON file every
+    `checkpoint_interval` seconds (and on shutdown) and reloaded at startup.
+    """
+
+    def __init__(self, checkpoint_path=None, checkpoint_interval=60.0):
+        """
+        Args:
+            checkpoint_path: JSON file used to persist the running totals
+            checkpoint_interval: Seconds between checkpoints
+        """
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.Lock()
+        self._rollups = {"overall": _empty_rollup(), "by_category": {}, "by_specialist": {}, "by_model": {}}
+        self._dirty = False
+        self._checkpoint_thread = None
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            for key in self._rollups:
+                if key in saved:
+                    self._rollups[key] = saved[key]
+            print(f"Loaded feedback stats checkpoint ({self._rollups['overall']['count']} ratings)")
+        except Exception as e:
+            print(f"Error loading feedback stats checkpoint: {e}")
+
+    @staticmethod
+    def _add(rollup, rating):
+        rollup["count"] += 1
+        rollup["sum"] += rating
+        rollup["histogram"][str(rating)] += 1
+
+    def record(self, rating, category='ai-interaction', specialist_id=None, model_used=None):
+        """Add one rating (1-5) to the running totals"""
+        with self._lock:
+            self._add(self._rollups["overall"], rating)
+            self._add(self._rollups["by_category"].setdefault(category, _empty_rollup()), rating)
+            if specialist_id is not None:
+                self._add(self._rollups["by_specialist"].setdefault(str(specialist_id), _empty_rollup()), rating)
+            if model_used:
+                self._add(self._rollups["by_model"].setdefault(model_used, _empty_rollup()), rating)
+            self._dirty = True
+
+    def snapshot(self):
+        """Return count, sum, average and histogram for every rollup"""
+        with self._lock:
+            return {
+                "overall": _summarize(self._rollups["overall"]),
+                "by_category": {k: _summarize(v) for k, v in self._rollups["by_category"].items()},
+                "by_specialist": {k: _summarize(v) for k, v in self._rollups["by_specialist"].items()},
+                "by_model": {k: _summarize(v) for k, v in self._rollups["by_model"].items()}
+            }
+
+    def checkpoint(self):
+        """Write the running totals to the checkpoint file if they changed"""
+        if not self.checkpoint_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._rollups, ensure_ascii=False)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+            tmp_path = self.checkpoint_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.checkpoint_path)
+        except Exception as e:
+            self._dirty = True
+            print(f"Error writing feedback stats checkpoint: {e}")
+
+    def _checkpoint_forever(self):
+        while True:
+            time.sleep(self.checkpoint_interval)
+            self.checkpoint()
+
+    def start(self):
+        """Start the periodic checkpoint thread (once per process)"""
+        if self._checkpoint_thread is None and self.checkpoint_path:
+            self._checkpoint_thread = threading.Thread(
+                target=self._checkpoint_forever, name='lumonmind-feedback-stats', daemon=True
+            )
+            self._checkpoint_thread.start()
@@ -1,28 +1,19 @@
 from flask import Flask, request, jsonify
 import os
 import json
-import requests
 import sys
-import io
 from dotenv import load_dotenv
 import time
 from datetime import datetime, timedelta
 import uuid
-import re
+from lumonmind import (
+    ProviderRouter, ExtensionRegistry, PromptError, load_prompt_template, build_system_prompt,
+    personalize_system_prompt, detect_therapist_request, is_first_5_minutes, generate_response
+)
+from lumonmind.conversation_log import log_conversation as write_conversation_log
 
-# Silence stderr to prevent "No secrets found" messages
-old_stderr = sys.stderr
-sys.stderr = io.StringIO()
-
-# Now it's safe to import potentially noisy modules
-try:
-    import google.generativeai as genai
-except ImportError:
-    # Will handle this later
-    pass
-
-# Restore stderr
-sys.stderr = old_stderr
+# Provider SDKs are imported by the engine's ProviderRouter on first use, and
+# only for providers whose API key is configured
 
 # Load environment variables
 load_dotenv()
@@ -38,53 +29,6 @@ GEMINI_MODEL = "gemini-1.5-pro-latest"
 # Dictionary to store session data
 sessions = {}
 
-# Dictionary of keywords for topic detection
-TOPIC_KEYWORDS = {
-    'anxiety': [
-        'anxious', 'anxiety', 'worry', 'worrying', 'panic', 'stressed', 
-        'overthinking', 'nervous', 'fear', 'scared', 'tense', 'racing heart',
-        'cant breathe', 'chest tight', 'what if', 'overthink', 'catastrophe',
-        'afraid', 'terrified', 'phobia', 'worried', 'on edge', 'restless'
-    ],
-    'depression': [
-        'depressed', 'depression', 'sad', 'hopeless', 'unmotivated', 'worthless',
-        'tired all the time', 'no energy', 'no interest', 'empty', 'numb', 
-        'cant enjoy', 'no pleasure', 'pointless', 'dont care anymore',
-        'giving up', 'why bother', 'no future', 'meaningless', 'exhausted',
-        'no point', 'miserable', 'alone', 'cant get out of bed', 'apathy'
-    ],
-    'grief': [
-        'grief', 'loss', 'died', 'death', 'passed away', 'deceased', 'bereavement',
-        'lost my', 'funeral', 'missing someone', 'anniversary of', 'grieving',
-        'mourning', 'cope with loss', 'they\'re gone', 'widow', 'widower',
-        'remembrance', 'gone forever', 'never see them again', 'memorial'
-    ],
-    'sleep': [
-        'insomnia', 'cant sleep', 'trouble sleeping', 'tired', 'exhausted',
-        'wake up', 'nightmares', 'bad dreams', 'sleep schedule', 'oversleeping',
-        'cant fall asleep', 'lying awake', 'racing thoughts at night', 'sleep quality',
-        'keep waking up', 'early morning', 'bedtime', 'sleeping pills', 'fatigue'
-    ],
-    'relationship': [
-        'marriage', 'partner', 'boyfriend', 'girlfriend', 'spouse', 'relationship',
-        'breakup', 'divorce', 'arguing', 'communication', 'trust issues', 'cheating',
-        'ex', 'dating', 'love', 'commitment', 'jealous', 'affair', 'fighting', 
-        'unhappy together', 'toxic relationship', 'boundaries', 'controlling'
-    ],
-    'stress-burnout': [
-        'stress', 'burnout', 'overwhelmed', 'workload', 'overworked', 'pressure',
-        'too much', 'cant keep up', 'deadline', 'balance', 'time management',
-        'no time', 'exhaustion', 'drained', 'depleted', 'cant do it all',
-        'breaking point', 'overload', 'responsibilities', 'burden'
-    ],
-    'self-esteem': [
-        'hate myself', 'not good enough', 'failure', 'ugly', 'worthless',
-        'stupid', 'inadequate', 'incompetent', 'self-doubt', 'imposter',
-        'fraud', 'unlovable', 'unworthy', 'ashamed', 'body image', 'fat',
-        'unattractive', 'comparison', 'perfectionist', 'low confidence'
-    ]
-}
-
 # Enhanced API key handling with multiple fallback mechanisms
 def get_api_key(provider="qwen"):
     """
@@ -114,488 +58,54 @@ DEEPSEEK_API_KEY = get_api_key("deepseek")
 QWEN_API_KEY = get_api_key("qwen")
 GEMINI_API_KEY = get_api_key("gemini")
 
-# Load the prompt template - critical for operation
-def load_prompt_template():
-    try:
-        # Try to load from the local file
-        prompt_path = os.path.join(os.path.dirname(__file__), "lumonmind_prompt.md")
-        
-        if os.path.exists(prompt_path):
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                prompt_content = f.read()
-                if not prompt_content or len(prompt_content.strip()) < 10:
-                    print("ERROR: Prompt file exists but appears to be empty or too short.")
-                    sys.exit(1)
-                return prompt_content
-        else:
-            # If we reach this point, no prompt source was found
-            print("CRITICAL ERROR: Cannot find prompt template file.")
-            print("The application requires the lumonmind_prompt.md file to function.")
-            sys.exit(1)
-    except Exception as e:
-        print(f"CRITICAL ERROR: Cannot load prompt template: {e}")
-        print("The application requires the lumonmind_prompt.md file to function.")
-        sys.exit(1)
-
-# This will exit the application if the prompt cannot be loaded
-SYSTEM_PROMPT = load_prompt_template()
-
-# Add language support information to the prompt
-SYSTEM_PROMPT += """
-
-## Language Support
-You are capable of understanding multiple languages, including:
-1. English
-2. Hindi in Roman script (Hinglish/Romanized Hindi)
-3. Many other languages
-
-If users write in Romanized Hindi (Hindi written using English letters), please:
-1. Understand their message completely
-2. Respond in the SAME language format they used
-3. NEVER convert Romanized Hindi to Devanagari script
-4. NEVER explain that you understand Hindi or mention language switching
-
-Example Hinglish/Romanized Hindi phrases you should understand:
-- "Main bahut tension mein hoon" (respond in same Roman script)
-- "Mujhe neend nahi aati hai" (respond in same Roman script)
-- "Main bahut pareshan feel kar raha hoon" (respond in same Roman script)
-- "Maa-baap naraz hai mujhse" (respond in same Roman script)
-- "Log kya kahenge" (respond in same Roman script)
-
-Always maintain the user's language choice and format in your responses.
-"""
-
-# File paths for extensions
-def get_extension_path(topic):
-    """Get file path for a topic extension"""
-    # Update this path based on your directory structure
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    extensions_dir = os.path.join(base_path, "extensions")
-    
-    # Create extensions directory if it doesn't exist
-    if not os.path.exists(extensions_dir):
-        os.makedirs(extensions_dir)
-    
-    return os.path.join(extensions_dir, f"{topic}_extension.md")
-
-
-def load_extension(topic):
-    """Load a specific topic extension content"""
-    try:
-        extension_path = get_extension_path(topic)
-        if os.path.exists(extension_path):
-            with open(extension_path, 'r', encoding='utf-8') as file:
-                return file.read()
-        else:
-            print(f"Extension file not found for topic: {topic}")
-            return None
-    except Exception as e:
-        print(f"Error loading extension for {topic}: {str(e)}")
-        return None
-
-
-def detect_mental_health_topics(messages, message_threshold=5, keyword_threshold=3):
-    """
-    Analyze conversation to detect mental health topics
-    
-    Args:
-        messages: List of message dictionaries with 'role' and 'content'
-        message_threshold: Number of most recent messages to analyze
-        keyword_threshold: Minimum keyword matches to identify a topic
-    
-    Returns:
-        List of detected topics ordered by relevance
-    """
-    # Extract recent user messages
-    user_messages = [msg['content'] for msg in messages 
-                    if msg.get('role') == 'user'][-message_threshold:]
-    
-    # Combine into one text for analysis
-    combined_text = ' '.join(user_messages).lower()
-    
-    # Count keyword matches for each topic
-    topic_counts = {}
-    for topic, keywords in TOPIC_KEYWORDS.items():
-        count = 0
-        for keyword in keywords:
-            # Use word boundary regex to find whole word matches
-            matches = re.findall(r'\b' + re.escape(keyword) + r'\b', combined_text)
-            count += len(matches)
-        topic_counts[topic] = count
-    
-    # Filter topics that meet the threshold
-    detected_topics = [topic for topic, count in topic_counts.items() 
-                      if count >= keyword_threshold]
-    
-    # Sort by relevance (keyword count)
-    detected_topics.sort(key=lambda x: topic_counts[x], reverse=True)
-    
-    # Log detection results
-    print(f"Topic detection results: {topic_counts}")
-    print(f"Detected topics: {detected_topics}")
-    
-    return detected_topics
-
-
-def apply_topic_extensions(messages, session_data=None):
-    """
-    Analyze messages and apply relevant topic extensions to the system prompt
-    
-    Args:
-        messages: List of message dictionaries
-        session_data: Optional session data dictionary for tracking
-    
-    Returns:
-        Modified messages list with updated system prompt
-    """
-    # Create a deep copy of messages to avoid modifying the original
-    modified_messages = [msg.copy() for msg in messages]
-    
-    # Detect topics in the conversation
-    detected_topics = detect_mental_health_topics(messages)
-    
-    # If no topics detected or no system message, return original
-    if not detected_topics:
-        return modified_messages
-    
-    # Find the system message
-    system_index = None
-    for i, msg in enumerate(modified_messages):
-        if msg.get('role') == 'system':
-            system_index = i
-            break
-    
-    if system_index is None:
-        print("No system message found to modify")
-        return modified_messages
-    
-    # Load extensions for detected topics (limit to top 2)
-    extensions = []
-    for topic in detected_topics[:2]:  # Limit to top 2 most relevant topics
-        extension_content = load_extension(topic)
-        if extension_content:
-            extensions.append(extension_content)
-    
-    # Update the system message with extensions
-    if extensions:
-        modified_messages[system_index]['content'] += "\n\n" + "\n\n".join(extensions)
-        
-        # Log the modification
-        print(f"Applied topic extensions: {detected_topics[:2]}")
-        
-        # Update session data if provided
-        if session_data is not None:
-            session_data['applied_extensions'] = detected_topics[:2]
-            session_data['extension_applied_at'] = datetime.now().isoformat()
-    
-    return modified_messages
-
+# Load the prompt template - critical for operation, so exit if it cannot be loaded
+try:
+    SYSTEM_PROMPT = build_system_prompt(load_prompt_template())
+except PromptError as e:
+    print(f"CRITICAL ERROR: {e}")
+    print("The application requires the lumonmind_prompt.md file to function.")
+    sys.exit(1)
+
+# Provider routing (Qwen -> DeepSeek -> Gemini) shared with the other front ends
+# (see lumonmind/providers.py)
+provider_router = ProviderRouter(
+    api_keys={"qwen": QWEN_API_KEY, "deepseek": DEEPSEEK_API_KEY, "gemini": GEMINI_API_KEY},
+    models={"qwen": QWEN_MODEL, "deepseek": DEEPSEEK_MODEL, "gemini": GEMINI_MODEL},
+    timeout=float(os.getenv('PROVIDER_TIMEOUT', 30)),
+    log_dir=os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+)
+
+# Topic extension files, cached by modification time
+extension_registry = ExtensionRegistry()
 
-def flask_implementation(session_id, messages):
-    """
-    Implementation for Flask API version
-    
-    Args:
-        session_id: The session identifier
-        messages: The message list
-    
-    Returns:
-        Modified messages with appropriate extensions
-    """
-    # Get or initialize session data
-    if session_id not in sessions:
-        return messages
-    
-    session = sessions[session_id]
-    
-    # Initialize extension tracking in session data if not present
-    if 'applied_extensions' not in session:
-        session['applied_extensions'] = []
+def get_ai_response(messages, session_id):
+    """Run a chat turn through the engine: topic extensions, prompt assembly and provider routing"""
     
-    if 'extension_applied_at' not in session:
-        session['extension_applied_at'] = None
+    session = sessions.get(session_id)
+    if not session:
+        return "Session not found. Please create a new session.", "error"
     
-    # Create session data dictionary for tracking
+    # Extension state is tracked on the session and reported in chat responses
     session_data = {
         'applied_extensions': session.get('applied_extensions', []),
         'extension_applied_at': session.get('extension_applied_at')
     }
-    
-    # Apply extensions and update session
-    modified_messages = apply_topic_extensions(messages, session_data)
-    
-    # Update session with any changes
+    response = generate_response(
+        messages,
+        provider_router,
+        extension_registry,
+        session_data,
+        first_5_minutes=is_first_5_minutes(session.get('chat_start_time')),
+        session_id=session_id
+    )
     session['applied_extensions'] = session_data.get('applied_extensions', [])
     session['extension_applied_at'] = session_data.get('extension_applied_at')
-    
-    return modified_messages
-
-# Function to detect therapist/counselor requests
-def detect_therapist_request(user_message):
-    """Detect if user is requesting to speak with a human therapist or counselor"""
-    therapist_keywords = [
-        "talk to a therapist", "speak to a therapist", 
-        "talk to a counselor", "speak to a counselor",
-        "human therapist", "real therapist", 
-        "book appointment", "schedule appointment",
-        "see a professional", "talk to a professional",
-        "book a session", "talk to a human",
-        "need real help", "want real help",
-        "see a therapist", "therapist appointment",
-        "need a therapist", "want a therapist",
-        "consult with a counselor", "meet with a therapist"
-    ]
-    
-    # Case-insensitive check for any keyword
-    user_message_lower = user_message.lower()
-    for keyword in therapist_keywords:
-        if keyword in user_message_lower:
-            return True
-    return False
+    return response
 
-# Helper functions for API calls
-def call_qwen_api(messages):
-    """Call the Qwen API through Aliyun Dashscope using OpenAI client"""
-    try:
-        if not QWEN_API_KEY:
-            print("Qwen API key is missing.")
-            return None, None
-            
-        # Use OpenAI client with Aliyun's DashScope endpoint
-        try:
-            from openai import OpenAI
-            
-            client = OpenAI(
-                api_key=QWEN_API_KEY,
-                base_url="https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
-            )
-            
-            # Print API key (first few characters for debugging)
-            print(f"Using Qwen API key: {QWEN_API_KEY[:5]}...")
-            
-            try:
-                completion = client.chat.completions.create(
-                    model=QWEN_MODEL,
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=2000,
-                    timeout=30
-                )
-                
-                # Extract content from response
-                content = completion.choices[0].message.content
-                return content, "qwen"
-                
-            except Exception as e:
-                print(f"Qwen API Error: {str(e)}")
-                # Log the error
-                log_dir = os.path.join(os.path.dirname(__file__), "logs")
-                os.makedirs(log_dir, exist_ok=True)
-                error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-                with open(error_log, "a") as f:
-                    f.write(f"[{datetime.now().isoformat()}] Qwen API Error: {str(e)}\n")
-                return None, None
-        except ImportError:
-            print("OpenAI module not installed. Please run: pip install openai")
-            return None, None
-            
-    except Exception as e:
-        print(f"Qwen API failed with error: {e}")
-        # Log the error
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-        with open(error_log, "a") as f:
-            f.write(f"[{datetime.now().isoformat()}] Qwen Exception: {str(e)}\n")
-        return None, None
-
-def call_deepseek_api(messages):
-    """Call the DeepSeek API with fallback support"""
-    try:
-        if not DEEPSEEK_API_KEY:
-            print("DeepSeek API key is missing.")
-            return None, None
-            
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        # Print API key (first few characters for debugging)
-        print(f"Using DeepSeek API key: {DEEPSEEK_API_KEY[:5]}...")
-        
-        payload = {
-            "model": DEEPSEEK_MODEL,
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
-        
-        # Print the endpoint URL
-        endpoint_url = "https://api.deepseek.com/v1/chat/completions"
-        print(f"Calling DeepSeek API at: {endpoint_url}")
-        
-        response = requests.post(
-            endpoint_url,
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
-        
-        print(f"DeepSeek API Response Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            print(f"DeepSeek API Response: {response_json}")
-            return response_json["choices"][0]["message"]["content"], "deepseek"
-        else:
-            print(f"DeepSeek API Error: {response.text}")
-            # Log the error
-            log_dir = os.path.join(os.path.dirname(__file__), "logs")
-            os.makedirs(log_dir, exist_ok=True)
-            error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-            with open(error_log, "a") as f:
-                f.write(f"[{datetime.now().isoformat()}] DeepSeek API Error: {response.text}\nHeaders: {headers}\nPayload: {payload}\n")
-            return None, None
-            
-    except Exception as e:
-        print(f"DeepSeek API failed with error: {e}")
-        # Log the error
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-        with open(error_log, "a") as f:
-            f.write(f"[{datetime.now().isoformat()}] DeepSeek Exception: {str(e)}\n")
-        return None, None
-
-def call_gemini_api(messages):
-    """Call the Google Gemini API"""
-    try:
-        if not GEMINI_API_KEY:
-            print("Gemini API key is missing.")
-            return None, None
-            
-        # Try to import and configure genai
-        try:
-            import google.generativeai as genai
-            genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            
-            # Convert our message format to Gemini format
-            gemini_messages = []
-            system_added = False
-            
-            for msg in messages:
-                if msg["role"] == "system":
-                    # For Gemini, we'll add system prompt to the first user message
-                    system_added = True
-                    continue
-                elif msg["role"] == "user":
-                    if not system_added and len(gemini_messages) == 0:
-                        # Add system prompt to first user message
-                        gemini_messages.append({"role": "user", "parts": [SYSTEM_PROMPT + "\n\nUser: " + msg["content"]]})
-                        system_added = True
-                    else:
-                        gemini_messages.append({"role": "user", "parts": [msg["content"]]})
-                elif msg["role"] == "assistant":
-                    gemini_messages.append({"role": "model", "parts": [msg["content"]]})
-            
-            response = model.generate_content(gemini_messages)
-            return response.text, "gemini"
-        except ImportError:
-            print("Google AI module not installed. Please run: pip install google-generativeai")
-            return None, None
-        
-    except Exception as e:
-        print(f"Gemini API failed with error: {e}")
-        # Log the error
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-        with open(error_log, "a") as f:
-            f.write(f"[{datetime.now().isoformat()}] Gemini Exception: {str(e)}\n")
-        return None, None
-
-def get_ai_response(messages, session_id):
-    """Try each AI service in order until one succeeds, with all modifications applied"""
-    
-    # Get the session to check for 5-minute rule
-    session = sessions.get(session_id)
-    if not session:
-        return "Session not found. Please create a new session.", "error"
-    
-    # Calculate chat duration to determine if we should apply 5-minute rule
-    is_first_5_minutes = False
-    if session.get('chat_start_time'):
-        chat_duration = datetime.now() - datetime.fromisoformat(session['chat_start_time'])
-        is_first_5_minutes = chat_duration.total_seconds() < 300  # 5 minutes in seconds
-        print(f"DEBUG: Chat duration: {chat_duration.total_seconds()} seconds. First 5 minutes: {is_first_5_minutes}")
-    
-    # Create a copy of messages to modify
-    modified_messages = [msg.copy() if isinstance(msg, dict) else msg for msg in messages]
-    
-    # Apply 5-minute counselor rule if applicable
-    if is_first_5_minutes:
-        # Find the system message and modify it
-        system_found = False
-        for i, msg in enumerate(modified_messages):
-            if isinstance(msg, dict) and msg.get("role") == "system":
-                # Add instruction to avoid counselor references unless crisis
-                modified_messages[i]["content"] += "\n\n## IMPORTANT TEMPORARY INSTRUCTION\nFor the first 5 minutes of this conversation, DO NOT suggest or refer the user to a counselor UNLESS they express crisis-level concerns (suicidal thoughts, self-harm, harm to others, or severe emotional distress). Focus on providing direct support and coping strategies yourself instead."
-                system_found = True
-                print("DEBUG: Added 5-minute instruction to system message")
-                break
-        
-        if not system_found:
-            print("DEBUG: No system message found to modify for 5-minute rule")
-    
-    # Apply topic extensions
-    modified_messages = flask_implementation(session_id, modified_messages)
-    
-    # First try Qwen
-    response, source = call_qwen_api(modified_messages)
-    if response:
-        return response, source
-    
-    # Then try DeepSeek
-    response, source = call_deepseek_api(modified_messages)
-    if response:
-        return response, source
-    
-    # Finally try Gemini
-    response, source = call_gemini_api(modified_messages)
-    if response:
-        return response, source
-    
-    # If all fail, return an error message
-    return "I'm sorry, I'm having connectivity issues right now. Please try again later. Make sure your API keys are correct in the .env file.", "error"
-
-# Log conversations to a file
+# Log conversations to the indexed day logs (see lumonmind/conversation_log.py)
 def log_conversation(user_message, ai_message, model_used, conversation_id):
-    try:
-        # Create logs directory if it doesn't exist
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # Create log entry
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "conversation_id": conversation_id,
-            "user_message": user_message,
-            "ai_message": ai_message,
-            "model_used": model_used
-        }
-        
-        try:
-            log_file = os.path.join(log_dir, f"conversation_{datetime.now().strftime('%Y%m%d')}.json")
-            with open(log_file, "a") as f:
-                f.write(json.dumps(log_entry) + "\n")
-        except Exception as e:
-            # If file writing fails, print to stdout instead
-            print(f"LOG: {json.dumps(log_entry)}")
-            print(f"File writing error: {e}")
-    except Exception as e:
-        print(f"Error logging conversation: {e}")
+    write_conversation_log(user_message, ai_message, model_used, conversation_id,
+                           applied_extensions=sessions.get(conversation_id, {}).get('applied_extensions'))
         
 # Function to initialize a new session
 def initialize_session(session_id=None):
@@ -633,10 +143,7 @@ def health_check():
             "gemini": bool(GEMINI_API_KEY)
         },
         "prompt_loaded": bool(SYSTEM_PROMPT),
-        "extensions_available": {
-            topic: bool(load_extension(topic)) 
-            for topic in TOPIC_KEYWORDS.keys()
-        }
+        "extensions_available": extension_registry.available()
     })
 
 @app.route('/api/session/new', methods=['POST'])
@@ -673,14 +180,8 @@ def onboard_user(session_id):
     sessions[session_id]['user_info']['language'] = language_preference
     sessions[session_id]['user_info']['onboarded'] = True
     
-    # Create initial system message
-    system_message = SYSTEM_PROMPT
-    
-    # Add user info to the system message (simplified without concerns)
-    system_message += f"\n\nThe user's name is {name}."
-        
-    # Add language preference
-    system_message += f"\n\nThe user's preferred language is {language_preference}."
+    # Create initial system message with the user's name and language preference
+    system_message = personalize_system_prompt(SYSTEM_PROMPT, name, language_preference)
     
     # Add system message to the conversation
     sessions[session_id]['messages'].append({"role": "system", "content": system_message})
@@ -934,15 +435,9 @@ def delete_session(session_id):
 @app.route('/api/extensions', methods=['GET'])
 def list_extensions():
     """List all available topic extensions"""
-    extensions = {}
-    
-    for topic in TOPIC_KEYWORDS.keys():
-        extension_content = load_extension(topic)
-        extensions[topic] = bool(extension_content)
-    
     return jsonify({
         "status": "success",
-        "available_extensions": extensions
+        "available_extensions": extension_registry.available()
     })
 
 @app.route('/api/session/<session_id>/info', methods=['GET'])
@@ -999,5 +494,7 @@ if __name__ == "__main__":
     extensions_dir = os.path.join(os.path.dirname(__file__), "extensions")
     os.makedirs(extensions_dir, exist_ok=True)
     
-    # Start the Flask app
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Start the Flask development server. Debug mode is opt-in (DEBUG=true);
+    # for production use gunicorn with gunicorn.conf.py instead.
+    debug_mode = os.getenv('DEBUG', 'False').lower() == 'true'
+    app.run(debug=debug_mode, host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
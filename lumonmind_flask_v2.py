@@ -1,36 +1,42 @@
 from flask import Flask, request, jsonify
 import os
 import json
-import requests
-import sys
-import io
 from dotenv import load_dotenv
 import time
 from datetime import datetime, timedelta
 import uuid
-import re
+import threading
+import hashlib
+import functools
 from flask_cors import CORS  # Import CORS for cross-origin support
 from flask import send_from_directory
+from concurrent.futures import ThreadPoolExecutor
+from lumonmind_response_cache import ResponseCache
+from lumonmind_crisis import detect_crisis_language, get_crisis_response
+from lumonmind_rate_limit import AdmissionController, SlidingWindowThrottle
+from lumonmind_db import PersistenceWriter, create_database_from_env
+from lumonmind_topics import TOPIC_KEYWORDS
+from lumonmind_slots import SlotService
+from lumonmind_feedback import FeedbackAggregator
+from lumonmind_audit import AuditBuffer
+from lumonmind_log_index import ConversationLogIndex
+from lumonmind_booking import BookingService, BookingError, parse_appointment_start, derive_idempotency_key
+from lumonmind_trace import start_turn_trace, traced_stage
+from lumonmind import (
+    ProviderRouter, ExtensionRegistry, FALLBACK_PROMPT, create_rate_limiters, load_prompt_template,
+    build_system_prompt, detect_therapist_request, is_first_5_minutes, generate_response
+)
+from lumonmind.conversation_log import log_conversation as write_conversation_log
 
-# Silence stderr to prevent "No secrets found" messages
-old_stderr = sys.stderr
-sys.stderr = io.StringIO()
-
-# Now it's safe to import potentially noisy modules
-try:
-    import google.generativeai as genai
-except ImportError:
-    # Will handle this later
-    pass
-
-# Restore stderr
-sys.stderr = old_stderr
+# Provider SDKs (openai, google.generativeai) are not imported here - see
+# load_provider_sdks(), which imports only the SDKs whose API key is configured
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.start_time = time.time()
 CORS(app, resources={r"/api/*": {"origins": "*"}})  # Enable CORS for all routes with proper configuration
 
 # Constants - Updated model names to ensure they're current
@@ -40,52 +46,22 @@ GEMINI_MODEL = "gemini-2.0"  # Updated from "gemini-1.5-pro-latest"
 
 # Dictionary to store session data
 sessions = {}
-# Dictionary of keywords for topic detection
-TOPIC_KEYWORDS = {
-    'anxiety': [
-        'anxious', 'anxiety', 'worry', 'worrying', 'panic', 'stressed', 
-        'overthinking', 'nervous', 'fear', 'scared', 'tense', 'racing heart',
-        'cant breathe', 'chest tight', 'what if', 'overthink', 'catastrophe',
-        'afraid', 'terrified', 'phobia', 'worried', 'on edge', 'restless'
-    ],
-    'depression': [
-        'depressed', 'depression', 'sad', 'hopeless', 'unmotivated', 'worthless',
-        'tired all the time', 'no energy', 'no interest', 'empty', 'numb', 
-        'cant enjoy', 'no pleasure', 'pointless', 'dont care anymore',
-        'giving up', 'why bother', 'no future', 'meaningless', 'exhausted',
-        'no point', 'miserable', 'alone', 'cant get out of bed', 'apathy'
-    ],
-    'grief': [
-        'grief', 'loss', 'died', 'death', 'passed away', 'deceased', 'bereavement',
-        'lost my', 'funeral', 'missing someone', 'anniversary of', 'grieving',
-        'mourning', 'cope with loss', 'they\'re gone', 'widow', 'widower',
-        'remembrance', 'gone forever', 'never see them again', 'memorial'
-    ],
-    'sleep': [
-        'insomnia', 'cant sleep', 'trouble sleeping', 'tired', 'exhausted',
-        'wake up', 'nightmares', 'bad dreams', 'sleep schedule', 'oversleeping',
-        'cant fall asleep', 'lying awake', 'racing thoughts at night', 'sleep quality',
-        'keep waking up', 'early morning', 'bedtime', 'sleeping pills', 'fatigue'
-    ],
-    'relationship': [
-        'marriage', 'partner', 'boyfriend', 'girlfriend', 'spouse', 'relationship',
-        'breakup', 'divorce', 'arguing', 'communication', 'trust issues', 'cheating',
-        'ex', 'dating', 'love', 'commitment', 'jealous', 'affair', 'fighting', 
-        'unhappy together', 'toxic relationship', 'boundaries', 'controlling'
-    ],
-    'stress-burnout': [
-        'stress', 'burnout', 'overwhelmed', 'workload', 'overworked', 'pressure',
-        'too much', 'cant keep up', 'deadline', 'balance', 'time management',
-        'no time', 'exhaustion', 'drained', 'depleted', 'cant do it all',
-        'breaking point', 'overload', 'responsibilities', 'burden'
-    ],
-    'self-esteem': [
-        'hate myself', 'not good enough', 'failure', 'ugly', 'worthless',
-        'stupid', 'inadequate', 'incompetent', 'self-doubt', 'imposter',
-        'fraud', 'unlovable', 'unworthy', 'ashamed', 'body image', 'fat',
-        'unattractive', 'comparison', 'perfectionist', 'low confidence'
-    ]
-}
+
+# Background workers for work that must not block a chat response
+# (e.g. the LLM follow-up after a crisis fast-path reply)
+background_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BACKGROUND_WORKERS', 4)),
+    thread_name_prefix='lumonmind-bg'
+)
+
+# Functions run on graceful shutdown to flush queued work (see shutdown_background_work)
+shutdown_hooks = []
+
+
+def register_shutdown_hook(hook):
+    """Register a function to run when the server shuts down gracefully"""
+    shutdown_hooks.append(hook)
+    return hook
 
 # Add these routes to serve static files
 @app.route('/')
@@ -170,250 +146,176 @@ if not any([DEEPSEEK_API_KEY, QWEN_API_KEY, GEMINI_API_KEY]):
 else:
     MOCK_API_MODE = False
 
-# Load the prompt template - critical for operation
-def load_prompt_template():
-    try:
-        # Try to load from the local file
-        prompt_path = os.path.join(os.path.dirname(__file__), "lumonmind_prompt.md")
-        
-        if os.path.exists(prompt_path):
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                prompt_content = f.read()
-                if not prompt_content or len(prompt_content.strip()) < 10:
-                    print("ERROR: Prompt file exists but appears to be empty or too short.")
-                    # Return a fallback prompt instead of exiting
-                    return """You are LumonMind, an AI mental health companion. Your goal is to provide support, 
-                           empathy, and helpful information to users experiencing mental health challenges.
-                           Always be supportive, non-judgmental, and compassionate."""
-                return prompt_content
-        else:
-            # If no prompt file found, use a fallback prompt instead of exiting
-            print("WARNING: Prompt file not found. Using fallback prompt.")
-            return """You are LumonMind, an AI mental health companion. Your goal is to provide support, 
-                   empathy, and helpful information to users experiencing mental health challenges.
-                   Always be supportive, non-judgmental, and compassionate."""
-    except Exception as e:
-        print(f"WARNING: Cannot load prompt template: {e}. Using fallback prompt.")
-        return """You are LumonMind, an AI mental health companion. Your goal is to provide support, 
-               empathy, and helpful information to users experiencing mental health challenges.
-               Always be supportive, non-judgmental, and compassionate."""
-
-# Load prompt template
-SYSTEM_PROMPT = load_prompt_template()
-
-# Add language support information to the prompt
-SYSTEM_PROMPT += """
-
-## Language Support
-You are capable of understanding multiple languages, including:
-1. English
-2. Hindi in Roman script (Hinglish/Romanized Hindi)
-3. Many other languages
-
-If users write in Romanized Hindi (Hindi written using English letters), please:
-1. Understand their message completely
-2. Respond in the SAME language format they used
-3. NEVER convert Romanized Hindi to Devanagari script
-4. NEVER explain that you understand Hindi or mention language switching
-
-Example Hinglish/Romanized Hindi phrases you should understand:
-- "Main bahut tension mein hoon" (respond in same Roman script)
-- "Mujhe neend nahi aati hai" (respond in same Roman script)
-- "Main bahut pareshan feel kar raha hoon" (respond in same Roman script)
-- "Maa-baap naraz hai mujhse" (respond in same Roman script)
-- "Log kya kahenge" (respond in same Roman script)
-
-Always maintain the user's language choice and format in your responses.
-"""
-
-# File paths for extensions
-def get_extension_path(topic):
-    """Get file path for a topic extension"""
-    # Update this path based on your directory structure
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    extensions_dir = os.path.join(base_path, "extensions")
-    
-    # Create extensions directory if it doesn't exist
-    if not os.path.exists(extensions_dir):
-        os.makedirs(extensions_dir)
-    
-    return os.path.join(extensions_dir, f"{topic}_extension.md")
+# Timeout (seconds) for a single provider request
+PROVIDER_TIMEOUT = float(os.getenv('PROVIDER_TIMEOUT', 60))
 
+# Per-provider token-bucket rate limits (<PROVIDER>_RPM / <PROVIDER>_TPM). Callers
+# wait in a bounded queue for capacity; when it is full the provider is skipped.
+RATE_LIMIT_MAX_QUEUE = int(os.getenv('RATE_LIMIT_MAX_QUEUE', 20))
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 10))
+provider_limiters = create_rate_limiters(RATE_LIMIT_MAX_QUEUE, RATE_LIMIT_MAX_WAIT)
 
-def load_extension(topic):
-    """Load a specific topic extension content"""
-    try:
-        extension_path = get_extension_path(topic)
-        if os.path.exists(extension_path):
-            with open(extension_path, 'r', encoding='utf-8') as file:
-                return file.read()
-        else:
-            print(f"Extension file not found for topic: {topic}")
-            return None
-    except Exception as e:
-        print(f"Error loading extension for {topic}: {str(e)}")
-        return None
+# Prompt prefix caching - DashScope supports explicit cache markers, DeepSeek and
+# Gemini cache repeated prefixes automatically. Set PROMPT_CACHE=false to send
+# plain messages to every provider.
+PROMPT_CACHE_ENABLED = os.getenv('PROMPT_CACHE', 'true').lower() == 'true'
 
+# Timeout (seconds) for each warm-up probe
+WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT', 10))
 
-def detect_mental_health_topics(messages, message_threshold=5, keyword_threshold=3):
-    """
-    Analyze conversation to detect mental health topics
-    
-    Args:
-        messages: List of message dictionaries with 'role' and 'content'
-        message_threshold: Number of most recent messages to analyze
-        keyword_threshold: Minimum keyword matches to identify a topic
-    
-    Returns:
-        List of detected topics ordered by relevance
-    """
-    # Extract recent user messages
-    user_messages = [msg['content'] for msg in messages 
-                    if msg.get('role') == 'user'][-message_threshold:]
-    
-    # Combine into one text for analysis
-    combined_text = ' '.join(user_messages).lower()
-    
-    # Count keyword matches for each topic
-    topic_counts = {}
-    for topic, keywords in TOPIC_KEYWORDS.items():
-        count = 0
-        for keyword in keywords:
-            # Use word boundary regex to find whole word matches
-            matches = re.findall(r'\b' + re.escape(keyword) + r'\b', combined_text)
-            count += len(matches)
-        topic_counts[topic] = count
-    
-    # Filter topics that meet the threshold
-    detected_topics = [topic for topic, count in topic_counts.items() 
-                      if count >= keyword_threshold]
-    
-    # Sort by relevance (keyword count)
-    detected_topics.sort(key=lambda x: topic_counts[x], reverse=True)
-    
-    # Log detection results
-    print(f"Topic detection results: {topic_counts}")
-    print(f"Detected topics: {detected_topics}")
-    
-    return detected_topics
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
 
+# Provider routing (Qwen -> DeepSeek -> Gemini) with shared clients, endpoint
+# ordering and statistics lives in the engine package (lumonmind/providers.py)
+provider_router = ProviderRouter(
+    api_keys={"qwen": QWEN_API_KEY, "deepseek": DEEPSEEK_API_KEY, "gemini": GEMINI_API_KEY},
+    models={"qwen": QWEN_MODEL, "deepseek": DEEPSEEK_MODEL, "gemini": GEMINI_MODEL},
+    timeout=PROVIDER_TIMEOUT,
+    limiters=provider_limiters,
+    prompt_cache=PROMPT_CACHE_ENABLED,
+    log_dir=LOG_DIR,
+    warmup_timeout=WARMUP_TIMEOUT
+)
+# Router state and helpers under their module-level names (used by the status
+# endpoints and gunicorn.conf.py)
+endpoint_probes = provider_router.endpoint_probes
+provider_startup = provider_router.sdk_startup
+load_provider_sdk = provider_router.load_sdk
+load_provider_sdks = provider_router.load_sdks
+get_qwen_client = provider_router.get_qwen_client
+get_provider_health = provider_router.get_health
+get_prompt_cache_stats = provider_router.get_prompt_cache_stats
 
-def apply_topic_extensions(messages, session_data=None):
+# Admission control for chat routes - excess requests get a fast 503
+chat_admission = AdmissionController(
+    max_concurrent=int(os.getenv('MAX_CONCURRENT_CHATS', 32)),
+    max_queue=int(os.getenv('CHAT_QUEUE_SIZE', 64)),
+    queue_timeout=float(os.getenv('CHAT_QUEUE_TIMEOUT', 5))
+)
+SHED_RETRY_AFTER = int(os.getenv('SHED_RETRY_AFTER', 5))
+
+
+def admission_controlled(route):
     """
-    Analyze messages and apply relevant topic extensions to the system prompt
-    
-    Args:
-        messages: List of message dictionaries
-        session_data: Optional session data dictionary for tracking
-    
-    Returns:
-        Modified messages list with updated system prompt
+    Decorator for chat routes: shed load with 503 + Retry-After when the
+    server is at capacity or every configured provider is rate limited
     """
-    # Create a deep copy of messages to avoid modifying the original
-    modified_messages = [msg.copy() for msg in messages]
-    
-    # Detect topics in the conversation
-    detected_topics = detect_mental_health_topics(messages)
-    
-    # If no topics detected or no system message, return original
-    if not detected_topics:
-        return modified_messages
-    
-    # Find the system message
-    system_index = None
-    for i, msg in enumerate(modified_messages):
-        if msg.get('role') == 'system':
-            system_index = i
-            break
-    
-    if system_index is None:
-        print("No system message found to modify")
-        return modified_messages
-    
-    # Load extensions for detected topics (limit to top 2)
-    extensions = []
-    for topic in detected_topics[:2]:  # Limit to top 2 most relevant topics
-        extension_content = load_extension(topic)
-        if extension_content:
-            extensions.append(extension_content)
-    
-    # Update the system message with extensions
-    if extensions:
-        modified_messages[system_index]['content'] += "\n\n" + "\n\n".join(extensions)
-        
-        # Log the modification
-        print(f"Applied topic extensions: {detected_topics[:2]}")
-        
-        # Update session data if provided
-        if session_data is not None:
-            session_data['applied_extensions'] = detected_topics[:2]
-            session_data['extension_applied_at'] = datetime.now().isoformat()
-    
-    return modified_messages
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        configured = [name for name, key in
+                      (("qwen", QWEN_API_KEY), ("deepseek", DEEPSEEK_API_KEY), ("gemini", GEMINI_API_KEY))
+                      if key]
+        saturated = configured and not any(provider_limiters[name].has_capacity() for name in configured)
+        if saturated or not chat_admission.try_enter():
+            print("Shedding chat request - server at capacity")
+            response = jsonify({
+                "status": "error",
+                "code": "OVERLOADED",
+                "message": "The service is busy right now. Please try again in a few seconds."
+            })
+            response.headers['Retry-After'] = str(SHED_RETRY_AFTER)
+            return response, 503
+        try:
+            return route(*args, **kwargs)
+        finally:
+            chat_admission.leave()
+    return wrapper
+
+# Request throttling in front of the session-creation and chat routes.
+# Counters are kept in process memory alongside the sessions dictionary.
+session_create_throttle = SlidingWindowThrottle(int(os.getenv('SESSIONS_PER_IP_PER_MINUTE', 10)), 60)
+ip_request_throttle = SlidingWindowThrottle(int(os.getenv('REQUESTS_PER_IP_PER_MINUTE', 60)), 60)
+session_request_throttle = SlidingWindowThrottle(int(os.getenv('REQUESTS_PER_SESSION_PER_MINUTE', 20)), 60)
+TRUST_PROXY_HEADERS = os.getenv('TRUST_PROXY_HEADERS', 'false').lower() == 'true'
+# Client IPs never throttled, e.g. a load generator running lumonmind_replay.py
+# (admission control still applies to them)
+THROTTLE_EXEMPT_IPS = {ip.strip() for ip in os.getenv('THROTTLE_EXEMPT_IPS', '').split(',') if ip.strip()}
 
 
-def flask_implementation(session_id, messages):
+def get_client_ip():
+    """Return the client IP, honouring X-Forwarded-For only behind a trusted proxy"""
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+
+def throttled(route):
     """
-    Implementation for Flask API version
-    
-    Args:
-        session_id: The session identifier
-        messages: The message list
-    
-    Returns:
-        Modified messages with appropriate extensions
+    Decorator: per-IP and per-session sliding-window throttling
+
+    Requests without a known session (new sessions and routes that auto-create
+    them) also count against the per-IP session creation limit. Throttled
+    requests get 429 with Retry-After.
     """
-    # Get or initialize session data
-    if session_id not in sessions:
-        return messages
-    
-    session = sessions[session_id]
-    
-    # Initialize extension tracking in session data if not present
-    if 'applied_extensions' not in session:
-        session['applied_extensions'] = []
-    
-    if 'extension_applied_at' not in session:
-        session['extension_applied_at'] = None
-    
-    # Create session data dictionary for tracking
-    session_data = {
-        'applied_extensions': session.get('applied_extensions', []),
-        'extension_applied_at': session.get('extension_applied_at')
-    }
-    
-    # Apply extensions and update session
-    modified_messages = apply_topic_extensions(messages, session_data)
-    
-    # Update session with any changes
-    session['applied_extensions'] = session_data.get('applied_extensions', [])
-    session['extension_applied_at'] = session_data.get('extension_applied_at')
-    
-    return modified_messages
-
-
-# Function to detect therapist/counselor requests
-def detect_therapist_request(user_message):
-    """Detect if user is requesting to speak with a human therapist or counselor"""
-    therapist_keywords = [
-        "talk to a therapist", "speak to a therapist", 
-        "talk to a counselor", "speak to a counselor",
-        "human therapist", "real therapist", 
-        "book appointment", "schedule appointment",
-        "see a professional", "talk to a professional",
-        "book a session", "talk to a human",
-        "need real help", "want real help",
-        "see a therapist", "therapist appointment",
-        "need a therapist", "want a therapist",
-        "consult with a counselor", "meet with a therapist"
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        session_id = kwargs.get('session_id')
+        if session_id is None:
+            data = request.get_json(silent=True)
+            session_id = data.get('session_id') if isinstance(data, dict) else None
+        # The id is used as a throttle key, so lists/objects are rejected up front
+        if session_id is not None and not isinstance(session_id, str):
+            return jsonify({
+                "status": "error",
+                "error": "session_id must be a string"
+            }), 400
+        client_ip = get_client_ip()
+        if client_ip in THROTTLE_EXEMPT_IPS:
+            return route(*args, **kwargs)
+        
+        checks = [(ip_request_throttle, client_ip)]
+        if session_id is None or session_id not in sessions:
+            checks.append((session_create_throttle, client_ip))
+        if session_id is not None:
+            checks.append((session_request_throttle, session_id))
+        
+        for throttle, key in checks:
+            allowed, retry_after = throttle.hit(key)
+            if not allowed:
+                print(f"Throttled request from {client_ip} (session {session_id})")
+                response = jsonify({
+                    "status": "error",
+                    "code": "RATE_LIMITED",
+                    "message": "Too many requests. Please slow down and try again shortly."
+                })
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
+        return route(*args, **kwargs)
+    return wrapper
+
+# Load the prompt template, falling back to a generic prompt so the API keeps serving
+BASE_PROMPT = load_prompt_template(fallback=FALLBACK_PROMPT)
+
+# Base prompt + language block form the stable prefix providers can cache
+SYSTEM_PROMPT = build_system_prompt(BASE_PROMPT)
+
+# Opt-in exact-match cache for the first user turn of a conversation ("hi",
+# "hello", "I feel anxious"). Messages containing keywords from the bypass
+# topics always go to the provider.
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE', 'false').lower() == 'true'
+RESPONSE_CACHE_BYPASS_TOPICS = [
+    topic.strip() for topic in os.getenv('RESPONSE_CACHE_BYPASS_TOPICS', 'grief,depression').split(',')
+    if topic.strip()
+]
+# Short hash of the full system prompt so cached responses are invalidated by prompt edits
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:12]
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 500)),
+    ttl_seconds=int(os.getenv('RESPONSE_CACHE_TTL', 3600)),
+    bypass_keywords=[
+        keyword for topic in RESPONSE_CACHE_BYPASS_TOPICS
+        for keyword in TOPIC_KEYWORDS.get(topic, [])
     ]
-    
-    # Case-insensitive check for any keyword
-    user_message_lower = user_message.lower()
-    for keyword in therapist_keywords:
-        if keyword in user_message_lower:
-            return True
-    return False
+)
+
+# Templated reply used when a user asks for a human therapist in session_chat
+THERAPIST_REQUEST_RESPONSE = "I understand you'd like to speak with a therapist. Let me help you book an appointment."
+
+# Topic extension files, cached by modification time
+extension_registry = ExtensionRegistry()
+load_extension = extension_registry.load
 
 # Mock API response for testing when no API keys are available
 def mock_ai_response(messages):
@@ -438,452 +340,408 @@ def mock_ai_response(messages):
     else:
         return "Thank you for sharing that with me. Could you tell me more about how this is affecting you?", "mock"
     
-# Helper functions for API calls - Completely rewritten for reliability
-def call_qwen_api(messages):
-    """Call the Qwen API through Alibaba Cloud using OpenAI client"""
-    try:
-        if not QWEN_API_KEY:
-            print("Qwen API key is missing.")
-            return None, None
-            
-        try:
-            # Use OpenAI client with Alibaba Cloud's DashScope endpoint
-            from openai import OpenAI
-            
-            # Try both endpoints to increase chances of success
-            # Some regions work better with different endpoints
-            endpoints = [
-                "https://dashscope.aliyuncs.com/v1",
-                "https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
-            ]
-            
-            # Print API key (first few characters for debugging)
-            print(f"Using Qwen API key: {QWEN_API_KEY[:5]}...")
-            
-            # Convert messages for Qwen API - ensure all have role and content
-            api_messages = []
-            for msg in messages:
-                if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
-                    # Make sure content is string
-                    if not isinstance(msg['content'], str):
-                        msg['content'] = str(msg['content'])
-                    api_messages.append({
-                        'role': msg['role'],
-                        'content': msg['content']
-                    })
-            
-            # Debug logging
-            print("Sending to Qwen API:", json.dumps(api_messages, indent=2)[:500] + "...")
-            
-            # Try each endpoint until one works
-            last_error = None
-            for endpoint in endpoints:
-                try:
-                    print(f"Trying Qwen API endpoint: {endpoint}")
-                    client = OpenAI(
-                        api_key=QWEN_API_KEY,
-                        base_url=endpoint
-                    )
-                    
-                    completion = client.chat.completions.create(
-                        model=QWEN_MODEL,
-                        messages=api_messages,
-                        temperature=0.7,
-                        max_tokens=2000,
-                        timeout=60  # Increased timeout to 60 seconds
-                    )
-                    
-                    # Extract content from response
-                    content = completion.choices[0].message.content
-                    print(f"Qwen API returned content of length: {len(content)}")
-                    return content, "qwen"
-                    
-                except Exception as e:
-                    print(f"Qwen API Error with endpoint {endpoint}: {str(e)}")
-                    last_error = e
-                    continue  # Try the next endpoint
-            
-            # If we get here, all endpoints failed
-            print(f"All Qwen API endpoints failed. Last error: {str(last_error)}")
-            log_dir = os.path.join(os.path.dirname(__file__), "logs")
-            os.makedirs(log_dir, exist_ok=True)
-            error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-            with open(error_log, "a") as f:
-                f.write(f"[{datetime.now().isoformat()}] All Qwen API endpoints failed. Last error: {str(last_error)}\n")
-            return None, None
-                
-        except ImportError:
-            print("OpenAI module not installed. Please run: pip install openai>=1.0.0")
-            return None, None
-            
-    except Exception as e:
-        print(f"Qwen API failed with error: {e}")
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-        with open(error_log, "a") as f:
-            f.write(f"[{datetime.now().isoformat()}] Qwen Exception: {str(e)}\n")
-        return None, None
-    
-def call_deepseek_api(messages):
-    """Call the DeepSeek API with improved error handling and reliability"""
-    try:
-        if not DEEPSEEK_API_KEY:
-            print("DeepSeek API key is missing.")
-            return None, None
-            
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        # Print API key (first few characters for debugging)
-        print(f"Using DeepSeek API key: {DEEPSEEK_API_KEY[:5]}...")
-        
-        # Properly format messages for DeepSeek API
-        api_messages = []
-        for msg in messages:
-            if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
-                # Make sure content is string
-                if not isinstance(msg['content'], str):
-                    msg['content'] = str(msg['content'])
-                # Handle system role (DeepSeek uses 'system' role)
-                api_messages.append({
-                    'role': msg['role'],
-                    'content': msg['content']
-                })
-        
-        payload = {
-            "model": DEEPSEEK_MODEL,
-            "messages": api_messages,
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
-        
-        # Debug logging
-        print("Sending to DeepSeek API:", json.dumps(api_messages, indent=2)[:500] + "...")
-        
-        # Try both endpoints to increase chances of success
-        endpoints = [
-            "https://api.deepseek.com/v1/chat/completions",
-            "https://api.deepseek.ai/v1/chat/completions"  # Alternative endpoint
-        ]
-        
-        last_error = None
-        for endpoint_url in endpoints:
-            try:
-                print(f"Calling DeepSeek API at: {endpoint_url}")
-                
-                response = requests.post(
-                    endpoint_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=60  # Increased timeout to 60 seconds
-                )
-                
-                print(f"DeepSeek API Response Status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    response_json = response.json()
-                    print(f"DeepSeek API Response: {response_json}")
-                    return response_json["choices"][0]["message"]["content"], "deepseek"
-                else:
-                    print(f"DeepSeek API Error with endpoint {endpoint_url}: {response.text}")
-                    last_error = response.text
-                    continue  # Try the next endpoint
-            except requests.exceptions.RequestException as e:
-                print(f"DeepSeek API connection error with endpoint {endpoint_url}: {str(e)}")
-                last_error = str(e)
-                continue  # Try the next endpoint
-        
-        # If we get here, all endpoints failed
-        print(f"All DeepSeek API endpoints failed. Last error: {last_error}")
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-        with open(error_log, "a") as f:
-            f.write(f"[{datetime.now().isoformat()}] All DeepSeek API endpoints failed. Last error: {last_error}\n")
-        return None, None
-            
-    except Exception as e:
-        print(f"DeepSeek API failed with error: {e}")
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-        with open(error_log, "a") as f:
-            f.write(f"[{datetime.now().isoformat()}] DeepSeek Exception: {str(e)}\n")
-        return None, None
-
-def call_gemini_api(messages):
-    """Call the Google Gemini API with improved handling and formatting"""
-    try:
-        if not GEMINI_API_KEY:
-            print("Gemini API key is missing.")
-            return None, None
-            
-        try:
-            import google.generativeai as genai
-            genai.configure(api_key=GEMINI_API_KEY)
-            
-            # Debug logging
-            print(f"Using Gemini API with key: {GEMINI_API_KEY[:5]}...")
-            
-            # Try different models in case one is not available
-            models_to_try = [
-                GEMINI_MODEL,  # Main model (e.g., "gemini-2.0")
-                "gemini-1.5-pro",  # Fallback model
-                "gemini-pro"  # Legacy model as final fallback
-            ]
-            
-            last_error = None
-            for model_name in models_to_try:
-                try:
-                    print(f"Trying Gemini model: {model_name}")
-                    
-                    # Use the GenerativeModel directly
-                    model = genai.GenerativeModel(model_name)
-                    
-                    # Convert our message format to Gemini format
-                    gemini_messages = []
-                    system_content = None
-                    
-                    # Extract system message first
-                    for msg in messages:
-                        if msg["role"] == "system":
-                            system_content = msg["content"]
-                            break
-                    
-                    # Format remaining messages
-                    for msg in messages:
-                        if msg["role"] == "user":
-                            # Prepend system prompt to first user message if available
-                            if system_content and len(gemini_messages) == 0:
-                                content = f"{system_content}\n\nUser: {msg['content']}"
-                                gemini_messages.append({"role": "user", "parts": [content]})
-                                system_content = None  # Clear so we don't use it again
-                            else:
-                                gemini_messages.append({"role": "user", "parts": [msg["content"]]})
-                        elif msg["role"] == "assistant":
-                            gemini_messages.append({"role": "model", "parts": [msg["content"]]})
-                    
-                    # Debug logging
-                    print(f"Sending to Gemini API, {len(gemini_messages)} messages")
-                    
-                    # Set safety settings to be more permissive for mental health discussions
-                    safety_settings = [
-                        {
-                            "category": "HARM_CATEGORY_HARASSMENT",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                        },
-                        {
-                            "category": "HARM_CATEGORY_HATE_SPEECH",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                        },
-                        {
-                            "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                        },
-                        {
-                            "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                        }
-                    ]
-                    
-                    try:
-                        # Generate the content with safety settings if supported by the model
-                        try:
-                            response = model.generate_content(
-                                gemini_messages,
-                                safety_settings=safety_settings,
-                                generation_config={"temperature": 0.7, "max_output_tokens": 2000}
-                            )
-                        except TypeError:
-                            # If safety_settings not supported by this model version
-                            response = model.generate_content(
-                                gemini_messages,
-                                generation_config={"temperature": 0.7, "max_output_tokens": 2000}
-                            )
-                        
-                        if hasattr(response, 'text'):
-                            return response.text, "gemini"
-                        elif hasattr(response, 'parts'):
-                            return response.parts[0].text, "gemini"
-                        else:
-                            print(f"Unexpected response format from Gemini: {response}")
-                            last_error = "Unexpected response format"
-                            continue  # Try the next model
-                            
-                    except Exception as api_err:
-                        print(f"Gemini API call error with model {model_name}: {str(api_err)}")
-                        last_error = api_err
-                        continue  # Try the next model
-                        
-                except Exception as model_err:
-                    print(f"Gemini model initialization error with {model_name}: {str(model_err)}")
-                    last_error = model_err
-                    continue  # Try the next model
-            
-            # If we get here, all models failed
-            print(f"All Gemini API models failed. Last error: {last_error}")
-            log_dir = os.path.join(os.path.dirname(__file__), "logs")
-            os.makedirs(log_dir, exist_ok=True)
-            error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-            with open(error_log, "a") as f:
-                f.write(f"[{datetime.now().isoformat()}] All Gemini API models failed. Last error: {str(last_error)}\n")
-            return None, None
-            
-        except ImportError:
-            print("Google AI module not installed. Please run: pip install google-generativeai>=0.3.0")
-            return None, None
-        
-    except Exception as e:
-        print(f"Gemini API failed with error: {e}")
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        error_log = os.path.join(log_dir, f"error_log_{datetime.now().strftime('%Y%m%d')}.txt")
-        with open(error_log, "a") as f:
-            f.write(f"[{datetime.now().isoformat()}] Gemini Exception: {str(e)}\n")
-        return None, None
+def get_ai_response(messages, session_id, turn_data=None):
+    """
+    Run a chat turn through the engine: topic extensions, prompt assembly and provider routing
     
-def get_ai_response(messages, session_id):
-    """Try each AI service in order until one succeeds, with improved error handling"""
+    Args:
+        messages: The conversation so far, ending with the user's message
+        session_id: The session identifier
+        turn_data: Optional dictionary receiving this turn's 'detected_topics'
+    """
     
-    # Get the session to check for 5-minute rule
     session = sessions.get(session_id)
     if not session:
         return "Session not found. Please create a new session.", "error"
     
-    # Calculate chat duration to determine if we should apply 5-minute rule
-    is_first_5_minutes = False
-    if session.get('chat_start_time'):
-        try:
-            chat_duration = datetime.now() - datetime.fromisoformat(session['chat_start_time'])
-            is_first_5_minutes = chat_duration.total_seconds() < 300  # 5 minutes in seconds
-            print(f"DEBUG: Chat duration: {chat_duration.total_seconds()} seconds. First 5 minutes: {is_first_5_minutes}")
-        except Exception as e:
-            print(f"Error parsing chat start time: {e}")
-            is_first_5_minutes = False
+    # Extension state is tracked on the session and reported in chat responses
+    session_data = {
+        'applied_extensions': session.get('applied_extensions', []),
+        'extension_applied_at': session.get('extension_applied_at')
+    }
+    response = generate_response(
+        messages,
+        provider_router,
+        extension_registry,
+        session_data,
+        first_5_minutes=is_first_5_minutes(session.get('chat_start_time')),
+        session_id=session_id
+    )
+    session['applied_extensions'] = session_data.get('applied_extensions', [])
+    session['extension_applied_at'] = session_data.get('extension_applied_at')
+    if turn_data is not None:
+        turn_data['detected_topics'] = session_data.get('detected_topics', [])
+    return response
+
+def response_cache_context(session):
+    """
+    Short hash of everything besides the user's message that shapes the first
+    reply: the system prompt, the user's onboarding details (name, concerns)
+    and the earlier messages, such as the greeting that addresses them by name
     
-    # Create a copy of messages to modify
-    modified_messages = [msg.copy() if isinstance(msg, dict) else msg for msg in messages]
+    Users only share cached replies when all of these match.
+    """
+    user_info = session.get('user_info', {})
+    context = {
+        "prompt_version": PROMPT_VERSION,
+        "name": user_info.get('name', ''),
+        "concerns": sorted(user_info.get('concerns') or []),
+        "history": session['messages'][:-1]
+    }
+    encoded = json.dumps(context, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+def get_ai_response_with_cache(session_id, user_message, turn_data=None):
+    """
+    Get the AI response for the latest user message, serving the first user
+    turn of a conversation from the response cache when enabled
     
-    # Apply 5-minute counselor rule if applicable
-    if is_first_5_minutes:
-        # Find the system message and modify it
-        system_found = False
-        for i, msg in enumerate(modified_messages):
-            if isinstance(msg, dict) and msg.get("role") == "system":
-                # Add instruction to avoid counselor references unless crisis
-                modified_messages[i]["content"] += "\n\n## IMPORTANT TEMPORARY INSTRUCTION\nFor the first 5 minutes of this conversation, DO NOT suggest or refer the user to a counselor UNLESS they express crisis-level concerns (suicidal thoughts, self-harm, harm to others, or severe emotional distress). Focus on providing direct support and coping strategies yourself instead."
-                system_found = True
-                print("DEBUG: Added 5-minute instruction to system message")
-                break
-        
-        if not system_found:
-            print("DEBUG: No system message found to modify for 5-minute rule")
+    Args:
+        session_id: The session identifier
+        user_message: The user message already appended to the session
+        turn_data: Optional dictionary receiving this turn's 'detected_topics'
+                   (left unset on a cache hit, where no detection runs)
     
-    # Apply topic extensions
-    modified_messages = flask_implementation(session_id, modified_messages)
+    Returns:
+        Tuple of (response text, model used)
+    """
+    session = sessions[session_id]
+    user_turns = sum(1 for msg in session.get('messages', []) if msg.get('role') == 'user')
+    if not RESPONSE_CACHE_ENABLED or user_turns != 1:
+        return get_ai_response(session['messages'], session_id, turn_data)
     
-    # Verify that we have at least one API key before attempting to call APIs
-    have_api_keys = any([QWEN_API_KEY, DEEPSEEK_API_KEY, GEMINI_API_KEY])
-    if not have_api_keys:
-        return "Sorry, the AI service is currently unavailable. Please check your API key configuration.", "error"
+    language = session.get('user_info', {}).get('language', 'English')
+    cache_key = response_cache.make_key(user_message, response_cache_context(session), language)
+    with traced_stage("response_cache"):
+        cached = response_cache.get(cache_key)
+    if cached:
+        print(f"Response cache hit for session {session_id}")
+        return cached
     
-    # Detailed logging of API attempt sequence
-    print(f"Starting API call sequence with keys: Qwen: {bool(QWEN_API_KEY)}, DeepSeek: {bool(DEEPSEEK_API_KEY)}, Gemini: {bool(GEMINI_API_KEY)}")
+    ai_message, model_used = get_ai_response(session['messages'], session_id, turn_data)
     
-    # First try Qwen API (primary)
-    if QWEN_API_KEY:
-        print("Attempting to call Qwen API...")
-        start_time = time.time()
-        response, source = call_qwen_api(modified_messages)
-        elapsed = time.time() - start_time
-        if response:
-            print(f"Successfully received response from Qwen API in {elapsed:.2f} seconds")
-            return response, source
-        print(f"Qwen API failed after {elapsed:.2f} seconds")
-    else:
-        print("Skipping Qwen API (no API key)")
+    # Only cache real provider answers
+    if model_used not in ('error', 'mock'):
+        response_cache.put(cache_key, ai_message, model_used)
     
-    # Then try DeepSeek API (first fallback)
-    if DEEPSEEK_API_KEY:
-        print("Attempting to call DeepSeek API...")
-        start_time = time.time()
-        response, source = call_deepseek_api(modified_messages)
-        elapsed = time.time() - start_time
-        if response:
-            print(f"Successfully received response from DeepSeek API in {elapsed:.2f} seconds")
-            return response, source
-        print(f"DeepSeek API failed after {elapsed:.2f} seconds")
-    else:
-        print("Skipping DeepSeek API (no API key)")
+    return ai_message, model_used
+
+def generate_crisis_follow_up(session_id, history, safety_message):
+    """
+    Generate the LLM follow-up for a crisis message in the background
     
-    # Finally try Gemini API (second fallback)
-    if GEMINI_API_KEY:
-        print("Attempting to call Gemini API...")
-        start_time = time.time()
-        response, source = call_gemini_api(modified_messages)
-        elapsed = time.time() - start_time
-        if response:
-            print(f"Successfully received response from Gemini API in {elapsed:.2f} seconds")
-            return response, source
-        print(f"Gemini API failed after {elapsed:.2f} seconds")
-    else:
-        print("Skipping Gemini API (no API key)")
+    The vetted safety response has already been returned, appended to the
+    session and logged with the user's message, so the follow-up is appended
+    as an additional assistant message and logged as an assistant-only addendum.
     
-    # Log comprehensive error details
+    Args:
+        session_id: The session identifier
+        history: Snapshot of the conversation ending with the crisis message
+        safety_message: The safety response entry appended to the session
+    """
+    try:
+        start_turn_trace()
+        if session_id not in sessions:
+            return
+        
+        # The provider answers the user's message, not the safety response
+        ai_message, model_used = get_ai_response(history, session_id)
+        
+        # The session may have been deleted or cleared while we were waiting
+        session = sessions.get(session_id)
+        if session is None:
+            return
+        messages = session['messages']
+        # Only append directly after the safety response; once the user has
+        # moved on, the follow-up would answer an older message out of order
+        is_latest = bool(messages) and messages[-1] is safety_message
+        if model_used != 'error' and is_latest:
+            messages.append({"role": "assistant", "content": ai_message})
+            log_conversation(None, ai_message, model_used, session_id)
+        elif model_used != 'error':
+            print(f"Dropping crisis follow-up for session {session_id}: newer messages exist")
+        session['crisis_follow_up_pending'] = False
+        print(f"Crisis follow-up generated for session {session_id} using {model_used}")
+    except Exception as e:
+        print(f"Error generating crisis follow-up: {e}")
+        if session_id in sessions:
+            sessions[session_id]['crisis_follow_up_pending'] = False
+
+
+def handle_crisis_message(session_id, user_message):
+    """
+    Crisis fast path - reply with the vetted safety response immediately and
+    schedule the LLM follow-up asynchronously
+    
+    Args:
+        session_id: The session identifier
+        user_message: The user message (already appended to the session)
+    
+    Returns:
+        The safety response text
+    """
+    session = sessions[session_id]
+    language = session.get('user_info', {}).get('language', 'English')
+    safety_response = get_crisis_response(language)
+    
+    history = list(session['messages'])
+    safety_message = {"role": "assistant", "content": safety_response}
+    session['messages'].append(safety_message)
+    session['show_therapist_options'] = True
+    session['crisis_follow_up_pending'] = True
+    log_conversation(user_message, safety_response, "crisis-fast-path", session_id)
+    
+    background_executor.submit(generate_crisis_follow_up, session_id, history, safety_message)
+    return safety_response
+
+# Database persistence (write-behind). Enabled by setting DATABASE_URL to a
+# PostgreSQL URL, or sqlite:///path for local development. The writer is
+# created lazily so each gunicorn worker opens its own pool after fork.
+database = None
+persistence_writer = None
+persistence_lock = threading.Lock()
+persistence_checked = False
+
+
+def get_database():
+    """Return the shared Database (connection pool), or None if DATABASE_URL is not set"""
+    global database, persistence_writer, persistence_checked
+    if not persistence_checked:
+        with persistence_lock:
+            if not persistence_checked:
+                database = create_database_from_env()
+                if database is not None:
+                    persistence_writer = PersistenceWriter(
+                        database,
+                        batch_size=int(os.getenv('DB_BATCH_SIZE', 200)),
+                        flush_interval=float(os.getenv('DB_FLUSH_INTERVAL', 1.0)),
+                        max_queue=int(os.getenv('DB_MAX_QUEUE', 10000)),
+                        max_attempts=int(os.getenv('DB_WRITE_ATTEMPTS', 3)),
+                        max_sessions=int(os.getenv('DB_SESSION_CACHE_SIZE', 10000))
+                    )
+                    register_shutdown_hook(persistence_writer.close)
+                    audit_buffer.database = database
+                    print(f"Database persistence enabled ({'SQLite' if database.is_sqlite else 'PostgreSQL'})")
+                persistence_checked = True
+    return database
+
+
+def get_persistence_writer():
+    """Return the write-behind persistence writer, or None if persistence is disabled"""
+    get_database()
+    return persistence_writer
+
+
+# Specialist slot search (PostgreSQL only - see lumonmind_slots.py)
+slot_service = None
+
+
+def get_slot_service():
+    """Return the SlotService, or None without a PostgreSQL database"""
+    global slot_service
+    db = get_database()
+    if db is None or db.is_sqlite:
+        return None
+    if slot_service is None:
+        slot_service = SlotService(
+            db,
+            horizon_days=int(os.getenv('SLOT_HORIZON_DAYS', 28)),
+            slot_minutes=int(os.getenv('SLOT_MINUTES', 60))
+        )
+    return slot_service
+
+
+# Audit trail - every API route records an event in an in-process ring buffer;
+# a background thread bulk-writes them to AuditLogs (or logs/audit_*.json)
+audit_buffer = AuditBuffer(
+    log_dir=os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs"),
+    capacity=int(os.getenv('AUDIT_BUFFER_SIZE', 50000)),
+    flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', 2.0)),
+    batch_size=int(os.getenv('AUDIT_BATCH_SIZE', 5000))
+)
+register_shutdown_hook(audit_buffer.flush)
+
+# Flask endpoint -> AuditLogs.ActionType. Static files and health probes are not audited.
+AUDIT_ACTIONS = {
+    'create_session': 'session_create',
+    'onboard_user': 'session_onboard',
+    'chat': 'chat_message',
+    'session_chat': 'chat_message',
+    'get_conversation': 'conversation_read',
+    'clear_session': 'session_clear',
+    'end_session_chat': 'session_end',
+    'delete_session': 'session_delete',
+    'submit_feedback': 'feedback_submit',
+    'search_slots': 'slot_search',
+    'book_therapist': 'appointment_book',
+}
+
+
+@app.after_request
+def record_audit_event(response):
+    """Buffer an audit event for every audited route (no I/O on the request path)"""
+    action_type = AUDIT_ACTIONS.get(request.endpoint)
+    if action_type is None:
+        return response
+    try:
+        session_id = (request.view_args or {}).get('session_id')
+        if session_id is None and request.is_json:
+            session_id = (request.get_json(silent=True) or {}).get('session_id')
+        if session_id is None and action_type == 'session_create' and response.is_json:
+            session_id = (response.get_json(silent=True) or {}).get('session_id')
+        audit_buffer.record(
+            action_type,
+            f"{request.method} {request.path} -> {response.status_code} session={session_id}",
+            get_client_ip()
+        )
+    except Exception as e:
+        print(f"Error recording audit event: {e}")
+    return response
+
+
+# Feedback rating stats, kept in memory and checkpointed to a JSON file
+FEEDBACK_RATINGS = (1, 2, 3, 4, 5)
+FEEDBACK_CATEGORIES = ('ai-interaction', 'specialist-session', 'app-experience')
+feedback_aggregator = FeedbackAggregator(
+    checkpoint_path=os.getenv(
+        'FEEDBACK_STATS_FILE',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "feedback_stats.json")
+    ),
+    checkpoint_interval=float(os.getenv('FEEDBACK_STATS_CHECKPOINT_INTERVAL', 60))
+)
+register_shutdown_hook(feedback_aggregator.checkpoint)
+
+
+# Appointment booking (PostgreSQL only - see lumonmind_booking.py)
+booking_service = None
+
+
+def get_booking_service():
+    """Return the BookingService, or None without a PostgreSQL database"""
+    global booking_service
+    db = get_database()
+    if db is None or db.is_sqlite:
+        return None
+    if booking_service is None:
+        booking_service = BookingService(db, appointment_minutes=int(os.getenv('SLOT_MINUTES', 60)))
+    return booking_service
+
+
+def log_appointment_request(session_id, appointment, data):
+    """Append a booking request to the daily appointments log (used without a database)"""
     log_dir = os.path.join(os.path.dirname(__file__), "logs")
     os.makedirs(log_dir, exist_ok=True)
-    error_log = os.path.join(log_dir, f"api_failure_{datetime.now().strftime('%Y%m%d')}.txt")
     
-    # Write detailed error log with message data for debugging
-    with open(error_log, "a") as f:
-        f.write(f"[{datetime.now().isoformat()}] All API calls failed for session {session_id}\n")
-        f.write(f"API keys available: Qwen: {bool(QWEN_API_KEY)}, DeepSeek: {bool(DEEPSEEK_API_KEY)}, Gemini: {bool(GEMINI_API_KEY)}\n")
-        f.write("Message count: " + str(len(modified_messages)) + "\n")
-        f.write("First few messages (truncated):\n")
-        for i, msg in enumerate(modified_messages[:3]):  # First 3 messages only
-            if isinstance(msg, dict):
-                role = msg.get('role', 'unknown')
-                content = msg.get('content', '')[:100] + '...' if len(msg.get('content', '')) > 100 else msg.get('content', '')
-                f.write(f"  Message {i}: Role={role}, Content={content}\n")
+    appointment_log = os.path.join(log_dir, f"appointments_{datetime.now().strftime('%Y%m%d')}.json")
+    with open(appointment_log, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "timestamp": datetime.now().isoformat(),
+            "session_id": session_id,
+            "appointment": appointment,
+            "user_details": {
+                "name": data.get('name'),
+                "email": data.get('email'),
+                "phone": data.get('phone')
+            }
+        }, ensure_ascii=False) + "\n")
+
+
+def persist_conversation_turn(user_message, ai_message, model_used, conversation_id, detected_topics=None):
+    """
+    Queue one user/assistant exchange for the Messages table (never blocks)
     
-    # If all APIs failed, return an appropriate error message
-    return "I'm sorry, I'm having connectivity issues right now. Please try again later. The server team has been notified of this issue.", "error"
+    Args:
+        user_message: The user's message, or None for an assistant-only addendum
+        ai_message: The assistant's reply
+        model_used: Provider that answered
+        conversation_id: The session identifier
+        detected_topics: Topics detected for this turn, or None if none were computed
+    """
+    writer = get_persistence_writer()
+    if writer is None:
+        return
+    if user_message is not None:
+        writer.message(conversation_id, 'user', user_message, detected_topics=detected_topics or None)
+    writer.message(conversation_id, 'assistant', ai_message, model_used=model_used)
+
+
+def persist_session_end(conversation_id, status='completed'):
+    """Queue the end of a conversation for the Sessions table"""
+    writer = get_persistence_writer()
+    if writer is not None:
+        writer.session_ended(conversation_id, status)
+
+# Chat turns are traced from the start of the request so the conversation log
+# entry can record stage timings, provider attempts and total server time
+TRACED_ENDPOINTS = ('chat', 'session_chat')
+
+
+@app.before_request
+def start_chat_trace():
+    if request.endpoint in TRACED_ENDPOINTS:
+        start_turn_trace()
+
 
-# Log conversations to a file
-def log_conversation(user_message, ai_message, model_used, conversation_id):
+# Offset index over the daily conversation logs (see lumonmind_log_index.py)
+conversation_log_index = ConversationLogIndex(LOG_DIR)
+
+# Deleted sessions whose stored records are still being erased in the
+# background; their history must not be served from the logs meanwhile
+pending_erasures = set()
+
+
+def erase_conversation_records(session_id):
+    """
+    Erase everything stored about a deleted session (runs in the background)
+    
+    Overwrites its records in the day logs, deletes its database rows and
+    removes its turns from the columnar analytics archives.
+    """
     try:
-        # Create logs directory if it doesn't exist
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # Create log entry
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "conversation_id": conversation_id,
-            "user_message": user_message,
-            "ai_message": ai_message,
-            "model_used": model_used
-        }
-        
-        try:
-            log_file = os.path.join(log_dir, f"conversation_{datetime.now().strftime('%Y%m%d')}.json")
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
-        except Exception as e:
-            # If file writing fails, print to stdout instead
-            print(f"LOG: {json.dumps(log_entry, ensure_ascii=False)}")
-            print(f"File writing error: {e}")
+        erased = conversation_log_index.erase(session_id)
+        pending_erasures.discard(session_id)
+        writer = get_persistence_writer()
+        deleted_rows = writer.erase_session(session_id) if writer else 0
+        archived_turns = 0
+        archive_dir = os.getenv('LOG_ARCHIVE_DIR') or os.path.join(LOG_DIR, "archive")
+        if os.path.isdir(archive_dir):
+            # Imported here: numpy is only needed when archives exist
+            from lumonmind_log_archive import erase_conversation
+            archived_turns = erase_conversation(archive_dir, session_id)
+        print(f"Erased session {session_id}: {erased} log records, {deleted_rows} messages, "
+              f"{archived_turns} archived turns")
     except Exception as e:
-        print(f"Error logging conversation: {e}")
-        
+        print(f"Error erasing records of session {session_id}: {e}")
+
+# Log conversations to the indexed day logs (see lumonmind/conversation_log.py)
+# (user_message None logs an assistant-only addendum to the previous turn)
+def log_conversation(user_message, ai_message, model_used, conversation_id, detected_topics=None):
+    # Remember which model answered last so feedback can be attributed to it
+    if conversation_id in sessions:
+        sessions[conversation_id]['last_model_used'] = model_used
+    persist_conversation_turn(user_message, ai_message, model_used, conversation_id, detected_topics)
+    write_conversation_log(user_message, ai_message, model_used, conversation_id, LOG_DIR,
+                           sessions.get(conversation_id, {}).get('applied_extensions'))
+        
+# Running session counters so status endpoints never scan the sessions dict
+session_counters = {"created": 0, "deleted": 0}
+session_counters_lock = threading.Lock()
+
+
+def count_session_event(event):
+    """Increment a running session counter ("created" or "deleted")"""
+    with session_counters_lock:
+        session_counters[event] += 1
+
 # Function to initialize a new session
 def initialize_session(session_id=None):
     if not session_id:
         session_id = str(uuid.uuid4())
     
+    # Re-initializing an existing session (clear) is not a new session
+    if session_id not in sessions:
+        count_session_event("created")
+    
     sessions[session_id] = {
         "conversation_id": session_id,
         "messages": [],
@@ -900,12 +758,86 @@ def initialize_session(session_id=None):
         "last_appointment": None
     }
     
+    writer = get_persistence_writer()
+    if writer is not None:
+        writer.session_started(session_id)
+    
     return session_id
 
+# Status snapshot served by /api/health and /api/status. A background thread
+# rebuilds it every STATUS_REFRESH_INTERVAL seconds so load balancer probes
+# never touch the filesystem or scan the sessions dictionary.
+STATUS_REFRESH_INTERVAL = float(os.getenv('STATUS_REFRESH_INTERVAL', 5))
+status_snapshot = None
+status_refresher_started = False
+status_refresher_lock = threading.Lock()
+
+
+def build_status_snapshot():
+    """Collect everything reported by the health and status endpoints"""
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    extension_status = extension_registry.available()
+    
+    # Count active sessions (sessions with messages) off the request path
+    active_sessions = sum(1 for s in list(sessions.values()) if s.get('messages'))
+    with session_counters_lock:
+        counters = dict(session_counters)
+    
+    return {
+        "built_at": time.time(),
+        "active_sessions": active_sessions,
+        "session_counters": counters,
+        "extensions": extension_status,
+        "prompt_file_exists": os.path.exists(os.path.join(base_path, "lumonmind_prompt.md")),
+        "providers": get_provider_health(),
+        "provider_startup": dict(provider_startup),
+        "prompt_cache": get_prompt_cache_stats(),
+        "rate_limits": {
+            provider: limiter.snapshot() for provider, limiter in provider_limiters.items()
+        },
+        "admission": chat_admission.snapshot(),
+        "throttling": {
+            "session_create_per_ip": session_create_throttle.snapshot(),
+            "requests_per_ip": ip_request_throttle.snapshot(),
+            "requests_per_session": session_request_throttle.snapshot()
+        },
+        "response_cache": response_cache.snapshot(),
+        "persistence": persistence_writer.snapshot() if persistence_writer else {"enabled": False},
+        "audit": audit_buffer.snapshot()
+    }
+
+
+def refresh_status_snapshot_forever():
+    """Background loop that keeps the status snapshot fresh"""
+    global status_snapshot
+    while True:
+        time.sleep(STATUS_REFRESH_INTERVAL)
+        try:
+            status_snapshot = build_status_snapshot()
+        except Exception as e:
+            print(f"Error refreshing status snapshot: {e}")
+
+
+def get_status_snapshot():
+    """Return the current status snapshot, starting the refresher on first use"""
+    global status_snapshot, status_refresher_started
+    if not status_refresher_started:
+        with status_refresher_lock:
+            if not status_refresher_started:
+                status_snapshot = build_status_snapshot()
+                threading.Thread(
+                    target=refresh_status_snapshot_forever,
+                    name='lumonmind-status',
+                    daemon=True
+                ).start()
+                status_refresher_started = True
+    return status_snapshot
+
 # API endpoints
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint to verify the API is running"""
+    snapshot = get_status_snapshot()
     return jsonify({
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
@@ -915,14 +847,31 @@ def health_check():
             "gemini": bool(GEMINI_API_KEY),
             "mock_mode": MOCK_API_MODE
         },
+        "providers": {
+            provider: health["state"] for provider, health in snapshot["providers"].items()
+        },
         "prompt_loaded": bool(SYSTEM_PROMPT),
-        "extensions_available": {
-            topic: bool(load_extension(topic)) 
-            for topic in TOPIC_KEYWORDS.keys()
-        }
+        "extensions_available": snapshot["extensions"],
+        "snapshot_age_seconds": round(time.time() - snapshot["built_at"], 2)
+    })
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint - 200 only after warm-up has completed"""
+    if not instance_ready.is_set():
+        return jsonify({
+            "status": "warming_up",
+            "timestamp": datetime.now().isoformat()
+        }), 503
+    
+    return jsonify({
+        "status": "ready",
+        "timestamp": datetime.now().isoformat(),
+        "endpoints": endpoint_probes
     })
 
 @app.route('/api/session/new', methods=['POST'])
+@throttled
 def create_session():
     """Create a new session for a user"""
     try:
@@ -944,6 +893,8 @@ def create_session():
         }), 500
 
 @app.route('/api/chat', methods=['POST'])
+@throttled
+@admission_controlled
 def chat():
     """Process a chat message and return a response"""
     try:
@@ -978,6 +929,26 @@ def chat():
         # Initialize chat_start_time if not already set
         if 'chat_start_time' not in session:
             session['chat_start_time'] = datetime.now().isoformat()
+        
+        # Crisis fast path - runs locally before any LLM round-trip
+        with traced_stage("crisis_detection"):
+            crisis_phrase = detect_crisis_language(user_message)
+        if crisis_phrase:
+            print(f"Crisis language detected in session {session_id}")
+            if not session.get('messages'):
+                session['messages'] = [{"role": "system", "content": SYSTEM_PROMPT}]
+            session['messages'].append({"role": "user", "content": user_message})
+            safety_response = handle_crisis_message(session_id, user_message)
+            return jsonify({
+                "status": "success",
+                "message": safety_response,
+                "model_used": "crisis-fast-path",
+                "timestamp": datetime.now().isoformat(),
+                "session_id": session_id,
+                "show_therapist_options": True,
+                "crisis": True,
+                "follow_up_pending": True
+            })
             
         # Check for therapist request
         is_therapist_request = detect_therapist_request(user_message)
@@ -998,13 +969,14 @@ def chat():
             
         # Get AI response
         print(f"Getting AI response for session {session_id}")
-        ai_message, model_used = get_ai_response(session['messages'], session_id)
+        turn_data = {}
+        ai_message, model_used = get_ai_response_with_cache(session_id, user_message, turn_data)
         
         # Add AI response to session messages
         session['messages'].append({"role": "assistant", "content": ai_message})
         
         # Log the conversation
-        log_conversation(user_message, ai_message, model_used, session_id)
+        log_conversation(user_message, ai_message, model_used, session_id, turn_data.get('detected_topics'))
         
         # Check if therapist keyword is in AI response
         if any(keyword in ai_message.lower() for keyword in ["therapist", "counselor", "professional help"]):
@@ -1045,10 +1017,27 @@ def chat():
 def get_conversation(session_id):
     """Get the conversation history for a session"""
     if session_id not in sessions:
+        # Session no longer in memory - rebuild the history from the logs
+        records = [] if session_id in pending_erasures else conversation_log_index.lookup(session_id)
+        if not records:
+            return jsonify({
+                "status": "error",
+                "error": "Session not found"
+            }), 404
+        messages = []
+        for record in records:
+            # Assistant-only addenda (crisis follow-ups) have no user message
+            if record.get("user_message") is not None:
+                messages.append({"role": "user", "content": record["user_message"]})
+            messages.append({"role": "assistant", "content": record.get("ai_message", "")})
         return jsonify({
-            "status": "error",
-            "error": "Session not found"
-        }), 404
+            "status": "success",
+            "session_id": session_id,
+            "messages": messages,
+            "follow_up_pending": False,
+            "source": "log",
+            "timestamp": datetime.now().isoformat()
+        })
         
     session = sessions[session_id]
     
@@ -1060,6 +1049,7 @@ def get_conversation(session_id):
         "status": "success",
         "session_id": session_id,
         "messages": messages,
+        "follow_up_pending": session.get('crisis_follow_up_pending', False),
         "timestamp": datetime.now().isoformat()
     })
 
@@ -1077,8 +1067,24 @@ def submit_feedback():
             }), 400
             
         session_id = data['session_id']
-        rating = data['rating']
         feedback_text = data.get('feedback', '')
+        category = data.get('category', 'ai-interaction')
+        specialist_id = data.get('specialist_id')
+        
+        try:
+            rating = int(data['rating'])
+        except (TypeError, ValueError):
+            rating = None
+        if rating not in FEEDBACK_RATINGS:
+            return jsonify({
+                "status": "error",
+                "error": "Rating must be a whole number from 1 to 5"
+            }), 400
+        if category not in FEEDBACK_CATEGORIES:
+            return jsonify({
+                "status": "error",
+                "error": f"Category must be one of: {', '.join(FEEDBACK_CATEGORIES)}"
+            }), 400
         
         # Check if session exists
         if session_id not in sessions:
@@ -1086,22 +1092,32 @@ def submit_feedback():
                 "status": "error",
                 "error": "Session not found"
             }), 404
-            
-        # Create logs directory if it doesn't exist
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
         
-        # Log the feedback
-        feedback_log = os.path.join(log_dir, f"feedback_{datetime.now().strftime('%Y%m%d')}.json")
-        feedback_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "session_id": session_id,
-            "rating": rating,
-            "feedback": feedback_text
-        }
+        # Update running stats in memory (served by /api/feedback/stats)
+        model_used = sessions[session_id].get('last_model_used') if category == 'ai-interaction' else None
+        feedback_aggregator.record(rating, category, specialist_id, model_used)
         
-        with open(feedback_log, "a", encoding="utf-8") as f:
-            f.write(json.dumps(feedback_entry, ensure_ascii=False) + "\n")
+        # Queue for the batched database writer, or fall back to the daily log file
+        writer = get_persistence_writer()
+        if writer is not None:
+            writer.feedback(session_id, rating, category, specialist_id, feedback_text or None)
+        else:
+            log_dir = os.path.join(os.path.dirname(__file__), "logs")
+            os.makedirs(log_dir, exist_ok=True)
+            
+            feedback_log = os.path.join(log_dir, f"feedback_{datetime.now().strftime('%Y%m%d')}.json")
+            feedback_entry = {
+                "timestamp": datetime.now().isoformat(),
+                "session_id": session_id,
+                "rating": rating,
+                "feedback": feedback_text,
+                "category": category,
+                "specialist_id": specialist_id,
+                "model_used": model_used
+            }
+            
+            with open(feedback_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(feedback_entry, ensure_ascii=False) + "\n")
             
         return jsonify({
             "status": "success",
@@ -1115,6 +1131,15 @@ def submit_feedback():
             "error": "An unexpected error occurred"
         }), 500
 
+@app.route('/api/feedback/stats', methods=['GET'])
+def feedback_stats():
+    """Running rating statistics per category, specialist and model (served from memory)"""
+    return jsonify({
+        "status": "success",
+        "stats": feedback_aggregator.snapshot(),
+        "timestamp": datetime.now().isoformat()
+    })
+
 @app.route('/api/session/<session_id>/clear', methods=['POST'])
 def clear_session(session_id):
     """Clear a session's conversation history but keep the session alive"""
@@ -1128,6 +1153,9 @@ def clear_session(session_id):
     session = sessions[session_id]
     user_info = session.get('user_info', {})
     
+    # The cleared conversation is stored as interrupted; a new one starts
+    persist_session_end(session_id, 'interrupted')
+    
     # Re-initialize session with same ID
     initialize_session(session_id)
     
@@ -1143,45 +1171,50 @@ def clear_session(session_id):
 @app.route('/api/status', methods=['GET'])
 def api_status():
     """Extended status endpoint with more detailed information"""
-    # Count active sessions (sessions with messages)
-    active_sessions = sum(1 for s in sessions.values() if s.get('messages'))
-    
-    # Check extensions directory
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    extensions_dir = os.path.join(base_path, "extensions")
-    extension_status = {}
-    
-    if os.path.exists(extensions_dir):
-        for topic in TOPIC_KEYWORDS.keys():
-            extension_path = os.path.join(extensions_dir, f"{topic}_extension.md")
-            extension_status[topic] = os.path.exists(extension_path)
-    
-    # Check for prompt file
-    prompt_path = os.path.join(base_path, "lumonmind_prompt.md")
-    prompt_exists = os.path.exists(prompt_path)
+    snapshot = get_status_snapshot()
     
     return jsonify({
         "status": "operational",
         "version": "1.0.0",  # Update with your actual version
         "timestamp": datetime.now().isoformat(),
         "uptime": time.time() - app.start_time if hasattr(app, 'start_time') else 0,
-        "active_sessions": active_sessions,
+        "snapshot_age_seconds": round(time.time() - snapshot["built_at"], 2),
+        "active_sessions": snapshot["active_sessions"],
         "total_sessions": len(sessions),
+        "session_counters": snapshot["session_counters"],
         "api_services": {
             "qwen": "available" if QWEN_API_KEY else "unavailable",
             "deepseek": "available" if DEEPSEEK_API_KEY else "unavailable",
             "gemini": "available" if GEMINI_API_KEY else "unavailable",
             "mock_mode": MOCK_API_MODE
         },
+        "providers": snapshot["providers"],
+        "provider_startup": snapshot["provider_startup"],
+        "ready": instance_ready.is_set(),
+        "endpoint_probes": endpoint_probes,
         "system_prompt": {
             "loaded": bool(SYSTEM_PROMPT),
-            "file_exists": prompt_exists,
+            "file_exists": snapshot["prompt_file_exists"],
             "length": len(SYSTEM_PROMPT) if SYSTEM_PROMPT else 0
         },
-        "extensions": extension_status
+        "prompt_cache": {
+            "enabled": PROMPT_CACHE_ENABLED,
+            "providers": snapshot["prompt_cache"]
+        },
+        "rate_limits": snapshot["rate_limits"],
+        "admission": snapshot["admission"],
+        "throttling": snapshot["throttling"],
+        "response_cache": dict(
+            snapshot["response_cache"],
+            enabled=RESPONSE_CACHE_ENABLED,
+            prompt_version=PROMPT_VERSION,
+            bypass_topics=RESPONSE_CACHE_BYPASS_TOPICS
+        ),
+        "extensions": snapshot["extensions"]
     })
     
 @app.route('/api/session/<session_id>/onboard', methods=['POST'])
+@throttled
 def onboard_user(session_id):
     """Set up user information after onboarding"""
     try:
@@ -1250,6 +1283,8 @@ def onboard_user(session_id):
         }), 500
 
 @app.route('/api/session/<session_id>/chat', methods=['POST'])
+@throttled
+@admission_controlled
 def session_chat(session_id):
     """Process a chat message within a specific session"""
     try:
@@ -1280,6 +1315,24 @@ def session_chat(session_id):
             
         user_message = data['message']
         
+        # Crisis fast path - runs locally before any LLM round-trip
+        with traced_stage("crisis_detection"):
+            crisis_phrase = detect_crisis_language(user_message)
+        if crisis_phrase:
+            print(f"Crisis language detected in session {session_id}")
+            if not session.get('messages'):
+                session['messages'] = [{"role": "system", "content": SYSTEM_PROMPT}]
+            session['messages'].append({"role": "user", "content": user_message})
+            safety_response = handle_crisis_message(session_id, user_message)
+            return jsonify({
+                "status": "success",
+                "response": safety_response,
+                "model_used": "crisis-fast-path",
+                "is_therapist_request": True,
+                "crisis": True,
+                "follow_up_pending": True
+            })
+        
         # Check for therapist request
         is_therapist_request = detect_therapist_request(user_message)
         if is_therapist_request:
@@ -1288,7 +1341,7 @@ def session_chat(session_id):
             return jsonify({
                 "status": "success",
                 "is_therapist_request": True,
-                "response": "I understand you'd like to speak with a therapist. Let me help you book an appointment."
+                "response": THERAPIST_REQUEST_RESPONSE
             })
             
         # Add user message to conversation
@@ -1302,13 +1355,14 @@ def session_chat(session_id):
         session['messages'].append({"role": "user", "content": user_message})
         
         # Get AI response
-        ai_message, model_used = get_ai_response(session['messages'], session_id)
+        turn_data = {}
+        ai_message, model_used = get_ai_response_with_cache(session_id, user_message, turn_data)
         
         # Add AI response to conversation
         session['messages'].append({"role": "assistant", "content": ai_message})
         
         # Log the conversation
-        log_conversation(user_message, ai_message, model_used, session_id)
+        log_conversation(user_message, ai_message, model_used, session_id, turn_data.get('detected_topics'))
         
         # Check if therapist options should be shown based on AI response
         therapist_mention = any(keyword in ai_message.lower() for keyword in ["therapist", "counselor", "professional help"])
@@ -1352,6 +1406,12 @@ def end_session_chat(session_id):
             {"role": "system", "content": SYSTEM_PROMPT}
         ]
         
+        # Close the finished conversation in the database and start a new one
+        persist_session_end(session_id, 'completed')
+        writer = get_persistence_writer()
+        if writer is not None:
+            writer.session_started(session_id)
+        
         # Reset chat start time
         session['chat_start_time'] = datetime.now().isoformat()
         
@@ -1378,21 +1438,33 @@ def end_session_chat(session_id):
 
 @app.route('/api/session/<session_id>', methods=['DELETE'])
 def delete_session(session_id):
-    """Delete a session completely"""
+    """
+    Delete a session completely
+    
+    The session leaves memory immediately; its records in the conversation
+    logs, the database and the analytics archives are erased in the
+    background (also for sessions no longer in memory).
+    """
     try:
+        session = sessions.pop(session_id, None)
+        
         # Verify session exists
-        if session_id not in sessions:
+        if session is None and not conversation_log_index.lookup(session_id):
             return jsonify({
                 "status": "error",
                 "message": "Session not found"
             }), 404
             
-        # Delete the session
-        del sessions[session_id]
+        if session is not None:
+            count_session_event("deleted")
+        
+        pending_erasures.add(session_id)
+        background_executor.submit(erase_conversation_records, session_id)
         
         return jsonify({
             "status": "success",
-            "message": "Session deleted successfully"
+            "message": "Session deleted successfully",
+            "erasure": "pending"
         })
         
     except Exception as e:
@@ -1402,6 +1474,43 @@ def delete_session(session_id):
             "message": "An error occurred deleting the session"
         }), 500
         
+@app.route('/api/specialists/slots', methods=['GET'])
+def search_slots():
+    """Next free appointment slots for a specialization or a specialist"""
+    try:
+        service = get_slot_service()
+        if service is None:
+            return jsonify({
+                "status": "error",
+                "message": "Appointment search is not available (no database configured)"
+            }), 503
+        
+        specialization = request.args.get('specialization')
+        specialist_id = request.args.get('specialist_id', type=int)
+        limit = min(request.args.get('limit', 10, type=int), 100)
+        
+        if specialist_id is not None:
+            slots = service.specialist_free_slots(specialist_id, limit)
+        elif specialization:
+            slots = service.next_free_slots(specialization, limit)
+        else:
+            return jsonify({
+                "status": "error",
+                "message": "Provide a specialization or specialist_id"
+            }), 400
+        
+        return jsonify({
+            "status": "success",
+            "slots": slots
+        })
+        
+    except Exception as e:
+        print(f"Error in search_slots: {e}")
+        return jsonify({
+            "status": "error",
+            "message": "An error occurred searching for appointment slots"
+        }), 500
+
 @app.route('/api/session/<session_id>/therapist', methods=['POST'])
 def book_therapist(session_id):
     """Handle therapist booking requests"""
@@ -1436,8 +1545,7 @@ def book_therapist(session_id):
         # Get session
         session = sessions[session_id]
         
-        # Store appointment in session
-        session['last_appointment'] = {
+        last_appointment = {
             "therapist": data.get('selectedTherapist'),
             "date": data.get('appointment_date'),
             "time": data.get('appointment_time'),
@@ -1445,22 +1553,35 @@ def book_therapist(session_id):
             "booked_at": datetime.now().isoformat()
         }
         
-        # Log the appointment
-        log_dir = os.path.join(os.path.dirname(__file__), "logs")
-        os.makedirs(log_dir, exist_ok=True)
+        # Book through the Appointments table when a database is configured;
+        # the exclusion constraint and idempotency key prevent double booking
+        service = get_booking_service()
+        if service is not None:
+            try:
+                start = parse_appointment_start(data.get('appointment_date'), data.get('appointment_time'))
+                idempotency_key = (request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+                                   or derive_idempotency_key(session_id, data.get('selectedTherapist'), start))
+                appointment = service.book(
+                    idempotency_key,
+                    data.get('selectedTherapist'),
+                    start,
+                    data.get('appointment_type'),
+                    data.get('name'),
+                    data.get('email'),
+                    phone=data.get('phone'),
+                    notes=data.get('reason')
+                )
+            except BookingError as e:
+                return jsonify({
+                    "status": "error",
+                    "message": e.message
+                }), e.status_code
+            last_appointment['appointment_id'] = appointment['appointment_id']
+        else:
+            log_appointment_request(session_id, last_appointment, data)
         
-        appointment_log = os.path.join(log_dir, f"appointments_{datetime.now().strftime('%Y%m%d')}.json")
-        with open(appointment_log, "a", encoding="utf-8") as f:
-            f.write(json.dumps({
-                "timestamp": datetime.now().isoformat(),
-                "session_id": session_id,
-                "appointment": session['last_appointment'],
-                "user_details": {
-                    "name": data.get('name'),
-                    "email": data.get('email'),
-                    "phone": data.get('phone')
-                }
-            }, ensure_ascii=False) + "\n")
+        # Store appointment in session
+        session['last_appointment'] = last_appointment
             
         # Create confirmation message
         confirmation_message = f"""Your appointment has been scheduled successfully!
@@ -1486,7 +1607,65 @@ Thank you for taking this important step for your mental health."""
             "message": "An error occurred booking your appointment"
         }), 500
         
-# Main entry point
+def prepare_static_files():
+    """Create the static directory and copy index.html into it if needed"""
+    static_dir = os.path.join(os.path.dirname(__file__), "static")
+    if not os.path.exists(static_dir):
+        os.makedirs(static_dir)
+        print(f"Created static directory at {static_dir}")
+        
+        # Copy index.html to static directory if it exists in the same directory as this script
+        src_html = os.path.join(os.path.dirname(__file__), "index.html")
+        if os.path.exists(src_html):
+            import shutil
+            dst_html = os.path.join(static_dir, "index.html")
+            shutil.copy(src_html, dst_html)
+            print(f"Copied index.html to {dst_html}")
+
+
+# Readiness - set once warm-up has finished. /api/health is liveness only;
+# load balancers should route traffic based on /api/ready.
+instance_ready = threading.Event()
+WARMUP_PRECONNECT = os.getenv('WARMUP_PRECONNECT', 'true').lower() == 'true'
+
+
+def warm_up():
+    """
+    Prepare a serving process before it takes traffic: load extension files
+    into the cache, build provider clients, pre-connect to provider endpoints
+    (validating keys and measuring RTTs in parallel) and start the status
+    refresher. The instance reports ready on /api/ready only afterwards.
+    
+    Must run in the process that serves requests (e.g. a gunicorn worker after
+    fork), since clients and background threads do not survive a fork.
+    """
+    start_time = time.time()
+    
+    load_provider_sdks()
+    get_persistence_writer()
+    feedback_aggregator.start()
+    audit_buffer.start()
+    
+    extension_registry.load_all()
+    provider_router.warm_up(preconnect=WARMUP_PRECONNECT)
+    
+    get_status_snapshot()
+    instance_ready.set()
+    print(f"Warm-up completed in {time.time() - start_time:.2f} seconds - instance ready")
+
+
+def shutdown_background_work():
+    """Drain background work (crisis follow-ups, queued log writes) before exit"""
+    print("Draining background work before shutdown...")
+    background_executor.shutdown(wait=True)
+    for hook in shutdown_hooks:
+        try:
+            hook()
+        except Exception as e:
+            print(f"Error in shutdown hook {getattr(hook, '__name__', hook)}: {e}")
+    print("Background work drained")
+
+# Main entry point (development server - see gunicorn.conf.py for production)
 if __name__ == "__main__":
     # Verify API keys at startup
     qwen_key, deepseek_key, gemini_key = verify_api_keys()
@@ -1506,19 +1685,8 @@ if __name__ == "__main__":
     debug_mode = os.getenv('DEBUG', 'False').lower() == 'true'
     
     # Create necessary directories
-    # Create static directory for html files if it doesn't exist
-    static_dir = os.path.join(os.path.dirname(__file__), "static")
-    if not os.path.exists(static_dir):
-        os.makedirs(static_dir)
-        print(f"Created static directory at {static_dir}")
-        
-        # Copy index.html to static directory if it exists in the same directory as this script
-        src_html = os.path.join(os.path.dirname(__file__), "index.html")
-        if os.path.exists(src_html):
-            import shutil
-            dst_html = os.path.join(static_dir, "index.html")
-            shutil.copy(src_html, dst_html)
-            print(f"Copied index.html to {dst_html}")
+    prepare_static_files()
+    warm_up()
     
     # Log startup information
     print(f"Starting LumonMind API on port {port}")
@@ -0,0 +1,291 @@
+"""
+Bulk ingestion of conversation logs into the Sessions and Messages tables
+
+Streams the JSON-lines files written by log_conversation()
+(logs/conversation_YYYYMMDD.json, or their rotated .gz/.zst archives),
+recomputes DetectedTopics with the same detector the app uses and loads
+messages with COPY in batches. Files are
+processed in parallel by a process pool. Each batch commits together with
+its checkpoint row (LogIngestCheckpoints), so an interrupted run resumes at
+the last committed byte offset without duplicating messages.
+
+Usage:
+    python lumonmind_ingest_logs.py [paths ...] [--database-url URL]
+        [--batch-size 5000] [--workers 4] [--restart]
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from lumonmind_db import Database
+from lumonmind_log_rotation import find_day_files, is_compressed, open_log, strip_compression_suffix
+from lumonmind_topics import detect_topics
+
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+MESSAGE_COLUMNS = ("SessionID", "SenderType", "Content", "Timestamp", "DetectedTopics")
+
+# Same window the app uses when detecting topics (last 5 user messages)
+TOPIC_MESSAGE_WINDOW = 5
+
+
+def find_log_files(paths):
+    """
+    Expand files, directories and glob patterns into conversation log files
+
+    Directories yield one file per day, plain or compressed (.gz/.zst).
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(find_day_files(path, "conversation"))
+        else:
+            files.extend(glob.glob(path))
+    return sorted(set(files))
+
+
+def load_checkpoint(db, file_name):
+    """
+    Return (byte_offset, lines_loaded, session_map, completed) for a file
+
+    session_map maps conversation_id -> [SessionID, recent user messages], so
+    a resumed file keeps appending to the same sessions with the same topic
+    detection window.
+    """
+    rows = db.query(
+        "SELECT ByteOffset, LinesLoaded, SessionMap, Completed FROM LogIngestCheckpoints WHERE FileName = %s",
+        (file_name,)
+    )
+    if not rows:
+        return 0, 0, {}, False
+    offset, lines, session_map, completed = rows[0]
+    if isinstance(session_map, str):
+        session_map = json.loads(session_map)
+    return offset, lines, session_map or {}, bool(completed)
+
+
+def save_checkpoint(db, cursor, file_name, offset, lines, session_map, completed):
+    """Upsert the checkpoint row inside the batch transaction"""
+    db.execute(cursor, "DELETE FROM LogIngestCheckpoints WHERE FileName = %s", (file_name,))
+    db.execute(
+        cursor,
+        "INSERT INTO LogIngestCheckpoints (FileName, ByteOffset, LinesLoaded, SessionMap, Completed, UpdatedAt) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        (file_name, offset, lines, json.dumps(session_map), completed, datetime.now())
+    )
+
+
+def parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def find_session(db, cursor, conversation_id):
+    """
+    Return [SessionID, recent user messages] of a conversation loaded from
+    another file (e.g. one that continued past midnight), or None
+    """
+    db.execute(cursor,
+               "SELECT SessionID FROM Sessions WHERE ConversationKey = %s ORDER BY SessionID DESC LIMIT 1",
+               (conversation_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    db.execute(cursor,
+               "SELECT Content FROM Messages WHERE SessionID = %s AND SenderType = 'user' "
+               "ORDER BY MessageID DESC LIMIT %s",
+               (row[0], TOPIC_MESSAGE_WINDOW))
+    return [row[0], [content for content, in reversed(cursor.fetchall())]]
+
+
+def write_batch(db, file_name, entries, session_map, offset, lines, completed):
+    """
+    Load one batch of log entries in a single transaction
+
+    New conversations are looked up by Sessions.ConversationKey, so a
+    conversation spanning several day files keeps one Sessions row, and get
+    a row otherwise; all messages of the batch are then loaded with one COPY,
+    and touched sessions have their end time and provider updated.
+    """
+    with db.transaction() as cursor:
+        new_ids = sorted({entry["conversation_id"] for entry in entries
+                          if entry.get("conversation_id") and entry["conversation_id"] not in session_map})
+        if not db.is_sqlite:
+            # Workers loading neighbouring days must not both create the
+            # session; locks are taken in sorted order to avoid deadlocks
+            for conversation_id in new_ids:
+                db.execute(cursor, "SELECT pg_advisory_xact_lock(hashtext(%s))", (conversation_id,))
+        for conversation_id in new_ids:
+            state = find_session(db, cursor, conversation_id)
+            if state is not None:
+                session_map[conversation_id] = state
+
+        message_rows = []
+        session_updates = {}
+        for entry in entries:
+            conversation_id = entry.get("conversation_id") or "unknown"
+            timestamp = parse_timestamp(entry.get("timestamp")) or datetime.now()
+            state = session_map.get(conversation_id)
+            if state is None:
+                session_id = db.insert_returning_id(
+                    cursor,
+                    "INSERT INTO Sessions (StartTime, SessionStatus, ConversationKey) VALUES (%s, %s, %s)",
+                    (timestamp, 'completed', conversation_id),
+                    "SessionID"
+                )
+                state = session_map[conversation_id] = [session_id, []]
+            session_id, recent_user_messages = state
+
+            # Records without a user message are assistant-only addenda to the
+            # previous turn (the crisis follow-up) - no user row, no detection
+            user_message = entry.get("user_message")
+            if user_message is not None:
+                recent = deque(recent_user_messages, maxlen=TOPIC_MESSAGE_WINDOW)
+                recent.append(user_message)
+                state[1] = list(recent)
+                topics, _ = detect_topics([{"role": "user", "content": m} for m in recent],
+                                          TOPIC_MESSAGE_WINDOW)
+                message_rows.append((session_id, "user", user_message, timestamp,
+                                     json.dumps(topics) if topics else None))
+            message_rows.append((session_id, "assistant", entry.get("ai_message") or "",
+                                 timestamp, None))
+            session_updates[session_id] = (timestamp, entry.get("model_used"))
+
+        db.copy_rows(cursor, "Messages", MESSAGE_COLUMNS, message_rows)
+        for session_id, (end_time, model_used) in session_updates.items():
+            db.execute(cursor,
+                       "UPDATE Sessions SET EndTime = %s, LLMProviderUsed = COALESCE(%s, LLMProviderUsed) "
+                       "WHERE SessionID = %s",
+                       (end_time, model_used, session_id))
+        save_checkpoint(db, cursor, file_name, offset, lines, session_map, completed)
+    return len(message_rows)
+
+
+def ingest_file(path, database_url, batch_size=5000, restart=False):
+    """
+    Stream one log file into the database (runs in a worker process)
+
+    Returns:
+        Dictionary of per-file statistics
+    """
+    db = Database(database_url, pool_size=1)
+    # Checkpoints are keyed by the uncompressed name, so a file rotated into
+    # an archive between runs resumes instead of being loaded twice
+    file_name = os.path.basename(strip_compression_suffix(path))
+    start_time = time.time()
+    stats = {"file": file_name, "lines": 0, "messages": 0, "skipped": 0, "batches": 0,
+             "resumed_from": 0}
+    try:
+        offset, lines, session_map, completed = (0, 0, {}, False) if restart else \
+            load_checkpoint(db, file_name)
+        # Archives are closed day files, so a completed checkpoint is final
+        if completed and (is_compressed(path) or os.path.getsize(path) == offset):
+            stats["status"] = "already_loaded"
+            return stats
+        stats["resumed_from"] = offset
+
+        entries = []
+        with open_log(path) as f:
+            f.seek(offset)  # decompresses forward for archives
+            for raw_line in f:
+                offset += len(raw_line)
+                lines += 1
+                stats["lines"] += 1
+                try:
+                    entry = json.loads(raw_line)
+                except ValueError:
+                    entry = None
+                # Skip unparseable lines and erased records (tombstones)
+                if not isinstance(entry, dict) or entry.get("erased"):
+                    stats["skipped"] += 1
+                else:
+                    entries.append(entry)
+                if len(entries) >= batch_size:
+                    stats["messages"] += write_batch(db, file_name, entries, session_map,
+                                                     offset, lines, False)
+                    stats["batches"] += 1
+                    entries = []
+        # Final batch marks the file complete (also when it is empty)
+        stats["messages"] += write_batch(db, file_name, entries, session_map, offset, lines, True)
+        stats["batches"] += 1
+        stats["status"] = "loaded"
+    except Exception as e:
+        stats["status"] = f"error: {e}"
+    finally:
+        db.close()
+    stats["seconds"] = round(time.time() - start_time, 2)
+    return stats
+
+
+def ingest_logs(paths, database_url, batch_size=5000, workers=4, restart=False):
+    """
+    Ingest every log file in paths, parallelized across files
+
+    Returns:
+        List of per-file statistics
+    """
+    files = find_log_files(paths)
+    if not files:
+        print("No conversation log files found")
+        return []
+
+    # Make sure the tables exist before workers start (SQLite stand-in)
+    Database(database_url, pool_size=1).close()
+
+    # SQLite allows a single writer, so load files one at a time
+    if database_url.startswith('sqlite'):
+        workers = 1
+
+    results = []
+    if workers <= 1:
+        for path in files:
+            results.append(ingest_file(path, database_url, batch_size, restart))
+            print(f"{results[-1]['file']}: {results[-1]['status']}")
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(ingest_file, path, database_url, batch_size, restart) for path in files]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"{result['file']}: {result['status']} ({result['messages']} messages, "
+                  f"{result.get('seconds', 0)} seconds)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load LumonMind conversation logs into the database")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_LOG_DIR],
+                        help="Log files, directories or glob patterns (default: logs/)")
+    parser.add_argument("--database-url", default=os.getenv('DATABASE_URL'),
+                        help="PostgreSQL URL or sqlite:///path (default: $DATABASE_URL)")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv('INGEST_BATCH_SIZE', 5000)),
+                        help="Log entries per COPY batch")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('INGEST_WORKERS', os.cpu_count() or 1)),
+                        help="Number of files loaded in parallel")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore checkpoints and load every file from the beginning")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("No database configured. Set DATABASE_URL or pass --database-url")
+
+    start_time = time.time()
+    results = ingest_logs(args.paths, args.database_url, args.batch_size, args.workers, args.restart)
+    total_messages = sum(r["messages"] for r in results)
+    failed = [r for r in results if r["status"].startswith("error")]
+    print(f"Loaded {total_messages} messages from {len(results)} files in "
+          f"{time.time() - start_time:.2f} seconds ({len(failed)} failed)")
+    for result in failed:
+        print(f"  {result['file']}: {result['status']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,496 @@
+"""
+Columnar analytics archive of the daily conversation logs
+
+`convert` turns closed day files (logs/conversation_YYYYMMDD.json, plain or
+rotated .gz/.zst) into one compressed columnar file per day under
+logs/archive/: Parquet when pyarrow is installed, otherwise a NumPy .npz
+with dictionary-encoded string columns. Only numbers needed for reporting are
+kept - message text is reduced to lengths and detected topics, and erased
+records are dropped.
+
+`report` loads the archives for a date range into NumPy columns and computes
+the weekly metrics with vectorized operations: provider mix, latency
+percentiles, fallback rate, token usage, topic frequency and turns per
+session.
+
+Usage:
+    python lumonmind_log_archive.py convert [paths ...] [--archive-dir logs/archive]
+        [--format auto|parquet|npz] [--force]
+    python lumonmind_log_archive.py report [--days 7] [--end YYYY-MM-DD] [--json]
+    python lumonmind_log_archive.py erase <conversation_id>
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from lumonmind_ingest_logs import DEFAULT_LOG_DIR, TOPIC_MESSAGE_WINDOW, find_log_files, parse_timestamp
+from lumonmind_log_rotation import open_log, strip_compression_suffix
+from lumonmind_topics import TOPIC_KEYWORDS, detect_topics
+
+DEFAULT_ARCHIVE_DIR = os.path.join(DEFAULT_LOG_DIR, "archive")
+ARCHIVE_NAME_RE = re.compile(r'^conversation_(\d{8})\.(parquet|npz)$')
+
+# Bit i of topic_mask / extension_mask is TOPIC_NAMES[i]
+TOPIC_NAMES = tuple(TOPIC_KEYWORDS)
+
+EPOCH = datetime(1970, 1, 1)
+
+# Dictionary-encoded string columns: codes are stored, strings live in a table
+STRING_COLUMNS = ("conversation", "model")
+
+# Numeric columns and their dtype; missing values are NaN (floats) or -1 (ints)
+NUMERIC_COLUMNS = {
+    "timestamp_ms": "int64",
+    "user_chars": "int32",
+    "ai_chars": "int32",
+    "server_time_ms": "float32",
+    "provider_ms": "float32",
+    "attempts": "int16",
+    "failed_attempts": "int16",
+    "prompt_tokens": "int32",
+    "completion_tokens": "int32",
+    "cached_tokens": "int32",
+    "topic_mask": "int16",
+    "extension_mask": "int16",
+}
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for the log archive. Please run: pip install numpy")
+
+
+def choose_format(archive_format="auto"):
+    if archive_format == "auto":
+        return "parquet" if pyarrow is not None else "npz"
+    if archive_format == "parquet" and pyarrow is None:
+        raise ImportError("pyarrow is not installed - use --format npz or pip install pyarrow")
+    return archive_format
+
+
+def topic_mask(topics):
+    mask = 0
+    for topic in topics or ():
+        if topic in TOPIC_NAMES:
+            mask |= 1 << TOPIC_NAMES.index(topic)
+    return mask
+
+
+def _int_or_missing(value):
+    return int(value) if isinstance(value, (int, float)) else -1
+
+
+def _float_or_nan(value):
+    return float(value) if isinstance(value, (int, float)) else float("nan")
+
+
+def _add_count(values, index, count):
+    """Add a -1-for-missing integer count onto values[index]"""
+    if count >= 0:
+        values[index] = count if values[index] < 0 else values[index] + count
+
+
+def fold_addendum(columns, index, entry):
+    """
+    Fold an assistant-only addendum (a record without a user message, e.g.
+    the crisis follow-up) into the turn at row `index`, so it adds reply
+    size, provider work and tokens but not a turn
+    """
+    attempts = entry.get("provider_attempts") or []
+    usage = entry.get("usage") or {}
+    columns["ai_chars"][index] += len(entry.get("ai_message") or "")
+    provider_ms = (entry.get("timings_ms") or {}).get("providers")
+    if isinstance(provider_ms, (int, float)):
+        previous = columns["provider_ms"][index]
+        columns["provider_ms"][index] = provider_ms if previous != previous else previous + provider_ms
+    columns["attempts"][index] += len(attempts)
+    columns["failed_attempts"][index] += sum(1 for a in attempts if a.get("error"))
+    for name in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        _add_count(columns[name], index, _int_or_missing(usage.get(name)))
+
+
+def read_day_columns(path):
+    """
+    Stream one day log into plain Python columns
+
+    One row per user turn; assistant-only addenda are folded into the
+    conversation's previous row (see fold_addendum).
+
+    Returns:
+        (columns, tables): columns maps every column name to a list; string
+        columns hold codes into tables[name]
+    """
+    columns = {name: [] for name in list(NUMERIC_COLUMNS) + list(STRING_COLUMNS)}
+    tables = {name: {} for name in STRING_COLUMNS}
+    recent_user_messages = {}
+    last_rows = {}
+
+    def encode(name, value):
+        table = tables[name]
+        return table.setdefault(value, len(table))
+
+    with open_log(path) as f:
+        for raw_line in f:
+            try:
+                entry = json.loads(raw_line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict) or entry.get("erased"):
+                continue
+            timestamp = parse_timestamp(entry.get("timestamp"))
+            if timestamp is None:
+                continue
+            conversation_id = entry.get("conversation_id") or "unknown"
+            user_message = entry.get("user_message")
+            if user_message is None:
+                if conversation_id in last_rows:
+                    fold_addendum(columns, last_rows[conversation_id], entry)
+                continue
+            last_rows[conversation_id] = len(columns["timestamp_ms"])
+
+            # Same detector and window the app and the ingestion tool use
+            recent = recent_user_messages.setdefault(conversation_id, deque(maxlen=TOPIC_MESSAGE_WINDOW))
+            recent.append(user_message)
+            topics, _ = detect_topics([{"role": "user", "content": m} for m in recent], TOPIC_MESSAGE_WINDOW)
+
+            attempts = entry.get("provider_attempts") or []
+            usage = entry.get("usage") or {}
+            # Wall-clock log time as milliseconds since 1970-01-01, so day buckets match the day files
+            columns["timestamp_ms"].append(int((timestamp.replace(tzinfo=None) - EPOCH).total_seconds() * 1000))
+            columns["conversation"].append(encode("conversation", conversation_id))
+            columns["model"].append(encode("model", entry.get("model_used") or "unknown"))
+            columns["user_chars"].append(len(user_message))
+            columns["ai_chars"].append(len(entry.get("ai_message") or ""))
+            columns["server_time_ms"].append(_float_or_nan(entry.get("server_time_ms")))
+            columns["provider_ms"].append(_float_or_nan((entry.get("timings_ms") or {}).get("providers")))
+            columns["attempts"].append(len(attempts))
+            columns["failed_attempts"].append(sum(1 for a in attempts if a.get("error")))
+            columns["prompt_tokens"].append(_int_or_missing(usage.get("prompt_tokens")))
+            columns["completion_tokens"].append(_int_or_missing(usage.get("completion_tokens")))
+            columns["cached_tokens"].append(_int_or_missing(usage.get("cached_tokens")))
+            columns["topic_mask"].append(topic_mask(topics))
+            columns["extension_mask"].append(topic_mask(entry.get("applied_extensions")))
+    return columns, {name: list(table) for name, table in tables.items()}
+
+
+def write_archive(columns, tables, target, archive_format):
+    """Write one day's columns as Parquet or .npz, via a temporary file"""
+    require_numpy()
+    tmp_path = target + ".tmp"
+    if archive_format == "parquet":
+        arrays = {name: pyarrow.array(np.asarray(columns[name], dtype=dtype))
+                  for name, dtype in NUMERIC_COLUMNS.items()}
+        for name in STRING_COLUMNS:
+            arrays[name] = pyarrow.DictionaryArray.from_arrays(
+                pyarrow.array(np.asarray(columns[name], dtype="int32")),
+                pyarrow.array(tables[name], type=pyarrow.string())
+            )
+        pyarrow.parquet.write_table(pyarrow.table(arrays), tmp_path, compression="zstd")
+    else:
+        arrays = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        for name in STRING_COLUMNS:
+            arrays[name] = np.asarray(columns[name], dtype="int32")
+            arrays[f"{name}_table"] = np.asarray(tables[name], dtype=str)
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, target)
+
+
+def archive_path_for(log_path, archive_dir, archive_format):
+    name = os.path.splitext(os.path.basename(strip_compression_suffix(log_path)))[0]
+    return os.path.join(archive_dir, f"{name}.{archive_format}")
+
+
+def convert_logs(paths, archive_dir=DEFAULT_ARCHIVE_DIR, archive_format="auto", force=False):
+    """
+    Convert closed day logs that have no archive yet
+
+    Today's file is still being written and is skipped.
+
+    Returns:
+        List of (log_path, archive_path, rows) for converted files
+    """
+    require_numpy()
+    archive_format = choose_format(archive_format)
+    os.makedirs(archive_dir, exist_ok=True)
+    today = datetime.now().strftime('%Y%m%d')
+    converted = []
+    for log_path in find_log_files(paths):
+        if today in os.path.basename(log_path):
+            continue
+        target = archive_path_for(log_path, archive_dir, archive_format)
+        existing = [archive_path_for(log_path, archive_dir, fmt) for fmt in ("parquet", "npz")]
+        if not force and any(os.path.exists(p) for p in existing):
+            continue
+        columns, tables = read_day_columns(log_path)
+        write_archive(columns, tables, target, archive_format)
+        converted.append((log_path, target, len(columns["timestamp_ms"])))
+    return converted
+
+
+def read_archive(path):
+    """
+    Load one archive into NumPy columns
+
+    Returns:
+        (columns, tables) with string columns as int32 codes into tables[name]
+    """
+    require_numpy()
+    if path.endswith(".parquet"):
+        if pyarrow is None:
+            raise ImportError("pyarrow is required to read .parquet archives. Please run: pip install pyarrow")
+        table = pyarrow.parquet.read_table(path)
+        columns = {name: table.column(name).to_numpy() for name in NUMERIC_COLUMNS}
+        tables = {}
+        for name in STRING_COLUMNS:
+            chunks = table.column(name).unify_dictionaries().chunks
+            if chunks:
+                columns[name] = np.concatenate([c.indices.to_numpy(zero_copy_only=False) for c in chunks]).astype("int32")
+                tables[name] = chunks[0].dictionary.to_pylist()
+            else:
+                columns[name], tables[name] = np.zeros(0, dtype="int32"), []
+        return columns, tables
+    with np.load(path) as data:
+        columns = {name: data[name] for name in list(NUMERIC_COLUMNS) + list(STRING_COLUMNS)}
+        tables = {name: data[f"{name}_table"].tolist() for name in STRING_COLUMNS}
+    return columns, tables
+
+
+def erase_conversation(archive_dir, conversation_id):
+    """
+    Remove a conversation's turns from every archive that contains it
+
+    The id is dropped from the dictionary table as well, and each affected
+    archive is rewritten in its own format.
+
+    Returns:
+        Number of turns removed
+    """
+    removed = 0
+    for path in sorted(glob.glob(os.path.join(archive_dir, "conversation_*.*"))):
+        match = ARCHIVE_NAME_RE.match(os.path.basename(path))
+        if not match:
+            continue
+        columns, tables = read_archive(path)
+        if conversation_id not in tables["conversation"]:
+            continue
+        code = tables["conversation"].index(conversation_id)
+        keep = columns["conversation"] != code
+        columns = {name: values[keep] for name, values in columns.items()}
+        # Codes above the removed entry shift down by one
+        columns["conversation"] = columns["conversation"] - (columns["conversation"] > code)
+        tables["conversation"] = tables["conversation"][:code] + tables["conversation"][code + 1:]
+        write_archive(columns, tables, path, match.group(2))
+        removed += int(len(keep) - keep.sum())
+    return removed
+
+
+def load_archives(archive_dir, start_day, end_day):
+    """
+    Load and concatenate the archives for [start_day, end_day]
+
+    String codes are remapped onto one combined table per column, so a
+    conversation that spans midnight counts as one session.
+    """
+    require_numpy()
+    by_day = {}
+    for path in glob.glob(os.path.join(archive_dir, "conversation_*.*")):
+        match = ARCHIVE_NAME_RE.match(os.path.basename(path))
+        if match and start_day <= match.group(1) <= end_day:
+            # Prefer Parquet if a day was archived in both formats
+            if match.group(1) not in by_day or path.endswith(".parquet"):
+                by_day[match.group(1)] = path
+
+    parts = {name: [] for name in list(NUMERIC_COLUMNS) + list(STRING_COLUMNS)}
+    combined = {name: {} for name in STRING_COLUMNS}
+    for day in sorted(by_day):
+        columns, tables = read_archive(by_day[day])
+        for name in NUMERIC_COLUMNS:
+            parts[name].append(columns[name])
+        for name in STRING_COLUMNS:
+            table = combined[name]
+            mapping = np.asarray([table.setdefault(value, len(table)) for value in tables[name]] or [0],
+                                 dtype="int32")
+            parts[name].append(mapping[columns[name]])
+    columns = {
+        name: np.concatenate(arrays) if arrays else np.zeros(0, dtype=NUMERIC_COLUMNS.get(name, "int32"))
+        for name, arrays in parts.items()
+    }
+    return columns, {name: list(table) for name, table in combined.items()}, sorted(by_day)
+
+
+def _percentiles(values):
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 1), "p95": round(float(p95), 1), "p99": round(float(p99), 1),
+            "count": int(values.size)}
+
+
+def weekly_report(columns, tables):
+    """
+    Compute the standard reporting metrics over loaded columns
+
+    Returns:
+        Dictionary of metrics (JSON-serializable)
+    """
+    turns = int(columns["timestamp_ms"].size)
+    if not turns:
+        return {"turns": 0}
+    conversation = columns["conversation"]
+    model = columns["model"]
+
+    turns_per_session = np.bincount(conversation)
+    turns_per_session = turns_per_session[turns_per_session > 0]
+    model_counts = np.bincount(model, minlength=len(tables["model"]))
+
+    latency_by_model = {}
+    for code, name in enumerate(tables["model"]):
+        summary = _percentiles(columns["server_time_ms"][model == code].astype("float64"))
+        if summary:
+            latency_by_model[name] = summary
+
+    topics = {}
+    for bit, topic in enumerate(TOPIC_NAMES):
+        hit = (columns["topic_mask"] & (1 << bit)) != 0
+        extended = (columns["extension_mask"] & (1 << bit)) != 0
+        topics[topic] = {
+            "turns": int(hit.sum()),
+            "sessions": int(np.unique(conversation[hit]).size),
+            "extension_turns": int(extended.sum())
+        }
+
+    prompt_tokens = columns["prompt_tokens"].astype("int64")
+    cached_tokens = columns["cached_tokens"].astype("int64")
+    completion_tokens = columns["completion_tokens"].astype("int64")
+    with_usage = prompt_tokens >= 0
+    traced = ~np.isnan(columns["server_time_ms"])
+
+    days = (columns["timestamp_ms"] // 86400000).astype("int64")
+    day_values, day_counts = np.unique(days, return_counts=True)
+
+    return {
+        "turns": turns,
+        "sessions": int(turns_per_session.size),
+        "turns_per_session": {
+            "mean": round(float(turns_per_session.mean()), 2),
+            "p50": float(np.percentile(turns_per_session, 50)),
+            "p95": float(np.percentile(turns_per_session, 95)),
+            "max": int(turns_per_session.max())
+        },
+        "turns_per_day": {
+            (EPOCH + timedelta(days=int(d))).strftime('%Y-%m-%d'): int(c)
+            for d, c in zip(day_values, day_counts)
+        },
+        "provider_mix": {
+            name: {"turns": int(count), "share": round(float(count) / turns, 4)}
+            for name, count in zip(tables["model"], model_counts) if count
+        },
+        "server_time_ms": _percentiles(columns["server_time_ms"].astype("float64")),
+        "provider_time_ms": _percentiles(columns["provider_ms"].astype("float64")),
+        "server_time_ms_by_model": latency_by_model,
+        "fallback_rate": round(float((columns["failed_attempts"][traced] > 0).mean()), 4) if traced.any() else None,
+        "tokens": {
+            "turns_with_usage": int(with_usage.sum()),
+            "prompt": int(prompt_tokens[with_usage].sum()),
+            "completion": int(completion_tokens[completion_tokens >= 0].sum()),
+            "cached": int(cached_tokens[cached_tokens >= 0].sum()),
+            "cache_hit_ratio": round(float(cached_tokens[with_usage & (cached_tokens >= 0)].sum())
+                                     / max(int(prompt_tokens[with_usage].sum()), 1), 4)
+        },
+        "message_chars": {
+            "user_p50": float(np.percentile(columns["user_chars"], 50)),
+            "user_p95": float(np.percentile(columns["user_chars"], 95)),
+            "ai_p50": float(np.percentile(columns["ai_chars"], 50)),
+            "ai_p95": float(np.percentile(columns["ai_chars"], 95))
+        },
+        "topics": topics
+    }
+
+
+def print_report(report, days):
+    print(f"Days: {', '.join(days) if days else 'none'}")
+    print(f"Turns: {report['turns']}")
+    if not report["turns"]:
+        return
+    per_session = report["turns_per_session"]
+    print(f"Sessions: {report['sessions']} (turns per session mean {per_session['mean']}, "
+          f"p50 {per_session['p50']}, p95 {per_session['p95']}, max {per_session['max']})")
+    print("Provider mix:")
+    for name, mix in sorted(report["provider_mix"].items(), key=lambda item: -item[1]["turns"]):
+        latency = report["server_time_ms_by_model"].get(name)
+        latency_text = f", server p50 {latency['p50']} ms p95 {latency['p95']} ms" if latency else ""
+        print(f"  {name}: {mix['turns']} ({mix['share']:.1%}){latency_text}")
+    if report["server_time_ms"]:
+        latency = report["server_time_ms"]
+        print(f"Server time: p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms "
+              f"({latency['count']} traced turns)")
+    if report["fallback_rate"] is not None:
+        print(f"Turns with a failed provider attempt: {report['fallback_rate']:.1%}")
+    tokens = report["tokens"]
+    print(f"Tokens: {tokens['prompt']} prompt, {tokens['completion']} completion, "
+          f"{tokens['cache_hit_ratio']:.1%} of prompt tokens cached")
+    print("Topics (turns / sessions / turns with extension):")
+    for topic, counts in sorted(report["topics"].items(), key=lambda item: -item[1]["turns"]):
+        print(f"  {topic}: {counts['turns']} / {counts['sessions']} / {counts['extension_turns']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar archive and reports for LumonMind conversation logs")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="Convert closed day logs into columnar archives")
+    convert.add_argument("paths", nargs="*", default=[DEFAULT_LOG_DIR],
+                         help="Log files, directories or glob patterns (default: logs/)")
+    convert.add_argument("--format", choices=("auto", "parquet", "npz"), default="auto")
+    convert.add_argument("--force", action="store_true", help="Rebuild archives that already exist")
+    report = commands.add_parser("report", help="Compute the weekly metrics from the archives")
+    report.add_argument("--days", type=int, default=7, help="Number of days to include")
+    report.add_argument("--end", help="Last day to include, YYYY-MM-DD (default: yesterday)")
+    report.add_argument("--json", action="store_true", help="Print the report as JSON")
+    erase = commands.add_parser("erase", help="Remove a conversation's turns from the archives")
+    erase.add_argument("conversation_id")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.command == "convert":
+        converted = convert_logs(args.paths, args.archive_dir, args.format, args.force)
+        for log_path, target, rows in converted:
+            print(f"{os.path.basename(log_path)} -> {os.path.basename(target)} ({rows} turns)")
+        print(f"Converted {len(converted)} files in {time.time() - start_time:.2f} seconds")
+        return 0
+    if args.command == "erase":
+        print(f"Removed {erase_conversation(args.archive_dir, args.conversation_id)} turns")
+        return 0
+
+    end = datetime.strptime(args.end, '%Y-%m-%d') if args.end else datetime.now() - timedelta(days=1)
+    start = end - timedelta(days=args.days - 1)
+    columns, tables, days = load_archives(args.archive_dir, start.strftime('%Y%m%d'), end.strftime('%Y%m%d'))
+    result = weekly_report(columns, tables)
+    if args.json:
+        print(json.dumps(dict(result, days=days), indent=2))
+    else:
+        print_report(result, days)
+        print(f"Report computed in {time.time() - start_time:.2f} seconds")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,264 @@
+"""
+Sidecar offset index for the daily conversation logs
+
+Next to every logs/conversation_YYYYMMDD.json the log writer appends a
+conversation_YYYYMMDD.idx file with one "<conversation_id>\\t<offset>\\t<length>"
+line per record. Lookups read the (much smaller) index once, cache it in
+memory and then seek straight to the matching records, so finding, exporting
+or erasing one conversation costs O(records for that conversation). Index
+files are never compressed, and offsets refer to the uncompressed bytes, so
+they stay valid after lumonmind_log_rotation.py archives a day log.
+
+Usage:
+    python lumonmind_log_index.py lookup <conversation_id> [--log-dir logs]
+    python lumonmind_log_index.py erase <conversation_id> [--log-dir logs]
+    python lumonmind_log_index.py reindex [files ...] [--log-dir logs]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+
+from lumonmind_log_rotation import (
+    COMPRESSED_SUFFIXES, is_compressed, open_archive_writer, open_log, strip_compression_suffix
+)
+
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+
+# Serializes "write record + write index line" so offsets always match
+_append_lock = threading.Lock()
+
+
+def index_path_for(log_path):
+    """Return the sidecar index path for a day log file (plain or archived)"""
+    return os.path.splitext(strip_compression_suffix(log_path))[0] + ".idx"
+
+
+def _tombstone(length):
+    """An "erased" record padded with spaces to exactly `length` bytes"""
+    tombstone = json.dumps({"erased": True}).encode("utf-8")
+    return tombstone + b" " * (length - len(tombstone) - 1) + b"\n"
+
+
+def append_log_record(log_path, entry, key_field="conversation_id"):
+    """
+    Append one JSON record to a day log and its offset to the sidecar index
+
+    Returns:
+        Byte offset of the record in the log file
+    """
+    data = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+    key = str(entry.get(key_field, "")).replace("\t", " ").replace("\n", " ")
+    with _append_lock:
+        with open(log_path, "ab") as f:
+            offset = f.tell()
+            f.write(data)
+        with open(index_path_for(log_path), "ab") as f:
+            f.write(f"{key}\t{offset}\t{len(data)}\n".encode("utf-8"))
+    return offset
+
+
+def build_index(log_path, key_field="conversation_id"):
+    """
+    (Re)build the sidecar index for an existing log file by scanning it once
+
+    Returns:
+        Number of records indexed
+    """
+    count = 0
+    tmp_path = index_path_for(log_path) + ".tmp"
+    with open_log(log_path) as log, open(tmp_path, "wb") as index:
+        offset = 0
+        for line in log:
+            try:
+                key = str(json.loads(line).get(key_field, ""))
+                index.write(f"{key}\t{offset}\t{len(line)}\n".encode("utf-8"))
+                count += 1
+            except ValueError:
+                pass
+            offset += len(line)
+    os.replace(tmp_path, index_path_for(log_path))
+    return count
+
+
+class ConversationLogIndex:
+    """
+    Cached conversation_id -> [(offset, length)] maps for every day log
+
+    Each index file is read once; later lookups only read lines appended to
+    it since the previous lookup.
+    """
+
+    def __init__(self, log_dir=DEFAULT_LOG_DIR, pattern="conversation_*.json"):
+        self.log_dir = log_dir
+        self.pattern = pattern
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "records_read": 0, "stale_offsets": 0}
+
+    def _log_files(self):
+        """Day logs matching the pattern, with rotated archives in place of plain files"""
+        by_name = {}
+        for suffix in ("",) + COMPRESSED_SUFFIXES:
+            for path in glob.glob(os.path.join(self.log_dir, self.pattern + suffix)):
+                by_name.setdefault(strip_compression_suffix(path), path)
+        return sorted(by_name.values())
+
+    def _load(self, log_path):
+        """Return the up-to-date offset map for one log file"""
+        index_path = index_path_for(log_path)
+        if not os.path.exists(index_path):
+            return {}
+        cached = self._indexes.setdefault(log_path, {"position": 0, "offsets": {}})
+        size = os.path.getsize(index_path)
+        if size < cached["position"]:
+            # Index was rebuilt - start over
+            cached["position"], cached["offsets"] = 0, {}
+        if size > cached["position"]:
+            with open(index_path, "rb") as f:
+                f.seek(cached["position"])
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # partially written line, picked up next time
+                    cached["position"] += len(line)
+                    try:
+                        key, offset, length = line.decode("utf-8").rstrip("\n").split("\t")
+                        cached["offsets"].setdefault(key, []).append((int(offset), int(length)))
+                    except ValueError:
+                        continue
+        return cached["offsets"]
+
+    def locate(self, conversation_id):
+        """Return [(log_path, offset, length)] for every record of a conversation"""
+        locations = []
+        with self._lock:
+            for log_path in self._log_files():
+                for offset, length in self._load(log_path).get(conversation_id, ()):
+                    locations.append((log_path, offset, length))
+        return locations
+
+    def lookup(self, conversation_id):
+        """
+        Read every logged record of a conversation, oldest first
+
+        Records are verified against the requested id, so a stale offset
+        (e.g. from concurrent writers in several processes) is skipped rather
+        than returning another conversation's data.
+        """
+        self.stats["lookups"] += 1
+        records = []
+        handles = {}
+        try:
+            for log_path, offset, length in self.locate(conversation_id):
+                f = handles.get(log_path)
+                if f is None:
+                    f = handles[log_path] = open_log(log_path)
+                # Offsets are in append order, so archives only seek forward
+                f.seek(offset)
+                try:
+                    record = json.loads(f.read(length))
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict) or record.get("conversation_id") != conversation_id:
+                    self.stats["stale_offsets"] += 1
+                    continue
+                records.append(record)
+                self.stats["records_read"] += 1
+        finally:
+            for f in handles.values():
+                f.close()
+        return records
+
+    def erase(self, conversation_id):
+        """
+        Erase a conversation's records in place
+
+        Each record is overwritten with an "erased" tombstone padded to the
+        same length, so the offsets of every other record stay valid.
+
+        Returns:
+            Number of records erased
+        """
+        erased = 0
+        archived = {}
+        for log_path, offset, length in self.locate(conversation_id):
+            if is_compressed(log_path):
+                archived.setdefault(log_path, set()).add(offset)
+                continue
+            with _append_lock, open(log_path, "r+b") as f:
+                f.seek(offset)
+                try:
+                    record = json.loads(f.read(length))
+                except ValueError:
+                    continue
+                if not isinstance(record, dict) or record.get("conversation_id") != conversation_id:
+                    continue
+                f.seek(offset)
+                f.write(_tombstone(length))
+                erased += 1
+        for log_path, offsets in archived.items():
+            erased += self._erase_in_archive(log_path, offsets, conversation_id)
+        return erased
+
+    @staticmethod
+    def _erase_in_archive(log_path, offsets, conversation_id):
+        """
+        Rewrite a compressed day log with tombstones at the given offsets
+
+        The archive is streamed through a decompressor and a compressor into a
+        temporary file that replaces it, so memory use stays constant and the
+        uncompressed offsets in the sidecar index remain valid.
+        """
+        erased = 0
+        tmp_path = log_path + ".tmp"
+        with open_log(log_path) as src, open(tmp_path, "wb") as raw_dst:
+            with open_archive_writer(raw_dst, log_path) as dst:
+                offset = 0
+                for line in src:
+                    if offset in offsets:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            record = None
+                        if isinstance(record, dict) and record.get("conversation_id") == conversation_id:
+                            line = _tombstone(len(line))
+                            erased += 1
+                    dst.write(line)
+                    offset += len(line)
+        os.replace(tmp_path, log_path)
+        return erased
+
+    def snapshot(self):
+        return dict(self.stats, indexed_files=len(self._indexes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up conversations in the daily logs via the offset index")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    lookup = commands.add_parser("lookup", help="Print every record of a conversation as JSON lines")
+    lookup.add_argument("conversation_id")
+    erase = commands.add_parser("erase", help="Erase every record of a conversation in place")
+    erase.add_argument("conversation_id")
+    reindex = commands.add_parser("reindex", help="Rebuild sidecar indexes from the log files")
+    reindex.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    index = ConversationLogIndex(args.log_dir)
+    if args.command == "lookup":
+        records = index.lookup(args.conversation_id)
+        for record in records:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"{len(records)} records", file=sys.stderr)
+    elif args.command == "erase":
+        print(f"Erased {index.erase(args.conversation_id)} records")
+    elif args.command == "reindex":
+        for log_path in args.files or index._log_files():
+            print(f"{os.path.basename(log_path)}: {build_index(log_path)} records indexed")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
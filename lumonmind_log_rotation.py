@@ -0,0 +1,279 @@
+"""
+Rotation, compression and retention for the daily files in logs/
+
+Closed day files (conversation_*, feedback_*, appointments_*, audit_*,
+error_log_*, api_failure_*) are compressed with zstd when the `zstandard`
+package is installed and gzip otherwise. Compressed archives older than
+--max-age-days are deleted, then the oldest archives are deleted until logs/
+fits in --max-total-mb. Sidecar .idx files stay uncompressed next to their
+archive and are removed with it.
+
+Every log reader opens files through open_log(), which decompresses while
+streaming, so tools work on .json, .json.gz and .json.zst alike.
+
+Usage (run daily from cron):
+    python lumonmind_log_rotation.py [--log-dir logs] [--max-age-days 90]
+        [--max-total-mb 2048] [--codec auto|gzip|zstd] [--dry-run]
+"""
+import argparse
+import glob
+import gzip
+import io
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+# Day files written by the apps: <prefix>_YYYYMMDD.<ext>[.gz|.zst]
+DAY_FILE_RE = re.compile(
+    r'^(conversation|feedback|appointments|audit|error_log|api_failure)_(\d{8})\.(json|txt)(\.gz|\.zst)?$'
+)
+
+# Files touched within this many minutes are never compressed, even if their
+# day has ended (a request that started before midnight may still append)
+MIN_IDLE_MINUTES = 10
+
+
+def strip_compression_suffix(path):
+    """conversation_20250101.json.gz -> conversation_20250101.json"""
+    for suffix in COMPRESSED_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def is_compressed(path):
+    return path.endswith(COMPRESSED_SUFFIXES)
+
+
+class ForwardSeekReader(io.RawIOBase):
+    """
+    Raw stream over a decompressing reader that cannot seek (zstd's
+    stream_reader), emulating forward seek() by reading and discarding the
+    bytes in between. Seeking backwards raises io.UnsupportedOperation.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("compressed logs cannot seek relative to the end")
+        if offset < self._position:
+            raise io.UnsupportedOperation("compressed logs can only seek forward")
+        while self._position < offset:
+            skipped = len(self._stream.read(min(offset - self._position, 1024 * 1024)))
+            if not skipped:
+                break  # past the end, like a plain file's read() after seek()
+            self._position += skipped
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+
+def open_log(path):
+    """
+    Open a log file for streaming binary reads, decompressing on the fly
+
+    Works for plain, .gz and .zst files. The returned stream supports
+    iteration by line and forward seek() (emulated by decompressing for
+    compressed files), so readers never materialize a whole archive.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstandard is required to read .zst logs. Please run: pip install zstandard")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.BufferedReader(ForwardSeekReader(stream))
+    return open(path, "rb")
+
+
+def find_day_files(log_dir, prefix="conversation", extension="json"):
+    """
+    Return the day files for a prefix, one per day, preferring the plain file
+    over an archive of the same day, sorted by date
+    """
+    by_day = {}
+    for path in glob.glob(os.path.join(log_dir, f"{prefix}_*.{extension}*")):
+        match = DAY_FILE_RE.match(os.path.basename(path))
+        if not match or match.group(1) != prefix:
+            continue
+        day = match.group(2)
+        if day not in by_day or not is_compressed(path):
+            by_day[day] = path
+    return [by_day[day] for day in sorted(by_day)]
+
+
+def choose_codec(codec="auto"):
+    if codec == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if codec == "zstd" and zstandard is None:
+        raise ImportError("zstandard is not installed - use --codec gzip or pip install zstandard")
+    return codec
+
+
+def open_archive_writer(raw_file, path, mtime=None):
+    """Wrap an open binary file in a compressor chosen by the archive's suffix"""
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstandard is required to write .zst logs. Please run: pip install zstandard")
+        return zstandard.ZstdCompressor(level=10).stream_writer(raw_file, closefd=False)
+    return gzip.GzipFile(fileobj=raw_file, mode="wb", compresslevel=6, mtime=mtime)
+
+
+def compress_file(path, codec="gzip"):
+    """
+    Stream-compress a closed day file next to itself and remove the original
+
+    The archive is written to a temporary name and renamed into place, so a
+    reader never sees a partial archive, and it keeps the original's mtime.
+
+    Returns:
+        Path of the compressed archive
+    """
+    suffix = ".zst" if codec == "zstd" else ".gz"
+    target = path + suffix
+    tmp_path = target + ".tmp"
+    stat = os.stat(path)
+    with open(path, "rb") as src, open(tmp_path, "wb") as raw_dst:
+        with open_archive_writer(raw_dst, target, int(stat.st_mtime)) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.utime(tmp_path, (stat.st_atime, stat.st_mtime))
+    os.replace(tmp_path, target)
+    os.remove(path)
+    return target
+
+
+def _day_of(path):
+    match = DAY_FILE_RE.match(os.path.basename(path))
+    return datetime.strptime(match.group(2), "%Y%m%d").date() if match else None
+
+
+def _remove_with_index(path):
+    removed = os.path.getsize(path)
+    os.remove(path)
+    index_path = os.path.splitext(strip_compression_suffix(path))[0] + ".idx"
+    if os.path.exists(index_path):
+        removed += os.path.getsize(index_path)
+        os.remove(index_path)
+    return removed
+
+
+def rotate_logs(log_dir=DEFAULT_LOG_DIR, codec="auto", max_age_days=90, max_total_mb=None, dry_run=False):
+    """
+    Compress closed day files, then apply age- and size-based retention
+
+    Returns:
+        Dictionary with the files compressed and deleted and bytes saved
+    """
+    codec = choose_codec(codec)
+    today = datetime.now().date()
+    now = time.time()
+    result = {"compressed": [], "deleted": [], "bytes_before": 0, "bytes_after": 0}
+
+    day_files = []
+    for name in os.listdir(log_dir) if os.path.isdir(log_dir) else []:
+        if DAY_FILE_RE.match(name):
+            day_files.append(os.path.join(log_dir, name))
+
+    # 1. Compress closed, idle day files
+    for path in sorted(day_files):
+        if is_compressed(path) or _day_of(path) >= today:
+            continue
+        if now - os.path.getmtime(path) < MIN_IDLE_MINUTES * 60:
+            continue
+        if os.path.exists(path + ".gz") or os.path.exists(path + ".zst"):
+            continue  # already archived (e.g. interrupted run) - leave for inspection
+        before = os.path.getsize(path)
+        result["bytes_before"] += before
+        if dry_run:
+            result["compressed"].append(path)
+            continue
+        target = compress_file(path, codec)
+        result["bytes_after"] += os.path.getsize(target)
+        result["compressed"].append(target)
+
+    archives = sorted(
+        (p for p in glob.glob(os.path.join(log_dir, "*")) if DAY_FILE_RE.match(os.path.basename(p))
+         and is_compressed(p)),
+        key=lambda p: (_day_of(p), p)
+    )
+
+    # 2. Age-based retention
+    if max_age_days is not None:
+        for path in list(archives):
+            if (today - _day_of(path)).days > max_age_days:
+                if not dry_run:
+                    _remove_with_index(path)
+                result["deleted"].append(path)
+                archives.remove(path)
+
+    # 3. Size-based retention - delete the oldest archives first
+    if max_total_mb is not None:
+        total = sum(os.path.getsize(os.path.join(log_dir, n)) for n in os.listdir(log_dir)
+                    if os.path.isfile(os.path.join(log_dir, n)))
+        limit = max_total_mb * 1024 * 1024
+        for path in list(archives):
+            if total <= limit:
+                break
+            total -= os.path.getsize(path) if dry_run else _remove_with_index(path)
+            result["deleted"].append(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress and expire LumonMind day logs")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR)
+    parser.add_argument("--codec", choices=("auto", "gzip", "zstd"), default=os.getenv('LOG_COMPRESSION', 'auto'))
+    parser.add_argument("--max-age-days", type=int, default=int(os.getenv('LOG_RETENTION_DAYS', 90)))
+    parser.add_argument("--max-total-mb", type=int,
+                        default=int(os.getenv('LOG_MAX_TOTAL_MB')) if os.getenv('LOG_MAX_TOTAL_MB') else None)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without touching files")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    result = rotate_logs(args.log_dir, args.codec, args.max_age_days, args.max_total_mb, args.dry_run)
+    for path in result["compressed"]:
+        print(f"compressed {os.path.basename(path)}")
+    for path in result["deleted"]:
+        print(f"deleted {os.path.basename(path)}")
+    saved = result["bytes_before"] - result["bytes_after"]
+    print(f"Rotation finished in {time.time() - start_time:.2f} seconds: {len(result['compressed'])} compressed "
+          f"({saved / 1024 / 1024:.1f} MB saved), {len(result['deleted'])} deleted")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,291 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class ProviderRateLimiter:
+    """
+    Token-bucket rate limiter for one LLM provider
+
+    Two buckets are kept: one for requests per minute and one for tokens per
+    minute. Callers that cannot be admitted immediately wait in a bounded queue
+    for at most `max_wait_seconds`; when the queue is full they are rejected at
+    once so a burst fails fast instead of piling up behind the provider.
+    """
+
+    def __init__(self, name, requests_per_minute=60, tokens_per_minute=120000,
+                 max_queue=20, max_wait_seconds=10.0):
+        """
+        Args:
+            name: Provider name (used in status output)
+            requests_per_minute: Sustained request rate (also the burst size)
+            tokens_per_minute: Sustained prompt+completion token rate
+            max_queue: Maximum number of callers waiting for capacity
+            max_wait_seconds: Longest time a caller waits before giving up
+        """
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+
+        self._request_tokens = float(requests_per_minute)
+        self._token_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+                      "provider_429s": 0}
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._request_tokens = min(
+                self.requests_per_minute,
+                self._request_tokens + elapsed * self.requests_per_minute / 60.0
+            )
+            self._token_tokens = min(
+                self.tokens_per_minute,
+                self._token_tokens + elapsed * self.tokens_per_minute / 60.0
+            )
+            self._last_refill = now
+
+    def _seconds_until_available(self, now, tokens):
+        """Seconds until both buckets can cover one request of `tokens`"""
+        wait = max(0.0, self._blocked_until - now)
+        if self._request_tokens < 1:
+            wait = max(wait, (1 - self._request_tokens) * 60.0 / self.requests_per_minute)
+        if self._token_tokens < tokens:
+            wait = max(wait, (tokens - self._token_tokens) * 60.0 / self.tokens_per_minute)
+        return wait
+
+    def acquire(self, estimated_tokens=0):
+        """
+        Reserve capacity for one request, waiting in the bounded queue if needed
+
+        Args:
+            estimated_tokens: Expected prompt + completion tokens for the request
+
+        Returns:
+            True if the request may be sent, False if it was shed
+        """
+        tokens = min(max(int(estimated_tokens), 0), self.tokens_per_minute)
+        deadline = time.monotonic() + self.max_wait_seconds
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._seconds_until_available(now, tokens) == 0:
+                self._consume(tokens)
+                return True
+            if self._waiting >= self.max_queue:
+                self.stats["rejected_queue_full"] += 1
+                return False
+
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._seconds_until_available(now, tokens)
+                    if wait == 0:
+                        self._consume(tokens)
+                        return True
+                    if now + wait > deadline:
+                        self.stats["rejected_timeout"] += 1
+                        return False
+                    self._cond.wait(wait)
+            finally:
+                self._waiting -= 1
+
+    def _consume(self, tokens):
+        self._request_tokens -= 1
+        self._token_tokens -= tokens
+        self.stats["admitted"] += 1
+
+    def has_capacity(self):
+        """Cheap check used for load shedding - False if a new caller would be rejected"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._seconds_until_available(now, 0) == 0:
+                return True
+            return self._waiting < self.max_queue and \
+                self._seconds_until_available(now, 0) <= self.max_wait_seconds
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the provider reports real usage"""
+        if not actual_tokens:
+            return
+        with self._cond:
+            delta = int(actual_tokens) - min(int(estimated_tokens), self.tokens_per_minute)
+            self._token_tokens = min(self.tokens_per_minute, self._token_tokens - delta)
+
+    def record_rate_limited(self, retry_after=None):
+        """
+        Back off after the provider itself answered 429
+
+        Args:
+            retry_after: Seconds from the provider's Retry-After header, if any
+        """
+        with self._cond:
+            self.stats["provider_429s"] += 1
+            backoff = float(retry_after) if retry_after else 60.0 / max(self.requests_per_minute, 1)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + backoff)
+
+    def snapshot(self):
+        """Return limiter state for status endpoints"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return dict(
+                self.stats,
+                requests_per_minute=self.requests_per_minute,
+                tokens_per_minute=self.tokens_per_minute,
+                available_requests=round(self._request_tokens, 2),
+                available_tokens=int(self._token_tokens),
+                waiting=self._waiting,
+                max_queue=self.max_queue,
+                blocked_for_seconds=round(max(0.0, self._blocked_until - now), 2)
+            )
+
+
+class AdmissionController:
+    """
+    Bounded concurrency for chat requests at the web layer
+
+    Up to `max_concurrent` requests run at once and up to `max_queue` more may
+    wait `queue_timeout` seconds for a slot. Anything beyond that is shed
+    immediately so the server answers 503 instead of timing out.
+    """
+
+    def __init__(self, max_concurrent=32, max_queue=64, queue_timeout=5.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self.stats = {"admitted": 0, "shed": 0}
+
+    def try_enter(self):
+        """Take a slot, waiting briefly if the queue has room. Returns True on success."""
+        with self._cond:
+            if self._in_flight < self.max_concurrent:
+                self._in_flight += 1
+                self.stats["admitted"] += 1
+                return True
+            if self._waiting >= self.max_queue:
+                self.stats["shed"] += 1
+                return False
+
+            self._waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self._in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["shed"] += 1
+                        return False
+                    self._cond.wait(remaining)
+                self._in_flight += 1
+                self.stats["admitted"] += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    def leave(self):
+        """Release a slot taken by try_enter"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def snapshot(self):
+        """Return admission state for status endpoints"""
+        with self._cond:
+            return dict(
+                self.stats,
+                in_flight=self._in_flight,
+                waiting=self._waiting,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue
+            )
+
+
+def estimate_tokens(messages, max_completion_tokens=0):
+    """Rough token estimate (~4 characters per token) for rate limiting"""
+    chars = sum(len(str(msg.get('content', ''))) for msg in messages if isinstance(msg, dict))
+    return chars // 4 + max_completion_tokens
+
+
+class SlidingWindowThrottle:
+    """
+    Sliding-window request counter keyed by client IP or session id
+
+    Uses the two-window approximation (previous window weighted by how much of
+    it still overlaps the sliding window), so each check is O(1) and the lock
+    is only held for a dictionary update. Counters live in process memory,
+    next to the in-memory sessions; the least recently seen keys are dropped
+    once `max_keys` is exceeded.
+    """
+
+    def __init__(self, limit, window_seconds=60, max_keys=100000):
+        """
+        Args:
+            limit: Maximum requests per key within one sliding window
+            window_seconds: Length of the sliding window
+            max_keys: Maximum number of tracked keys
+        """
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"allowed": 0, "throttled": 0}
+
+    def hit(self, key):
+        """
+        Count one request for a key
+
+        Returns:
+            Tuple of (allowed, retry_after_seconds)
+        """
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed_fraction = (now % self.window_seconds) / self.window_seconds
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                entry = [window, 0, 0]
+                self._counters[key] = entry
+                if len(self._counters) > self.max_keys:
+                    self._counters.popitem(last=False)
+            else:
+                self._counters.move_to_end(key)
+                if entry[0] != window:
+                    entry[2] = entry[1] if entry[0] == window - 1 else 0
+                    entry[1] = 0
+                    entry[0] = window
+
+            current, previous = entry[1], entry[2]
+            estimated = previous * (1 - elapsed_fraction) + current
+            if estimated + 1 > self.limit:
+                self.stats["throttled"] += 1
+                if current + 1 > self.limit or not previous:
+                    retry_after = self.window_seconds * (1 - elapsed_fraction)
+                else:
+                    # Wait until enough of the previous window has slid out
+                    needed_fraction = 1 - (self.limit - current - 1) / previous
+                    retry_after = (needed_fraction - elapsed_fraction) * self.window_seconds
+                return False, max(1, math.ceil(retry_after))
+
+            entry[1] += 1
+            self.stats["allowed"] += 1
+            return True, 0
+
+    def snapshot(self):
+        """Return throttle state for status endpoints"""
+        with self._lock:
+            return dict(self.stats, limit=self.limit, window_seconds=self.window_seconds,
+                        tracked_keys=len(self._counters))
@@ -0,0 +1,318 @@
+"""
+Replay historical conversation logs through the chat pipeline for benchmarking
+
+Reads logs/conversation_YYYYMMDD.json (plain or rotated .gz/.zst archives),
+rebuilds each conversation's user turns and sends them again, keeping the
+original inter-arrival times scaled by --speedup. Every conversation is
+replayed under a fresh session id and its turns are sent in order, so message
+lengths and history depths follow production instead of synthetic loops.
+
+Two targets are supported:
+    --target URL    POST each turn to /api/chat of a running instance
+    --in-process    Call get_ai_response() of lumonmind_flask_v2 directly with
+                    a mock provider (--mock-latency seconds per call), and also
+                    report topic detection time, prompt size and memory
+
+With --in-process, replayed turns are not written to the conversation logs or
+the database. With --target they are handled like any other chat request:
+the instance logs and persists them, so point it at a staging instance or
+its own LOG_DIR/DATABASE_URL.
+
+Every replayed conversation opens a new session from the same client IP, so
+the instance's per-IP throttles (SESSIONS_PER_IP_PER_MINUTE,
+REQUESTS_PER_IP_PER_MINUTE) answer most turns with 429 unless the replay
+host is listed in its THROTTLE_EXEMPT_IPS. Throttled (429) and shed (503)
+turns are counted separately, and latency percentiles cover answered turns
+only.
+
+Usage:
+    python lumonmind_replay.py [paths ...] (--target http://localhost:5000 | --in-process)
+        [--speedup 10] [--concurrency 16] [--limit 500] [--mock-latency 0.5]
+        [--output results.jsonl]
+"""
+import argparse
+import json
+import resource
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from lumonmind_ingest_logs import DEFAULT_LOG_DIR, find_log_files, parse_timestamp
+from lumonmind_log_rotation import open_log
+from lumonmind_trace import start_turn_trace, end_turn_trace
+
+
+def load_conversations(paths, limit=None):
+    """
+    Rebuild conversations from the logs
+
+    Returns:
+        List of (conversation_id, [(timestamp, user_message), ...]) ordered by
+        the first turn's timestamp, each conversation's turns in order
+    """
+    conversations = {}
+    for path in find_log_files(paths):
+        with open_log(path) as f:
+            for raw_line in f:
+                try:
+                    entry = json.loads(raw_line)
+                except ValueError:
+                    continue
+                if not isinstance(entry, dict) or entry.get("erased"):
+                    continue
+                timestamp = parse_timestamp(entry.get("timestamp"))
+                user_message = entry.get("user_message")
+                if timestamp is None or not user_message:
+                    continue
+                conversations.setdefault(entry.get("conversation_id") or "unknown", []).append(
+                    (timestamp, user_message)
+                )
+    ordered = []
+    for conversation_id, turns in conversations.items():
+        turns.sort(key=lambda turn: turn[0])
+        ordered.append((conversation_id, turns))
+    ordered.sort(key=lambda conversation: conversation[1][0][0])
+    return ordered[:limit] if limit else ordered
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class HttpTarget:
+    """Sends turns to /api/chat of a running instance"""
+
+    def __init__(self, base_url, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.http = requests.Session()
+
+    def new_session(self):
+        return f"replay-{uuid.uuid4()}"
+
+    def send(self, session_id, user_message):
+        response = self.http.post(f"{self.base_url}/api/chat",
+                                  json={"session_id": session_id, "message": user_message},
+                                  timeout=self.timeout)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return {"status_code": response.status_code, "model_used": body.get("model_used"),
+                "response_chars": len(body.get("message") or "")}
+
+    def end_session(self, session_id):
+        try:
+            self.http.delete(f"{self.base_url}/api/session/{session_id}", timeout=self.timeout)
+        except requests.RequestException:
+            pass
+
+    def report(self):
+        return {}
+
+
+class InProcessTarget:
+    """
+    Runs turns through lumonmind_flask_v2.get_ai_response with a mock provider
+
+    The mock stands in for Qwen only: it sleeps for `mock_latency` seconds and
+    answers with mock_ai_response(), recording the size of the final prompt
+    (system prompt + extensions + history) it receives. Topic detection and
+    extension handling run unchanged and are timed from the turn trace.
+    """
+
+    def __init__(self, mock_latency=0.0):
+        import lumonmind_flask_v2 as app_module
+        from lumonmind_rate_limit import ProviderRateLimiter
+
+        self.app = app_module
+        self.mock_latency = mock_latency
+        self._local = threading.local()
+        self.prompt_chars = []
+        self.extension_seconds = []
+
+        def mock_provider(messages):
+            self._local.prompt_chars = sum(len(m.get("content", "")) for m in messages if isinstance(m, dict))
+            if self.mock_latency:
+                time.sleep(self.mock_latency)
+            return app_module.mock_ai_response(messages)
+
+        router = app_module.provider_router
+        router.api_keys.update(qwen="replay-mock", deepseek=None, gemini=None)
+        router.call_qwen = mock_provider
+        # Keep replayed sessions out of the database even if DATABASE_URL is set
+        app_module.persistence_checked = True
+        # The mock provider has no quota, so do not let the limiter shed replayed turns
+        router.limiters["qwen"] = ProviderRateLimiter("qwen", 10 ** 9, 10 ** 12)
+
+    def new_session(self):
+        return self.app.initialize_session(f"replay-{uuid.uuid4()}")
+
+    def send(self, session_id, user_message):
+        session = self.app.sessions[session_id]
+        if not session.get("messages"):
+            session["messages"] = [{"role": "system", "content": self.app.SYSTEM_PROMPT}]
+        session["messages"].append({"role": "user", "content": user_message})
+        self._local.prompt_chars = None
+        turn_data = {}
+        trace = start_turn_trace()
+        try:
+            ai_message, model_used = self.app.get_ai_response(session["messages"], session_id, turn_data)
+        finally:
+            end_turn_trace()
+        session["messages"].append({"role": "assistant", "content": ai_message})
+        if self._local.prompt_chars is not None:
+            self.prompt_chars.append(self._local.prompt_chars)
+        if "extensions" in trace.stages:
+            self.extension_seconds.append(trace.stages["extensions"])
+        return {"status_code": 200 if model_used != "error" else 500, "model_used": model_used,
+                "response_chars": len(ai_message), "prompt_chars": self._local.prompt_chars,
+                "detected_topics": turn_data.get("detected_topics", [])}
+
+    def end_session(self, session_id):
+        pass  # keep sessions so retained memory is visible in the report
+
+    def report(self):
+        retained_chars = sum(len(m.get("content", "")) for s in list(self.app.sessions.values())
+                             for m in s.get("messages", []))
+        return {
+            "prompt_chars_p50": percentile(self.prompt_chars, 50),
+            "prompt_chars_p95": percentile(self.prompt_chars, 95),
+            "prompt_chars_max": max(self.prompt_chars, default=None),
+            "extension_ms_p50": round(percentile(self.extension_seconds, 50) * 1000, 3) if self.extension_seconds else None,
+            "extension_ms_p95": round(percentile(self.extension_seconds, 95) * 1000, 3) if self.extension_seconds else None,
+            "sessions_in_memory": len(self.app.sessions),
+            "retained_message_chars": retained_chars,
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+
+
+def replay(conversations, target, speedup=1.0, concurrency=16, output=None):
+    """
+    Replay conversations against a target, preserving (scaled) timing
+
+    Each conversation runs in a worker; a turn is sent when its original
+    offset from the first logged turn, divided by `speedup`, has elapsed
+    (speedup 0 sends every turn as soon as the previous one is answered).
+
+    Returns:
+        Dictionary of aggregate statistics
+    """
+    if not conversations:
+        return {"conversations": 0, "turns": 0}
+    origin = conversations[0][1][0][0]
+    results = []
+    results_lock = threading.Lock()
+    output_file = open(output, "w", encoding="utf-8") if output else None
+    replay_start = time.monotonic()
+
+    def run_conversation(conversation_id, turns):
+        session_id = target.new_session()
+        for depth, (timestamp, user_message) in enumerate(turns, start=1):
+            lag = 0.0
+            if speedup:
+                due = replay_start + (timestamp - origin).total_seconds() / speedup
+                wait = due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                else:
+                    lag = -wait
+            start_time = time.perf_counter()
+            try:
+                result = target.send(session_id, user_message)
+            except Exception as e:
+                result = {"status_code": None, "error": type(e).__name__}
+            result.update(conversation_id=conversation_id, depth=depth, message_chars=len(user_message),
+                          latency=time.perf_counter() - start_time, schedule_lag=lag)
+            with results_lock:
+                results.append(result)
+                if output_file:
+                    output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        target.end_session(session_id)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for conversation_id, turns in conversations:
+                pool.submit(run_conversation, conversation_id, turns)
+    finally:
+        if output_file:
+            output_file.close()
+
+    elapsed = time.monotonic() - replay_start
+    # Fast 429/503 rejections would make the latency look better than it is
+    latencies = [r["latency"] for r in results if r.get("status_code") == 200]
+    failed = [r for r in results if r.get("status_code") != 200]
+    throttled = sum(1 for r in failed if r.get("status_code") == 429)
+    shed = sum(1 for r in failed if r.get("status_code") == 503)
+    if throttled:
+        print(f"WARNING: {throttled} turns were throttled (429) - add this host to the "
+              f"instance's THROTTLE_EXEMPT_IPS")
+
+    def latency_ms(pct):
+        value = percentile(latencies, pct)
+        return round(value * 1000, 1) if value is not None else None
+
+    return dict({
+        "conversations": len(conversations),
+        "turns": len(results),
+        "failed": len(failed),
+        "throttled_429": throttled,
+        "shed_503": shed,
+        "seconds": round(elapsed, 2),
+        "turns_per_second": round(len(results) / elapsed, 2) if elapsed else None,
+        "latency_ms_p50": latency_ms(50),
+        "latency_ms_p95": latency_ms(95),
+        "latency_ms_p99": latency_ms(99),
+        "latency_ms_max": round(max(latencies) * 1000, 1) if latencies else None,
+        "schedule_lag_ms_p95": round(percentile([r["schedule_lag"] for r in results], 95) * 1000, 1),
+        "message_chars_p50": percentile([r["message_chars"] for r in results], 50),
+        "message_chars_p95": percentile([r["message_chars"] for r in results], 95),
+        "history_depth_p50": percentile([len(turns) for _, turns in conversations], 50),
+        "history_depth_p95": percentile([len(turns) for _, turns in conversations], 95),
+        "history_depth_max": max(len(turns) for _, turns in conversations)
+    }, **target.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay LumonMind conversation logs for benchmarking")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_LOG_DIR],
+                        help="Log files, directories or glob patterns (default: logs/)")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--target", help="Base URL of a running instance, e.g. http://localhost:5000")
+    mode.add_argument("--in-process", action="store_true",
+                      help="Call get_ai_response() directly with a mock provider")
+    parser.add_argument("--speedup", type=float, default=1.0,
+                        help="Divide original inter-arrival times by this factor (0 = no delays)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Conversations replayed at once")
+    parser.add_argument("--limit", type=int, help="Replay only the first N conversations")
+    parser.add_argument("--mock-latency", type=float, default=0.0,
+                        help="Seconds the mock provider takes per call (--in-process only)")
+    parser.add_argument("--output", help="Write one JSON line per replayed turn to this file")
+    args = parser.parse_args()
+
+    conversations = load_conversations(args.paths, args.limit)
+    turns = sum(len(t) for _, t in conversations)
+    if not conversations:
+        print("No conversations found in the logs")
+        return 1
+    span = (conversations[-1][1][0][0] - conversations[0][1][0][0]).total_seconds()
+    print(f"Replaying {len(conversations)} conversations ({turns} turns, first turns spread over "
+          f"{span:.0f} seconds) at speedup {args.speedup} [{datetime.now().isoformat()}]")
+
+    target = InProcessTarget(args.mock_latency) if args.in_process else HttpTarget(args.target)
+    stats = replay(conversations, target, args.speedup, args.concurrency, args.output)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
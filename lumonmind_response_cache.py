@@ -0,0 +1,117 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Characters stripped when normalizing an opening message ("Hi!!" == "hi")
+_PUNCTUATION_RE = re.compile(r"[^\w\s']+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_message(message):
+    """Normalize a user message for exact-match caching"""
+    text = _PUNCTUATION_RE.sub(" ", message.lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """
+    Exact-match cache for the first AI response of a conversation
+
+    Keys are (normalized first user message, context version, language). The
+    context version identifies everything else the provider sees (prompt,
+    personalization, earlier messages), so a prompt change, another user's
+    onboarding details or a different language never return a stale answer.
+    Entries expire after `ttl_seconds` and the least recently used entry is
+    evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries=500, ttl_seconds=3600, max_message_length=80,
+                 bypass_keywords=None):
+        """
+        Args:
+            max_entries: Maximum number of cached responses
+            ttl_seconds: Seconds before a cached response expires
+            max_message_length: Longer (normalized) messages are never cached
+            bypass_keywords: Keywords whose presence skips the cache entirely
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_message_length = max_message_length
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bypass_re = None
+        if bypass_keywords:
+            self._bypass_re = re.compile(
+                r'\b(?:' + '|'.join(re.escape(k) for k in sorted(set(bypass_keywords))) + r')\b'
+            )
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0,
+                      "evictions": 0, "expirations": 0}
+
+    def make_key(self, message, context_version, language):
+        """
+        Build the cache key for a message, or None if it must bypass the cache
+
+        Args:
+            message: The user's message
+            context_version: Hash of the prompt and conversation context the reply depends on
+            language: The user's preferred language
+
+        Returns:
+            Tuple key, or None for long messages and bypass-topic messages
+        """
+        normalized = normalize_message(message)
+        if not normalized or len(normalized) > self.max_message_length:
+            return None
+        if self._bypass_re is not None and self._bypass_re.search(normalized):
+            return None
+        return (normalized, context_version, language)
+
+    def get(self, key):
+        """Return the cached (response, model_used) for a key, or None"""
+        with self._lock:
+            if key is None:
+                self.stats["bypassed"] += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, response, model_used):
+        """Store a response for a key (ignored for bypassed keys)"""
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), (response, model_used))
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        """Drop every cached response (e.g. after a prompt change)"""
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        """Return cache metrics for status endpoints"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(
+                self.stats,
+                size=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl_seconds,
+                hit_rate=round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+            )
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+# Next free slots across all active specialists offering a specialization.
+# Served by the partial index idx_slots_free_specialist (SpecialistID, SlotStart).
+NEXT_FREE_SLOTS_SQL = """
+SELECT sl.SlotID, s.SpecialistID, s.Name, sl.SlotStart, sl.SlotEnd
+FROM Specializations sp
+JOIN SpecialistSpecializations ss ON ss.SpecializationID = sp.SpecializationID
+JOIN Specialists s ON s.SpecialistID = ss.SpecialistID AND s.IsActive = TRUE
+JOIN SpecialistSlots sl ON sl.SpecialistID = s.SpecialistID
+WHERE lower(sp.Name) = lower(%s)
+  AND sl.Status = 'free'
+  AND sl.SlotStart > %s
+ORDER BY sl.SlotStart, s.SpecialistID
+LIMIT %s
+"""
+
+SPECIALIST_FREE_SLOTS_SQL = """
+SELECT sl.SlotID, s.SpecialistID, s.Name, sl.SlotStart, sl.SlotEnd
+FROM SpecialistSlots sl
+JOIN Specialists s ON s.SpecialistID = sl.SpecialistID
+WHERE sl.SpecialistID = %s
+  AND sl.Status = 'free'
+  AND sl.SlotStart > %s
+ORDER BY sl.SlotStart
+LIMIT %s
+"""
+
+
+class SlotService:
+    """
+    Bookable specialist slots backed by the SpecialistSlots table
+
+    Slots are materialized ahead of time from SpecialistAvailability (see
+    materialize_specialist_slots() in lumonmind-postgres-schema.sql) and
+    flipped between free and booked by a trigger on Appointments, so searches
+    never join availability against appointments at request time.
+    """
+
+    def __init__(self, database, horizon_days=28, slot_minutes=60):
+        """
+        Args:
+            database: lumonmind_db.Database (PostgreSQL)
+            horizon_days: How many days ahead slots are materialized
+            slot_minutes: Length of one bookable slot
+        """
+        self.database = database
+        self.horizon_days = horizon_days
+        self.slot_minutes = slot_minutes
+
+    def materialize(self):
+        """Expand availability into slots for the rolling horizon. Returns the free slot count."""
+        rows = self.database.query(
+            "SELECT materialize_specialist_slots(%s, %s)", (self.horizon_days, self.slot_minutes)
+        )
+        return rows[0][0]
+
+    @staticmethod
+    def _format(rows):
+        return [
+            {
+                "slot_id": slot_id,
+                "specialist_id": specialist_id,
+                "specialist_name": name,
+                "start": start.isoformat(),
+                "end": end.isoformat()
+            }
+            for slot_id, specialist_id, name, start, end in rows
+        ]
+
+    def next_free_slots(self, specialization, limit=10, after=None):
+        """
+        Next free slots for a specialization (e.g. "Anxiety"), soonest first
+
+        Returns:
+            List of slot dictionaries
+        """
+        rows = self.database.query(NEXT_FREE_SLOTS_SQL, (specialization, after or datetime.now(), limit))
+        return self._format(rows)
+
+    def specialist_free_slots(self, specialist_id, limit=10, after=None):
+        """Next free slots for one specialist, soonest first"""
+        rows = self.database.query(SPECIALIST_FREE_SLOTS_SQL, (specialist_id, after or datetime.now(), limit))
+        return self._format(rows)
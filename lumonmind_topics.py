@@ -0,0 +1,92 @@
+import re
+
+# Dictionary of keywords for topic detection
+TOPIC_KEYWORDS = {
+    'anxiety': [
+        'anxious', 'anxiety', 'worry', 'worrying', 'panic', 'stressed', 
+        'overthinking', 'nervous', 'fear', 'scared', 'tense', 'racing heart',
+        'cant breathe', 'chest tight', 'what if', 'overthink', 'catastrophe',
+        'afraid', 'terrified', 'phobia', 'worried', 'on edge', 'restless'
+    ],
+    'depression': [
+        'depressed', 'depression', 'sad', 'hopeless', 'unmotivated', 'worthless',
+        'tired all the time', 'no energy', 'no interest', 'empty', 'numb', 
+        'cant enjoy', 'no pleasure', 'pointless', 'dont care anymore',
+        'giving up', 'why bother', 'no future', 'meaningless', 'exhausted',
+        'no point', 'miserable', 'alone', 'cant get out of bed', 'apathy'
+    ],
+    'grief': [
+        'grief', 'loss', 'died', 'death', 'passed away', 'deceased', 'bereavement',
+        'lost my', 'funeral', 'missing someone', 'anniversary of', 'grieving',
+        'mourning', 'cope with loss', 'they\'re gone', 'widow', 'widower',
+        'remembrance', 'gone forever', 'never see them again', 'memorial'
+    ],
+    'sleep': [
+        'insomnia', 'cant sleep', 'trouble sleeping', 'tired', 'exhausted',
+        'wake up', 'nightmares', 'bad dreams', 'sleep schedule', 'oversleeping',
+        'cant fall asleep', 'lying awake', 'racing thoughts at night', 'sleep quality',
+        'keep waking up', 'early morning', 'bedtime', 'sleeping pills', 'fatigue'
+    ],
+    'relationship': [
+        'marriage', 'partner', 'boyfriend', 'girlfriend', 'spouse', 'relationship',
+        'breakup', 'divorce', 'arguing', 'communication', 'trust issues', 'cheating',
+        'ex', 'dating', 'love', 'commitment', 'jealous', 'affair', 'fighting', 
+        'unhappy together', 'toxic relationship', 'boundaries', 'controlling'
+    ],
+    'stress-burnout': [
+        'stress', 'burnout', 'overwhelmed', 'workload', 'overworked', 'pressure',
+        'too much', 'cant keep up', 'deadline', 'balance', 'time management',
+        'no time', 'exhaustion', 'drained', 'depleted', 'cant do it all',
+        'breaking point', 'overload', 'responsibilities', 'burden'
+    ],
+    'self-esteem': [
+        'hate myself', 'not good enough', 'failure', 'ugly', 'worthless',
+        'stupid', 'inadequate', 'incompetent', 'self-doubt', 'imposter',
+        'fraud', 'unlovable', 'unworthy', 'ashamed', 'body image', 'fat',
+        'unattractive', 'comparison', 'perfectionist', 'low confidence'
+    ]
+}
+
+# One precompiled whole-word pattern per keyword, built once at import
+TOPIC_PATTERNS = {
+    topic: [re.compile(r'\b' + re.escape(keyword) + r'\b') for keyword in keywords]
+    for topic, keywords in TOPIC_KEYWORDS.items()
+}
+
+
+def count_topic_keywords(text):
+    """
+    Count whole-word keyword matches per topic in already-lowercased text
+
+    Returns:
+        Dictionary of topic -> number of keyword matches
+    """
+    return {
+        topic: sum(len(pattern.findall(text)) for pattern in patterns)
+        for topic, patterns in TOPIC_PATTERNS.items()
+    }
+
+
+def detect_topics(messages, message_threshold=5, keyword_threshold=3):
+    """
+    Detect mental health topics in the most recent user messages
+
+    Shared by the Flask API and offline tools (e.g. log ingestion) so stored
+    topics always match what the app detected.
+
+    Args:
+        messages: List of message dictionaries with 'role' and 'content'
+        message_threshold: Number of most recent user messages to analyze
+        keyword_threshold: Minimum keyword matches to identify a topic
+
+    Returns:
+        Tuple of (topics ordered by relevance, per-topic match counts)
+    """
+    user_messages = [msg['content'] for msg in messages
+                     if msg.get('role') == 'user'][-message_threshold:]
+    topic_counts = count_topic_keywords(' '.join(user_messages).lower())
+
+    detected_topics = [topic for topic, count in topic_counts.items()
+                       if count >= keyword_threshold]
+    detected_topics.sort(key=lambda x: topic_counts[x], reverse=True)
+    return detected_topics, topic_counts
@@ -0,0 +1,95 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TurnTrace:
+    """
+    Timings and provider details collected while one chat turn is served
+
+    A trace is bound to the thread handling the turn (see start_turn_trace),
+    so code deep in the provider chain can add to it without passing it
+    around. log_conversation() writes it into the turn's log entry.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.attempts = []
+        self.usage = {}
+
+    def add_stage(self, name, seconds):
+        """Add time spent in a stage (stages entered several times accumulate)"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_attempt(self, provider, endpoint, seconds, error=None):
+        self.attempts.append({
+            "provider": provider,
+            "endpoint": endpoint,
+            "latency_ms": round(seconds * 1000, 1),
+            "error": error
+        })
+
+    def add_usage(self, provider, prompt_tokens=None, completion_tokens=None, cached_tokens=None):
+        self.usage = {
+            "provider": provider,
+            "prompt_tokens": int(prompt_tokens) if prompt_tokens is not None else None,
+            "completion_tokens": int(completion_tokens) if completion_tokens is not None else None,
+            "cached_tokens": int(cached_tokens) if cached_tokens is not None else None
+        }
+
+    def to_log_fields(self):
+        """Return the fields added to a conversation log entry"""
+        return {
+            "timings_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+            "provider_attempts": list(self.attempts),
+            "usage": self.usage or None,
+            "server_time_ms": round((time.perf_counter() - self.started) * 1000, 1)
+        }
+
+
+_local = threading.local()
+
+
+def start_turn_trace():
+    """Start a new trace for the current thread, replacing any previous one"""
+    _local.trace = TurnTrace()
+    return _local.trace
+
+
+def current_turn_trace():
+    """Return the current thread's trace, or None outside a traced turn"""
+    return getattr(_local, "trace", None)
+
+
+def end_turn_trace():
+    """Detach and return the current thread's trace"""
+    trace = current_turn_trace()
+    _local.trace = None
+    return trace
+
+
+@contextmanager
+def traced_stage(name):
+    """Time a block as stage `name` of the current trace (no-op without one)"""
+    trace = current_turn_trace()
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.add_stage(name, time.perf_counter() - start_time)
+
+
+def trace_provider_attempt(provider, endpoint, seconds, error=None):
+    """Record one provider endpoint/model call on the current trace"""
+    trace = current_turn_trace()
+    if trace is not None:
+        trace.add_attempt(provider, endpoint, seconds, error)
+
+
+def trace_token_usage(provider, prompt_tokens=None, completion_tokens=None, cached_tokens=None):
+    """Record the answering provider's token usage on the current trace"""
+    trace = current_turn_trace()
+    if trace is not None:
+        trace.add_usage(provider, prompt_tokens, completion_tokens, cached_tokens)
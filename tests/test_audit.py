@@ -0,0 +1,69 @@
+import json
+from contextlib import contextmanager
+
+from lumonmind_audit import AuditBuffer
+from lumonmind_db import Database
+
+
+def test_file_sink_writes_in_batches(tmp_path):
+    audit = AuditBuffer(log_dir=str(tmp_path), batch_size=2)
+    for i in range(5):
+        audit.record("chat", f"event {i}", "127.0.0.1")
+    audit.flush()
+    [audit_log] = tmp_path.glob("audit_*.json")
+    events = [json.loads(line) for line in audit_log.read_text(encoding="utf-8").splitlines()]
+    assert [e["description"] for e in events] == [f"event {i}" for i in range(5)]
+    assert audit.snapshot()["written"] == 5 and audit.snapshot()["batches"] == 3
+    assert audit.snapshot()["buffered"] == 0
+
+
+def test_full_buffer_drops_the_oldest_events(tmp_path):
+    audit = AuditBuffer(log_dir=str(tmp_path), capacity=3)
+    for i in range(5):
+        audit.record("chat", f"event {i}")
+    assert audit.snapshot()["dropped"] == 2
+    audit.flush()
+    [audit_log] = tmp_path.glob("audit_*.json")
+    assert [json.loads(line)["description"] for line in audit_log.read_text().splitlines()] == \
+        ["event 2", "event 3", "event 4"]
+
+
+def test_database_sink(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'lumonmind.db'}")
+    try:
+        audit = AuditBuffer(database=db)
+        audit.record("login", "user logged in", "10.0.0.1", user_id=3)
+        audit.flush()
+        assert db.query("SELECT UserID, ActionType, Description, IPAddress FROM AuditLogs") == \
+            [(3, "login", "user logged in", "10.0.0.1")]
+        assert audit.snapshot()["sink"] == "database"
+    finally:
+        db.close()
+
+
+def test_anonymous_events_are_copied_with_a_null_user_id():
+    class RecordingCursor:
+        def __init__(self):
+            self.payloads = []
+
+        def copy_expert(self, sql, file):
+            self.payloads.append(file.read())
+
+    # PostgreSQL path of copy_rows without a connection pool
+    db = Database.__new__(Database)
+    db.is_sqlite = False
+    cursor = RecordingCursor()
+
+    @contextmanager
+    def transaction():
+        yield cursor
+
+    db.transaction = transaction
+    audit = AuditBuffer(database=db)
+    audit.record("session_start", "session abc", "10.0.0.1")
+    audit.flush()
+    [payload] = cursor.payloads
+    timestamp, user_id, rest = payload.split(",", 2)
+    assert user_id == ""  # unquoted empty field = NULL in the INTEGER column
+    assert rest == '"session_start","session abc","10.0.0.1"\n'
+    assert audit.snapshot()["written"] == 1 and audit.snapshot()["dropped"] == 0
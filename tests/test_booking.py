@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+from lumonmind_booking import BookingError, BookingService, derive_idempotency_key, parse_appointment_start
+
+
+@pytest.mark.parametrize("date_text,time_text,expected", [
+    ("2025-04-25", "9:00 AM", datetime(2025, 4, 25, 9, 0)),
+    ("2025-04-25", "2:30 PM", datetime(2025, 4, 25, 14, 30)),
+    ("2025-04-25", "14:30", datetime(2025, 4, 25, 14, 30)),
+])
+def test_parse_appointment_start(date_text, time_text, expected):
+    assert parse_appointment_start(date_text, time_text) == expected
+
+
+@pytest.mark.parametrize("date_text,time_text", [("25/04/2025", "9:00 AM"), ("2025-04-25", "noon"), (None, None)])
+def test_parse_appointment_start_rejects_bad_input(date_text, time_text):
+    with pytest.raises(BookingError) as error:
+        parse_appointment_start(date_text, time_text)
+    assert error.value.status_code == 400
+
+
+def test_derived_idempotency_key_identifies_a_retry():
+    start = datetime(2025, 4, 25, 9)
+    key = derive_idempotency_key("session", "Dr. A", start)
+    assert key == derive_idempotency_key("session", "Dr. A", start)
+    assert key != derive_idempotency_key("session", "Dr. A", start + timedelta(hours=1))
+    assert key != derive_idempotency_key("other", "Dr. A", start)
+    assert len(key) == 64
+
+
+@pytest.mark.parametrize("appointment_type,start", [
+    ("carrier pigeon", datetime.now() + timedelta(days=1)),
+    ("video", datetime.now() - timedelta(days=1)),
+])
+def test_book_validates_before_touching_the_database(appointment_type, start):
+    # database=None: any database access would raise AttributeError
+    with pytest.raises(BookingError) as error:
+        BookingService(None).book("key", "Dr. A", start, appointment_type, "Name", "a@example.com")
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("idempotency_key", ["k" * 65, "", "tab\there", 12345, None])
+def test_book_rejects_invalid_idempotency_keys(idempotency_key):
+    with pytest.raises(BookingError) as error:
+        BookingService(None).book(idempotency_key, "Dr. A", datetime.now() + timedelta(days=1), "video",
+                                  "Name", "a@example.com")
+    assert error.value.status_code == 400
+
+
+class ExistingAppointmentDatabase:
+    """Answers the idempotency-key lookup with one stored appointment"""
+
+    def __init__(self, status):
+        start = datetime.now() + timedelta(days=1)
+        self.row = (7, "Dr. A", start, start + timedelta(hours=1), "video", status)
+
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def execute(self, cursor, sql, params=()):
+        assert sql.startswith("SELECT a.AppointmentID")
+
+    def fetchone(self):
+        return self.row
+
+
+def test_retry_returns_the_scheduled_appointment():
+    service = BookingService(ExistingAppointmentDatabase("scheduled"))
+    appointment = service.book("k" * 64, "Dr. A", datetime.now() + timedelta(days=1), "video", "Name", "a@example.com")
+    assert appointment["appointment_id"] == 7 and appointment["replayed"] is True
+
+
+def test_retry_of_a_canceled_appointment_is_a_conflict():
+    service = BookingService(ExistingAppointmentDatabase("canceled"))
+    with pytest.raises(BookingError) as error:
+        service.book("key", "Dr. A", datetime.now() + timedelta(days=1), "video", "Name", "a@example.com")
+    assert error.value.status_code == 409
+    assert "canceled" in error.value.message
@@ -0,0 +1,39 @@
+import pytest
+
+from lumonmind_crisis import (
+    CRISIS_RESPONSE_ENGLISH, CRISIS_RESPONSE_HINDI, detect_crisis_language, get_crisis_response
+)
+
+
+@pytest.mark.parametrize("message, phrase", [
+    ("I want to die", "want to die"),
+    ("Sometimes I think about SUICIDE.", "suicide"),
+    ("I don't want to live anymore", "dont want to live"),
+    ("i    want\tto  die", "want  to  die"),
+    ("thinking of hurting-myself", "hurting myself"),
+    ("Main marna chahta hoon", "marna chahta"),
+    ("ab jeene ka mann nahi karta", "jeene ka mann nahi"),
+])
+def test_crisis_phrases_are_detected(message, phrase):
+    detected = detect_crisis_language(message)
+    assert detected is not None
+    assert detected.split() == phrase.split()
+
+
+@pytest.mark.parametrize("message", [
+    "",
+    None,
+    "I feel anxious before exams",
+    "This homework is killing me",
+    "my plants want to dielectric",  # whole words only
+    "I overdosed on coffee today",  # "overdose" only as a whole word
+])
+def test_ordinary_messages_are_not_flagged(message):
+    assert detect_crisis_language(message) is None
+
+
+def test_crisis_response_follows_language_preference():
+    assert get_crisis_response("Hindi") == CRISIS_RESPONSE_HINDI
+    assert get_crisis_response("Hinglish/Romanized Hindi") == CRISIS_RESPONSE_HINDI
+    assert get_crisis_response("English") == CRISIS_RESPONSE_ENGLISH
+    assert get_crisis_response(None) == CRISIS_RESPONSE_ENGLISH
@@ -0,0 +1,201 @@
+import csv
+import io
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from lumonmind_db import Database, PersistenceWriter, copy_csv
+
+
+@pytest.fixture
+def database(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'lumonmind.db'}")
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def writer(database):
+    # Flushed by hand - the background thread never wakes up during a test
+    writer = PersistenceWriter(database, batch_size=100, flush_interval=3600, max_attempts=2)
+    yield writer
+    writer._stopped.set()
+
+
+def messages_with_sessions(database):
+    return database.query(
+        "SELECT s.SessionID, m.SenderType, m.Content, m.DetectedTopics, s.SessionStatus, s.LLMProviderUsed "
+        "FROM Messages m JOIN Sessions s ON s.SessionID = m.SessionID ORDER BY m.MessageID"
+    )
+
+
+def test_batch_writes_sessions_messages_and_feedback(database, writer):
+    writer.session_started("conv-1")
+    writer.message("conv-1", "user", "hello", detected_topics=["anxiety"])
+    writer.message("conv-1", "assistant", "hi there", model_used="qwen")
+    writer.feedback("conv-1", 5, comments="helpful")
+    writer.session_ended("conv-1")
+    writer.flush()
+
+    rows = messages_with_sessions(database)
+    assert [(r[1], r[2], r[3]) for r in rows] == [("user", "hello", '["anxiety"]'), ("assistant", "hi there", None)]
+    assert {(r[4], r[5]) for r in rows} == {("completed", "qwen")}
+    session_id = rows[0][0]
+    assert database.query("SELECT RelatedID, Rating FROM Feedback") == [(session_id, 5)]
+    assert writer.snapshot()["written"] == 5
+    assert writer.snapshot()["tracked_sessions"] == 0
+
+
+def test_restarted_conversation_gets_new_session_row(database, writer):
+    writer.session_started("conv-1")
+    writer.message("conv-1", "user", "first")
+    writer.flush()
+    writer.session_started("conv-1")
+    writer.message("conv-1", "user", "second")
+    writer.flush()
+
+    rows = messages_with_sessions(database)
+    assert len({r[0] for r in rows}) == 2
+
+
+def test_rolled_back_batch_leaves_no_session_ids_behind(database, writer):
+    writer.session_started("conv-1")
+    writer.message("conv-1", "user", None)  # violates NOT NULL - the batch rolls back
+    writer.flush()
+    assert writer.snapshot()["retrying"] == 2
+    writer.flush()
+    snapshot = writer.snapshot()
+    assert snapshot["errors"] == 2
+    assert snapshot["dropped"] == 2
+    assert snapshot["retrying"] == 0
+    assert snapshot["tracked_sessions"] == 0
+    assert database.query("SELECT COUNT(*) FROM Sessions") == [(0,)]
+
+    # Later batches for the same conversation create the session they need
+    writer.message("conv-1", "user", "still here")
+    writer.flush()
+    rows = messages_with_sessions(database)
+    assert [r[2] for r in rows] == ["still here"]
+
+
+def test_failed_batch_is_retried_before_new_events(database, writer):
+    writer.session_started("conv-1")
+    writer.message("conv-1", "user", "hello")
+    real_write = writer._write_batch
+    writer._write_batch = lambda events: (_ for _ in ()).throw(RuntimeError("database restarting"))
+    writer.flush()
+    assert writer.snapshot()["retrying"] == 2
+
+    writer._write_batch = real_write
+    writer.message("conv-1", "assistant", "hi")
+    writer.flush()
+    assert [r[2] for r in messages_with_sessions(database)] == ["hello", "hi"]
+    assert writer.snapshot()["dropped"] == 0
+
+
+def test_ended_session_is_not_forgotten_when_batch_fails(database, writer):
+    writer.session_started("conv-1")
+    writer.flush()
+    writer.session_ended("conv-1")
+    writer.message("conv-2", "user", None)
+    writer.flush()
+    assert writer.snapshot()["tracked_sessions"] == 1
+
+
+def test_close_counts_unwritten_events_as_dropped(database, writer):
+    writer._write_batch = lambda events: (_ for _ in ()).throw(RuntimeError("database down"))
+    writer.message("conv-1", "user", "hello")
+    writer.close()
+    assert writer.snapshot()["dropped"] == 1
+
+
+
+def test_session_cache_is_bounded_and_evicted_sessions_are_found_again(database):
+    writer = PersistenceWriter(database, flush_interval=3600, max_sessions=2)
+    try:
+        for key in ("conv-1", "conv-2", "conv-3"):
+            writer.session_started(key)
+            writer.message(key, "user", f"hello from {key}")
+        writer.flush()
+        assert writer.snapshot()["tracked_sessions"] == 2
+        assert "conv-1" not in writer._session_ids
+
+        writer.message("conv-1", "assistant", "welcome back")
+        writer.session_ended("conv-2")
+        writer.flush()
+        rows = messages_with_sessions(database)
+        assert len({r[0] for r in rows}) == 3
+        assert rows[0][0] == rows[-1][0]  # same Sessions row as before eviction
+        assert list(writer._session_ids) == ["conv-3", "conv-1"]
+
+        # Ended sessions are not resumed by the lookup
+        writer.message("conv-2", "user", "new visit")
+        writer.flush()
+        assert database.query("SELECT COUNT(*) FROM Sessions WHERE ConversationKey = 'conv-2'") == [(2,)]
+    finally:
+        writer._stopped.set()
+
+
+def test_sqlite_file_without_conversation_key_is_migrated(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Sessions (SessionID INTEGER PRIMARY KEY AUTOINCREMENT, UserID INTEGER, "
+                 "StartTime TIMESTAMP, EndTime TIMESTAMP, SessionStatus VARCHAR(20), LLMProviderUsed VARCHAR(50))")
+    conn.close()
+    db = Database(f"sqlite:///{path}")
+    try:
+        assert db.query("SELECT COUNT(ConversationKey) FROM Sessions") == [(0,)]
+    finally:
+        db.close()
+
+
+def test_erase_session_deletes_rows_including_queued_ones(database, writer):
+    writer.session_started("conv-1")
+    writer.message("conv-1", "user", "first")
+    writer.feedback("conv-1", 4)
+    writer.flush()
+    writer.session_started("conv-1")  # restarted conversation, second Sessions row
+    writer.message("conv-1", "user", "still queued")
+    writer.session_started("conv-2")
+    writer.message("conv-2", "user", "other")
+
+    assert writer.erase_session("conv-1") == 2
+    assert [r[2] for r in messages_with_sessions(database)] == ["other"]
+    assert database.query("SELECT COUNT(*) FROM Sessions") == [(1,)]
+    assert database.query("SELECT COUNT(*) FROM Feedback") == [(0,)]
+    assert "conv-1" not in writer._session_ids
+
+class RecordingCursor:
+    """Captures what COPY would send to PostgreSQL"""
+
+    def __init__(self):
+        self.copies = []
+
+    def copy_expert(self, sql, file):
+        self.copies.append((sql, file.read()))
+
+
+def postgres_database():
+    # Only copy_rows is exercised, so no connection pool is needed
+    db = Database.__new__(Database)
+    db.is_sqlite = False
+    return db
+
+
+def test_copy_rows_sends_none_as_null():
+    cursor = RecordingCursor()
+    postgres_database().copy_rows(cursor, "Messages", ("SessionID", "SenderType", "Content", "Timestamp",
+                                                       "DetectedTopics"),
+                                  [(1, "assistant", "", datetime(2026, 1, 1, 5), None),
+                                   (1, "user", 'say "hi",\nthen', datetime(2026, 1, 1, 5), '["anxiety"]')])
+    [(sql, payload)] = cursor.copies
+    assert sql == ("COPY Messages (SessionID, SenderType, Content, Timestamp, DetectedTopics) "
+                   "FROM STDIN WITH (FORMAT csv)")
+    assert payload == ('1,"assistant","","2026-01-01 05:00:00",\n'
+                       '1,"user","say ""hi"",\nthen","2026-01-01 05:00:00","[""anxiety""]"\n')
+    assert next(csv.reader(io.StringIO(payload))) == ["1", "assistant", "", "2026-01-01 05:00:00", ""]
+
+
+def test_copy_csv_booleans_and_numbers():
+    assert copy_csv([(True, False, 2.5, 0, None)]) == "true,false,2.5,0,\n"
@@ -0,0 +1,33 @@
+from lumonmind_db_maintenance import manage_partitions
+
+
+class RecordingDatabase:
+    """Answers maintenance queries with canned rows and records them"""
+
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def query(self, sql, params=()):
+        self.queries.append((sql.split("(", 1)[0], params))
+        for prefix, rows in self.results.items():
+            if prefix in sql:
+                return list(rows)
+        return []
+
+
+def test_manage_partitions_prunes_message_topics_with_the_same_retention():
+    db = RecordingDatabase({
+        "manage_time_partitions": [("detached", "messages_p202401")],
+        "prune_message_topics": [(42,)],
+    })
+    actions = manage_partitions(db, months_ahead=2, retention_months=6)
+
+    assert db.queries[-1] == ("SELECT prune_message_topics", (6,))
+    assert ("Messages", "detached", "messages_p202401") in actions
+    assert actions[-1] == ("MessageTopics", "pruned:42", "messagetopics")
+
+
+def test_nothing_to_prune_adds_no_action():
+    db = RecordingDatabase({"prune_message_topics": [(0,)]})
+    assert manage_partitions(db, detached_grace_months=None) == []
@@ -0,0 +1,28 @@
+from lumonmind_feedback import FeedbackAggregator
+
+
+def test_record_updates_every_rollup():
+    aggregator = FeedbackAggregator()
+    aggregator.record(5, specialist_id=7, model_used="qwen")
+    aggregator.record(2, category="specialist", specialist_id=7)
+    stats = aggregator.snapshot()
+    assert stats["overall"]["count"] == 2 and stats["overall"]["average"] == 3.5
+    assert stats["overall"]["histogram"] == {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1}
+    assert stats["by_specialist"]["7"]["sum"] == 7
+    assert stats["by_model"] == {"qwen": {"count": 1, "sum": 5, "average": 5.0,
+                                          "histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 1}}}
+    assert set(stats["by_category"]) == {"ai-interaction", "specialist"}
+    assert FeedbackAggregator().snapshot()["overall"]["average"] is None
+
+
+def test_checkpoint_is_reloaded(tmp_path):
+    path = str(tmp_path / "stats" / "feedback.json")
+    aggregator = FeedbackAggregator(path)
+    aggregator.checkpoint()  # nothing recorded - nothing written
+    assert not (tmp_path / "stats").exists()
+    aggregator.record(4, model_used="deepseek")
+    aggregator.checkpoint()
+    reloaded = FeedbackAggregator(path)
+    assert reloaded.snapshot() == aggregator.snapshot()
+    reloaded.record(1)
+    assert reloaded.snapshot()["overall"]["count"] == 2
@@ -0,0 +1,162 @@
+import os
+
+import pytest
+
+os.environ.pop("DATABASE_URL", None)
+os.environ.setdefault("QWEN_API_KEY", "test")
+
+import lumonmind_flask_v2 as app_module
+from lumonmind_log_index import ConversationLogIndex
+from lumonmind_rate_limit import ProviderRateLimiter
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    log_dir = str(tmp_path)
+    monkeypatch.setattr(app_module, "LOG_DIR", log_dir)
+    monkeypatch.setattr(app_module, "conversation_log_index", ConversationLogIndex(log_dir))
+    router = app_module.provider_router
+    monkeypatch.setattr(router, "call_qwen", lambda messages: ("Test reply", "qwen"), raising=False)
+    monkeypatch.setitem(router.api_keys, "qwen", "test")
+    monkeypatch.setitem(router.limiters, "qwen", ProviderRateLimiter("qwen", 10 ** 9, 10 ** 12))
+    return app_module.app.test_client()
+
+
+def chat(client, session_id, message):
+    response = client.post("/api/chat", json={"session_id": session_id, "message": message})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_history_is_rebuilt_from_logs_after_session_leaves_memory(client):
+    chat(client, "test-history", "How can I sleep better?")
+    app_module.sessions.pop("test-history")
+
+    body = client.get("/api/conversations/test-history").get_json()
+    assert body["source"] == "log"
+    assert [m["content"] for m in body["messages"]] == ["How can I sleep better?", "Test reply"]
+
+
+@pytest.mark.parametrize("session_id", [["a", "b"], {"id": 1}, 42])
+def test_non_string_session_id_is_rejected(client, session_id):
+    response = client.post("/api/chat", json={"session_id": session_id, "message": "hello"})
+    assert response.status_code == 400
+
+
+def test_non_object_json_body_is_not_a_server_error(client):
+    response = client.post("/api/chat", json=["hello"])
+    assert response.status_code == 400
+
+
+class DeferredExecutor:
+    """Holds background work until the test runs it"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+    def run_all(self):
+        for fn, args in self.calls:
+            fn(*args)
+        self.calls = []
+
+
+@pytest.fixture
+def deferred(monkeypatch):
+    executor = DeferredExecutor()
+    monkeypatch.setattr(app_module, "background_executor", executor)
+    return executor
+
+
+def test_crisis_follow_up_answers_the_user_message(client, deferred, monkeypatch):
+    seen = []
+    monkeypatch.setattr(app_module.provider_router, "call_qwen",
+                        lambda messages: (seen.append(messages) or "Follow-up", "qwen"), raising=False)
+    body = chat(client, "test-crisis", "I want to kill myself")
+    assert body["crisis"] is True and not seen
+
+    deferred.run_all()
+    assert seen[0][-1] == {"role": "user", "content": "I want to kill myself"}
+    messages = app_module.sessions["test-crisis"]["messages"]
+    assert [m["role"] for m in messages[-3:]] == ["user", "assistant", "assistant"]
+    assert messages[-1]["content"] == "Follow-up"
+
+
+def test_crisis_follow_up_is_dropped_after_a_newer_turn(client, deferred):
+    chat(client, "test-crisis-late", "I want to kill myself")
+    chat(client, "test-crisis-late", "Can we talk about something else?")
+    deferred.run_all()
+
+    messages = app_module.sessions["test-crisis-late"]["messages"]
+    assert messages[-2:] == [{"role": "user", "content": "Can we talk about something else?"},
+                             {"role": "assistant", "content": "Test reply"}]
+    assert app_module.sessions["test-crisis-late"]["crisis_follow_up_pending"] is False
+    logged = app_module.conversation_log_index.lookup("test-crisis-late")
+    assert [r["user_message"] for r in logged] == ["I want to kill myself", "Can we talk about something else?"]
+
+
+def test_deleted_session_cannot_be_read_back(client, deferred):
+    chat(client, "test-delete", "How can I sleep better?")
+    assert client.get("/api/conversations/test-delete").status_code == 200
+
+    response = client.delete("/api/session/test-delete")
+    assert response.status_code == 200
+    assert response.get_json()["erasure"] == "pending"
+    # Erasure runs in the background; the history is hidden meanwhile
+    assert client.get("/api/conversations/test-delete").status_code == 404
+
+    deferred.run_all()
+    assert "test-delete" not in app_module.pending_erasures
+    assert app_module.conversation_log_index.lookup("test-delete") == []
+    assert client.get("/api/conversations/test-delete").status_code == 404
+    assert client.delete("/api/session/test-delete").status_code == 404
+
+
+def test_delete_erases_database_rows_and_archived_turns(client, deferred, tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    from lumonmind_db import Database, PersistenceWriter
+    from lumonmind_log_archive import NUMERIC_COLUMNS, read_archive, write_archive
+
+    db = Database(f"sqlite:///{tmp_path / 'lumonmind.db'}")
+    writer = PersistenceWriter(db, flush_interval=3600)
+    monkeypatch.setattr(app_module, "persistence_writer", writer)
+    monkeypatch.setattr(app_module, "persistence_checked", True)
+    archive_dir = tmp_path / "archive"
+    archive_dir.mkdir()
+    columns = {name: np.zeros(2, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+    columns.update(conversation=np.asarray([0, 1], dtype="int32"), model=np.zeros(2, dtype="int32"))
+    write_archive(columns, {"conversation": ["test-erase", "other"], "model": ["qwen"]},
+                  str(archive_dir / "conversation_20250101.npz"), "npz")
+    try:
+        chat(client, "test-erase", "How can I sleep better?")
+        client.delete("/api/session/test-erase")
+        deferred.run_all()
+
+        assert db.query("SELECT COUNT(*) FROM Messages") == [(0,)]
+        assert db.query("SELECT COUNT(*) FROM Sessions") == [(0,)]
+        archived, tables = read_archive(str(archive_dir / "conversation_20250101.npz"))
+        assert tables["conversation"] == ["other"] and archived["conversation"].tolist() == [0]
+    finally:
+        writer._stopped.set()
+        db.close()
+
+
+def test_cached_first_replies_are_not_shared_across_personalized_sessions(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(app_module, "response_cache", app_module.ResponseCache())
+    monkeypatch.setattr(app_module.provider_router, "call_qwen",
+                        lambda messages: (calls.append(messages) or "Hello there", "qwen"), raising=False)
+
+    chat(client, "test-cache-1", "hi")
+    chat(client, "test-cache-2", "hi")
+    assert len(calls) == 1  # same unpersonalized context: served from the cache
+
+    for session_id, name in (("test-cache-alex", "Alex"), ("test-cache-sam", "Sam")):
+        app_module.initialize_session(session_id)
+        assert client.post(f"/api/session/{session_id}/onboard", json={"name": name}).status_code == 200
+        response = client.post(f"/api/session/{session_id}/chat", json={"message": "hi"})
+        assert response.status_code == 200
+    assert len(calls) == 3
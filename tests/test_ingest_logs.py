@@ -0,0 +1,134 @@
+import gzip
+import json
+import os
+
+import pytest
+
+import lumonmind_ingest_logs
+from lumonmind_db import Database
+from lumonmind_ingest_logs import ingest_file, ingest_logs
+
+
+def write_log(path, entries, mode="a"):
+    with open(path, mode, encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def turn(conversation_id, minute, user_message, ai_message="reply", model_used="qwen"):
+    return {"timestamp": f"2025-01-01T10:{minute:02d}:00", "conversation_id": conversation_id,
+            "user_message": user_message, "ai_message": ai_message, "model_used": model_used}
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'ingest.db'}"
+
+
+def loaded_messages(database_url):
+    db = Database(database_url)
+    try:
+        return db.query("SELECT SessionID, SenderType, Content, DetectedTopics FROM Messages ORDER BY MessageID")
+    finally:
+        db.close()
+
+
+def test_ingest_loads_turns_skips_tombstones_and_resumes(tmp_path, database_url):
+    log_path = str(tmp_path / "conversation_20250101.json")
+    write_log(log_path, [
+        turn("a", 0, "I feel anxious and worried, panic attacks"),
+        {"erased": True},
+        turn("b", 1, "hello"),
+    ])
+    stats = ingest_file(log_path, database_url, batch_size=1)
+    assert (stats["status"], stats["lines"], stats["skipped"], stats["messages"]) == ("loaded", 3, 1, 4)
+
+    rows = loaded_messages(database_url)
+    assert [(r[1], r[2]) for r in rows] == [("user", "I feel anxious and worried, panic attacks"),
+                                            ("assistant", "reply"), ("user", "hello"), ("assistant", "reply")]
+    assert json.loads(rows[0][3]) == ["anxiety"]
+    assert rows[0][0] != rows[2][0]
+
+    # New lines appended to the day file are picked up where the last run stopped
+    write_log(log_path, [turn("a", 2, "still worried")])
+    stats = ingest_file(log_path, database_url)
+    assert stats["resumed_from"] > 0 and stats["lines"] == 1
+    rows = loaded_messages(database_url)
+    assert len(rows) == 6
+    assert rows[4][0] == rows[0][0]  # same conversation, same session
+
+
+def test_assistant_only_addendum_adds_no_user_message(tmp_path, database_url):
+    log_path = str(tmp_path / "conversation_20250101.json")
+    write_log(log_path, [
+        turn("a", 0, "I want to die", "safety reply", "crisis-fast-path"),
+        turn("a", 1, None, "follow-up reply"),
+    ])
+    ingest_file(log_path, database_url)
+    assert [(r[1], r[2]) for r in loaded_messages(database_url)] == [
+        ("user", "I want to die"), ("assistant", "safety reply"), ("assistant", "follow-up reply")
+    ]
+
+
+def test_rotated_archive_is_not_loaded_twice(tmp_path, database_url):
+    log_path = str(tmp_path / "conversation_20250101.json")
+    write_log(log_path, [turn("a", 0, "hello")])
+    assert ingest_logs([str(tmp_path)], database_url)[0]["status"] == "loaded"
+
+    with open(log_path, "rb") as src, gzip.open(log_path + ".gz", "wb") as dst:
+        dst.write(src.read())
+    os.remove(log_path)
+    assert ingest_logs([str(tmp_path)], database_url)[0]["status"] == "already_loaded"
+    assert len(loaded_messages(database_url)) == 2
+
+
+def test_interrupted_run_resumes_inside_rotated_zst_archive(tmp_path, database_url, monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    log_path = str(tmp_path / "conversation_20250101.json")
+    write_log(log_path, [turn("a", minute, f"message {minute}") for minute in range(4)])
+
+    # The first run fails after committing its first batch
+    batches = []
+
+    def failing_write_batch(*args):
+        if batches:
+            raise RuntimeError("connection lost")
+        batches.append(args)
+        return real_write_batch(*args)
+
+    real_write_batch = lumonmind_ingest_logs.write_batch
+    monkeypatch.setattr(lumonmind_ingest_logs, "write_batch", failing_write_batch)
+    assert ingest_file(log_path, database_url, batch_size=2)["status"].startswith("error")
+    monkeypatch.setattr(lumonmind_ingest_logs, "write_batch", real_write_batch)
+
+    # Meanwhile the day file was rotated into a .zst archive
+    with open(log_path, "rb") as src, open(log_path + ".zst", "wb") as dst:
+        dst.write(zstandard.ZstdCompressor().compress(src.read()))
+    os.remove(log_path)
+
+    stats = ingest_file(log_path + ".zst", database_url, batch_size=2)
+    assert stats["status"] == "loaded"
+    assert stats["resumed_from"] > 0 and stats["lines"] == 2
+    contents = [r[2] for r in loaded_messages(database_url) if r[1] == "user"]
+    assert contents == [f"message {minute}" for minute in range(4)]
+
+
+def test_conversation_across_midnight_keeps_one_session(tmp_path, database_url):
+    write_log(str(tmp_path / "conversation_20250101.json"), [
+        dict(turn("a", 0, "I feel anxious and worried, panic attacks"), timestamp="2025-01-01T23:59:00"),
+    ])
+    write_log(str(tmp_path / "conversation_20250102.json"), [
+        dict(turn("a", 0, "hello again"), timestamp="2025-01-02T00:01:00"),
+        dict(turn("b", 0, "hello"), timestamp="2025-01-02T09:00:00"),
+    ])
+    ingest_logs([str(tmp_path)], database_url, workers=1)
+
+    rows = loaded_messages(database_url)
+    assert rows[0][0] == rows[2][0] != rows[4][0]
+    # The topic window continues from the previous day's messages
+    assert json.loads(rows[2][3]) == ["anxiety"]
+    db = Database(database_url)
+    try:
+        assert db.query("SELECT ConversationKey FROM Sessions ORDER BY SessionID") == [("a",), ("b",)]
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lumonmind_log_archive import (  # noqa: E402
+    convert_logs, erase_conversation, load_archives, read_archive, read_day_columns, weekly_report
+)
+
+
+def write_day(log_dir, day, entries):
+    path = os.path.join(log_dir, f"conversation_{day}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    return path
+
+
+def turn(conversation_id, time_text, user_message, model_used="qwen", server_time_ms=100.0, **fields):
+    return dict({"timestamp": f"{time_text}", "conversation_id": conversation_id, "user_message": user_message,
+                 "ai_message": "reply", "model_used": model_used, "server_time_ms": server_time_ms}, **fields)
+
+
+def test_addendum_is_folded_into_the_previous_turn(tmp_path):
+    path = write_day(str(tmp_path), "20250101", [
+        turn("a", "2025-01-01T10:00:00", "I want to die", "crisis-fast-path",
+             usage={"prompt_tokens": 0}),
+        turn("b", "2025-01-01T10:00:30", "hello"),
+        turn("a", "2025-01-01T10:00:05", None, "qwen", provider_attempts=[{"provider": "qwen"}],
+             usage={"prompt_tokens": 900, "completion_tokens": 120}, timings_ms={"providers": 800.0}),
+        {"erased": True},
+    ])
+    columns, tables = read_day_columns(path)
+    assert len(columns["timestamp_ms"]) == 2
+    assert columns["ai_chars"] == [len("reply") * 2, len("reply")]
+    assert columns["attempts"] == [1, 0]
+    assert columns["prompt_tokens"] == [900, -1]
+    assert columns["completion_tokens"] == [120, -1]
+    assert columns["provider_ms"][0] == 800.0
+    assert tables["model"] == ["crisis-fast-path", "qwen"]
+
+
+@pytest.mark.parametrize("archive_format", ["npz", "parquet"])
+def test_convert_and_weekly_report(tmp_path, archive_format):
+    if archive_format == "parquet":
+        pytest.importorskip("pyarrow")
+    log_dir = str(tmp_path)
+    write_day(log_dir, "20250101", [
+        turn("a", "2025-01-01T10:00:00", "I feel anxious and worried, panic", applied_extensions=["anxiety"]),
+        turn("a", "2025-01-01T10:01:00", "still anxious", "deepseek", 300.0,
+             provider_attempts=[{"provider": "qwen", "error": "timeout"}, {"provider": "deepseek"}]),
+    ])
+    write_day(log_dir, "20250102", [turn("a", "2025-01-02T00:01:00", "after midnight"),
+                                    turn("b", "2025-01-02T09:00:00", "hello")])
+    archive_dir = os.path.join(log_dir, "archive")
+
+    converted = convert_logs([log_dir], archive_dir, archive_format)
+    assert [rows for _, _, rows in converted] == [2, 2]
+    assert convert_logs([log_dir], archive_dir, archive_format) == []  # already archived
+
+    columns, tables, days = load_archives(archive_dir, "20250101", "20250107")
+    assert days == ["20250101", "20250102"]
+    report = weekly_report(columns, tables)
+    assert report["turns"] == 4
+    assert report["sessions"] == 2  # "a" spans midnight but is one session
+    assert report["turns_per_day"] == {"2025-01-01": 2, "2025-01-02": 2}
+    assert report["provider_mix"]["deepseek"]["turns"] == 1
+    assert report["fallback_rate"] == 0.25
+    assert report["topics"]["anxiety"]["extension_turns"] == 1
+    assert report["server_time_ms"]["count"] == 4
+
+
+@pytest.mark.parametrize("archive_format", ["npz", "parquet"])
+def test_erase_conversation_rewrites_affected_archives(tmp_path, archive_format):
+    if archive_format == "parquet":
+        pytest.importorskip("pyarrow")
+    log_dir = str(tmp_path)
+    write_day(log_dir, "20250101", [turn("a", "2025-01-01T10:00:00", "hello"),
+                                    turn("b", "2025-01-01T10:01:00", "hi", "deepseek"),
+                                    turn("c", "2025-01-01T10:02:00", "hey")])
+    write_day(log_dir, "20250102", [turn("c", "2025-01-02T10:00:00", "again")])
+    archive_dir = os.path.join(log_dir, "archive")
+    convert_logs([log_dir], archive_dir, archive_format)
+    untouched = os.path.join(archive_dir, f"conversation_20250102.{archive_format}")
+    mtime = os.path.getmtime(untouched)
+
+    assert erase_conversation(archive_dir, "b") == 1
+    assert erase_conversation(archive_dir, "b") == 0
+    columns, tables = read_archive(os.path.join(archive_dir, f"conversation_20250101.{archive_format}"))
+    assert tables["conversation"] == ["a", "c"]
+    assert columns["conversation"].tolist() == [0, 1]
+    assert os.path.getmtime(untouched) == mtime
+    columns, tables, _ = load_archives(archive_dir, "20250101", "20250102")
+    assert weekly_report(columns, tables)["sessions"] == 2
@@ -0,0 +1,66 @@
+import json
+import os
+
+from lumonmind_log_index import ConversationLogIndex, append_log_record, build_index, index_path_for
+
+
+def log_turns(log_path, turns):
+    for conversation_id, message in turns:
+        append_log_record(log_path, {"conversation_id": conversation_id, "user_message": message})
+
+
+def test_lookup_reads_only_new_index_lines(tmp_path):
+    log_path = str(tmp_path / "conversation_20250101.json")
+    log_turns(log_path, [("a", "one"), ("b", "two"), ("a", "three")])
+    index = ConversationLogIndex(str(tmp_path))
+    assert [r["user_message"] for r in index.lookup("a")] == ["one", "three"]
+
+    log_turns(log_path, [("a", "four")])
+    assert [r["user_message"] for r in index.lookup("a")] == ["one", "three", "four"]
+    assert index.lookup("missing") == []
+
+
+def test_lookup_spans_day_files_in_order(tmp_path):
+    log_turns(str(tmp_path / "conversation_20250102.json"), [("a", "second day")])
+    log_turns(str(tmp_path / "conversation_20250101.json"), [("a", "first day")])
+    index = ConversationLogIndex(str(tmp_path))
+    assert [r["user_message"] for r in index.lookup("a")] == ["first day", "second day"]
+
+
+def test_erase_keeps_other_offsets_valid(tmp_path):
+    log_path = str(tmp_path / "conversation_20250101.json")
+    log_turns(log_path, [("a", "secret"), ("b", "keep me"), ("a", "also secret")])
+    size = os.path.getsize(log_path)
+    index = ConversationLogIndex(str(tmp_path))
+
+    assert index.erase("a") == 2
+    assert os.path.getsize(log_path) == size
+    assert index.lookup("a") == []
+    assert [r["user_message"] for r in index.lookup("b")] == ["keep me"]
+    with open(log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert sum(1 for r in records if r.get("erased")) == 2
+    assert "secret" not in open(log_path, encoding="utf-8").read()
+
+
+def test_stale_offsets_are_skipped(tmp_path):
+    log_path = str(tmp_path / "conversation_20250101.json")
+    log_turns(log_path, [("a", "one"), ("b", "two")])
+    # An index line pointing at another conversation's record
+    with open(index_path_for(log_path), "a", encoding="utf-8") as f:
+        f.write("a\t0\t10\n")
+    index = ConversationLogIndex(str(tmp_path))
+    assert [r["user_message"] for r in index.lookup("a")] == ["one"]
+    assert index.stats["stale_offsets"] == 1
+
+
+def test_build_index_matches_appended_index(tmp_path):
+    log_path = str(tmp_path / "conversation_20250101.json")
+    log_turns(log_path, [("a", "one"), ("b", "zwei – unicode"), ("a", "three")])
+    with open(index_path_for(log_path), "rb") as f:
+        appended = f.read()
+    os.remove(index_path_for(log_path))
+
+    assert build_index(log_path) == 3
+    with open(index_path_for(log_path), "rb") as f:
+        assert f.read() == appended
@@ -0,0 +1,93 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from lumonmind_log_index import ConversationLogIndex, append_log_record
+from lumonmind_log_rotation import open_log, rotate_logs
+
+
+def write_day_log(log_dir, day, conversations):
+    """Write an indexed day log, aged past the rotation idle window"""
+    path = os.path.join(log_dir, f"conversation_{day.strftime('%Y%m%d')}.json")
+    for turn in range(3):
+        for conversation_id in conversations:
+            append_log_record(path, {"conversation_id": conversation_id, "user_message": f"message {turn}",
+                                     "ai_message": "reply " * 50})
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+    return path
+
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd"])
+def test_rotated_archive_lookup_and_erase(tmp_path, codec):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    log_dir = str(tmp_path)
+    path = write_day_log(log_dir, datetime.now() - timedelta(days=2), ["a", "b", "c"])
+
+    result = rotate_logs(log_dir, codec=codec, max_age_days=None)
+    suffix = ".zst" if codec == "zstd" else ".gz"
+    assert result["compressed"] == [path + suffix]
+    assert not os.path.exists(path)
+
+    index = ConversationLogIndex(log_dir)
+    records = index.lookup("b")
+    assert [r["user_message"] for r in records] == ["message 0", "message 1", "message 2"]
+    assert all(r["conversation_id"] == "b" for r in records)
+    assert index.stats["stale_offsets"] == 0
+
+    assert index.erase("b") == 3
+    assert index.lookup("b") == []
+    assert len(index.lookup("a")) == 3
+
+
+def test_zstd_reader_seeks_forward_only(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    data = b"".join(f"line {i}\n".encode() for i in range(10000))
+    path = str(tmp_path / "conversation_20250101.json.zst")
+    with open(path, "wb") as f:
+        f.write(zstandard.ZstdCompressor().compress(data))
+
+    with open_log(path) as f:
+        assert f.seek(0) == 0
+        f.seek(data.index(b"line 5000\n"))
+        assert f.readline() == b"line 5000\n"
+        f.seek(data.index(b"line 9000\n"))
+        assert f.read(10) == b"line 9000\n"
+        with pytest.raises(io.UnsupportedOperation):
+            f.seek(0)
+    with open_log(path) as f:
+        assert f.read() == data
+
+
+def test_today_and_recently_written_files_are_not_compressed(tmp_path):
+    log_dir = str(tmp_path)
+    today = write_day_log(log_dir, datetime.now(), ["a"])
+    yesterday = os.path.join(log_dir, f"conversation_{(datetime.now() - timedelta(days=1)).strftime('%Y%m%d')}.json")
+    append_log_record(yesterday, {"conversation_id": "a"})  # still being appended to
+
+    assert rotate_logs(log_dir, codec="gzip", max_age_days=None)["compressed"] == []
+    assert os.path.exists(today) and os.path.exists(yesterday)
+
+
+def test_retention_deletes_old_archives_with_their_index(tmp_path):
+    log_dir = str(tmp_path)
+    old = write_day_log(log_dir, datetime.now() - timedelta(days=40), ["a"])
+    recent = write_day_log(log_dir, datetime.now() - timedelta(days=2), ["a"])
+
+    result = rotate_logs(log_dir, codec="gzip", max_age_days=30)
+    assert result["deleted"] == [old + ".gz"]
+    assert not os.path.exists(old[:-len(".json")] + ".idx")
+    assert os.path.exists(recent + ".gz")
+    assert [r["conversation_id"] for r in ConversationLogIndex(log_dir).lookup("a")] == ["a"] * 3
+
+
+def test_size_retention_deletes_oldest_archives_first(tmp_path):
+    log_dir = str(tmp_path)
+    paths = [write_day_log(log_dir, datetime.now() - timedelta(days=days), [f"c{i}" for i in range(200)])
+             for days in (5, 4, 3)]
+    result = rotate_logs(log_dir, codec="gzip", max_age_days=None, max_total_mb=0)
+    assert result["deleted"] == [path + ".gz" for path in paths]
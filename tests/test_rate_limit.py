@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+
+import lumonmind_rate_limit
+from lumonmind_rate_limit import AdmissionController, ProviderRateLimiter, SlidingWindowThrottle, estimate_tokens
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(lumonmind_rate_limit.time, "monotonic", clock)
+    monkeypatch.setattr(lumonmind_rate_limit.time, "time", clock)
+    return clock
+
+
+def test_request_bucket_allows_burst_then_refills(clock):
+    limiter = ProviderRateLimiter("qwen", requests_per_minute=3, tokens_per_minute=10 ** 6,
+                                  max_queue=0, max_wait_seconds=0)
+    assert [limiter.acquire() for _ in range(4)] == [True, True, True, False]
+    assert limiter.stats["rejected_queue_full"] == 1
+
+    clock.now += 20  # 3 per minute -> one request every 20 seconds
+    assert limiter.acquire()
+    assert not limiter.acquire()
+
+
+def test_token_bucket_limits_large_prompts(clock):
+    limiter = ProviderRateLimiter("qwen", requests_per_minute=100, tokens_per_minute=1000,
+                                  max_queue=0, max_wait_seconds=0)
+    assert limiter.acquire(800)
+    assert not limiter.acquire(300)
+    clock.now += 6  # 100 tokens refilled
+    assert limiter.acquire(300)
+
+
+def test_record_usage_corrects_the_estimate(clock):
+    limiter = ProviderRateLimiter("qwen", requests_per_minute=100, tokens_per_minute=1000,
+                                  max_queue=0, max_wait_seconds=0)
+    assert limiter.acquire(100)
+    limiter.record_usage(100, 600)
+    assert limiter.snapshot()["available_tokens"] == 400
+
+
+def test_provider_429_blocks_until_retry_after(clock):
+    limiter = ProviderRateLimiter("qwen", requests_per_minute=100, max_queue=0, max_wait_seconds=0)
+    limiter.record_rate_limited(retry_after=5)
+    assert not limiter.has_capacity()
+    assert not limiter.acquire()
+    clock.now += 5
+    assert limiter.has_capacity()
+    assert limiter.acquire()
+    assert limiter.stats["provider_429s"] == 1
+
+
+def test_waiting_caller_is_rejected_past_its_deadline():
+    limiter = ProviderRateLimiter("qwen", requests_per_minute=1, max_queue=5, max_wait_seconds=0.05)
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    assert limiter.stats["rejected_timeout"] == 1
+
+
+def test_admission_controller_sheds_beyond_queue():
+    admission = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=0.01)
+    assert admission.try_enter()
+    assert not admission.try_enter()
+    admission.leave()
+    assert admission.try_enter()
+    assert admission.snapshot()["shed"] == 1
+
+
+def test_admission_controller_queued_caller_gets_released_slot():
+    admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+    assert admission.try_enter()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(admission.try_enter()))
+    waiter.start()
+    admission.leave()
+    waiter.join(5)
+    assert results == [True]
+
+
+def test_sliding_window_throttle_limit_and_retry_after(clock):
+    clock.now = 600.0  # start of a 60 second window
+    throttle = SlidingWindowThrottle(limit=3, window_seconds=60)
+    assert [throttle.hit("ip")[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = throttle.hit("ip")
+    assert not allowed and retry_after == 60
+    assert throttle.hit("other-ip") == (True, 0)
+
+
+def test_sliding_window_weights_the_previous_window(clock):
+    clock.now = 600.0
+    throttle = SlidingWindowThrottle(limit=4, window_seconds=60)
+    for _ in range(4):
+        throttle.hit("ip")
+    # Half way into the next window half of the previous 4 still count
+    clock.now = 690.0
+    assert throttle.hit("ip")[0]
+    assert throttle.hit("ip")[0]
+    allowed, retry_after = throttle.hit("ip")
+    assert not allowed
+    assert 1 <= retry_after <= 30
+
+
+def test_sliding_window_forgets_least_recent_keys(clock):
+    throttle = SlidingWindowThrottle(limit=1, window_seconds=60, max_keys=2)
+    for key in ("a", "b", "c"):
+        throttle.hit(key)
+    assert throttle.snapshot()["tracked_keys"] == 2
+    assert throttle.hit("a")[0]  # "a" was evicted, so it starts over
+
+
+def test_estimate_tokens():
+    messages = [{"role": "system", "content": "x" * 400}, {"role": "user", "content": "y" * 40}, "ignored"]
+    assert estimate_tokens(messages, max_completion_tokens=50) == 160
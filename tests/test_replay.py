@@ -0,0 +1,60 @@
+import json
+from datetime import datetime
+
+from lumonmind_replay import load_conversations, replay
+
+
+def write_log(path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def test_load_conversations_orders_turns_and_skips_non_turns(tmp_path):
+    write_log(str(tmp_path / "conversation_20250101.json"), [
+        {"timestamp": "2025-01-01T10:05:00", "conversation_id": "b", "user_message": "b1"},
+        {"timestamp": "2025-01-01T10:02:00", "conversation_id": "a", "user_message": "a2"},
+        {"timestamp": "2025-01-01T10:00:00", "conversation_id": "a", "user_message": "a1"},
+        {"timestamp": "2025-01-01T10:02:30", "conversation_id": "a", "user_message": None, "ai_message": "follow-up"},
+        {"erased": True},
+        "not a record",
+    ])
+    conversations = load_conversations([str(tmp_path)])
+    assert [(cid, [m for _, m in turns]) for cid, turns in conversations] == [("a", ["a1", "a2"]), ("b", ["b1"])]
+    assert len(load_conversations([str(tmp_path)], limit=1)) == 1
+
+
+class FakeTarget:
+    """Answers with a fixed status code per user message"""
+
+    def __init__(self, status_codes):
+        self.status_codes = status_codes
+        self.ended = []
+
+    def new_session(self):
+        return "session"
+
+    def send(self, session_id, user_message):
+        return {"status_code": self.status_codes.get(user_message, 200)}
+
+    def end_session(self, session_id):
+        self.ended.append(session_id)
+
+    def report(self):
+        return {"target": "fake"}
+
+
+def test_replay_counts_throttled_and_shed_turns_separately():
+    start = datetime(2025, 1, 1, 10)
+    conversations = [("a", [(start, "ok"), (start, "throttled")]), ("b", [(start, "shed"), (start, "ok")])]
+    target = FakeTarget({"throttled": 429, "shed": 503})
+    stats = replay(conversations, target, speedup=0, concurrency=2)
+    assert (stats["turns"], stats["failed"], stats["throttled_429"], stats["shed_503"]) == (4, 2, 1, 1)
+    assert stats["target"] == "fake"
+    assert target.ended == ["session", "session"]
+
+
+def test_replay_without_answered_turns_has_no_latency():
+    start = datetime(2025, 1, 1, 10)
+    stats = replay([("a", [(start, "throttled")])], FakeTarget({"throttled": 429}), speedup=0)
+    assert stats["latency_ms_p50"] is None and stats["latency_ms_max"] is None
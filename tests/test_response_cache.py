@@ -0,0 +1,34 @@
+import lumonmind_response_cache
+from lumonmind_response_cache import ResponseCache, normalize_message
+
+
+def test_normalization_ignores_case_punctuation_and_spacing():
+    assert normalize_message("  Hi!!   there ") == "hi there"
+    cache = ResponseCache()
+    assert cache.make_key("Hello!", "v1", "English") == cache.make_key("hello", "v1", "English")
+    assert cache.make_key("hello", "v1", "English") != cache.make_key("hello", "v2", "English")
+
+
+def test_long_and_bypass_messages_are_not_cached():
+    cache = ResponseCache(max_message_length=10, bypass_keywords=["panic"])
+    assert cache.make_key("this message is too long", "v1", "English") is None
+    assert cache.make_key("panic", "v1", "English") is None
+    assert cache.get(None) is None
+    assert cache.snapshot()["bypassed"] == 1
+
+
+def test_entries_expire_and_least_recent_is_evicted(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lumonmind_response_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    for message in ("a", "b"):
+        cache.put(cache.make_key(message, "v1", "English"), f"reply {message}", "qwen")
+    assert cache.get(cache.make_key("a", "v1", "English")) == ("reply a", "qwen")
+
+    cache.put(cache.make_key("c", "v1", "English"), "reply c", "qwen")  # evicts "b"
+    assert cache.get(cache.make_key("b", "v1", "English")) is None
+
+    now[0] += 61
+    assert cache.get(cache.make_key("a", "v1", "English")) is None
+    snapshot = cache.snapshot()
+    assert (snapshot["evictions"], snapshot["expirations"], snapshot["hits"]) == (1, 1, 1)